@@ -0,0 +1,62 @@
+"""
+Benchmark: ขยายขนาด log ของขั้นตอนใน LOGVIEW
+- extract_pro_and_speed ที่ 1M, 5M และ 10M บรรทัด
+- assign_subgroups_and_insert_empty_rows ที่ 1M แถว (PRO และแถวว่างคั่น ที่ผ่าน calculate_time_diff แล้ว)
+ข้อมูลจำลองจาก generators.make_logview_frame (สัดส่วน PRO/CUC/error เหมือนไฟล์ log จริง)
+เวลาต่อแถวควรคงที่ (O(n)) ผลเทียบกับ implementation เดิมอยู่ใน tests/test_logview.py
+
+รัน: python benchmarks/bench_logview_scaling.py [จำนวนบรรทัด คั่นด้วย , (ค่าเริ่มต้น 1000000,5000000,10000000)]
+                                                [จำนวนแถวของ assign_subgroups (ค่าเริ่มต้น 1000000)]
+"""
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions.LOGVIEW import assign_subgroups_and_insert_empty_rows, extract_pro_and_speed  # noqa: E402
+from generators import logview_stages, make_logview_frame  # noqa: E402
+
+DEFAULT_LINES = [1_000_000, 5_000_000, 10_000_000]
+DEFAULT_SUBGROUP_ROWS = 1_000_000
+
+
+def timed(func, *args):
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def subgroup_input(n_rows):
+    """input ของ assign_subgroups_and_insert_empty_rows อย่างน้อย n_rows แถว ตัดให้เหลือ n_rows แถวพอดี"""
+    n_lines = int(n_rows * 1.75)
+    while True:
+        df = logview_stages(make_logview_frame(n_lines))['assign_subgroups_and_insert_empty_rows']
+        if len(df) >= n_rows:
+            return df.iloc[:n_rows]
+        n_lines = int(n_lines * n_rows / max(len(df), 1) * 1.05)
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else DEFAULT_LINES
+    subgroup_rows = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SUBGROUP_ROWS
+
+    print("extract_pro_and_speed")
+    print(f"{'บรรทัด':>12} {'PRO':>12} {'เวลา (ms)':>12} {'ns/บรรทัด':>10}")
+    for n_lines in sizes:
+        df = make_logview_frame(n_lines)
+        elapsed, df_pro = timed(extract_pro_and_speed, df)
+        print(f"{n_lines:>12,} {len(df_pro):>12,} {elapsed * 1000:>12.1f} {elapsed / n_lines * 1e9:>10.0f}")
+        del df, df_pro
+
+    print("assign_subgroups_and_insert_empty_rows")
+    df = subgroup_input(subgroup_rows)
+    elapsed, result = timed(assign_subgroups_and_insert_empty_rows, df.copy())
+    print(f"  {len(df):,} แถว → {len(result):,} แถว ({result['subgroup_id'].nunique():,} subgroups)  "
+          f"{elapsed * 1000:.1f} ms  {elapsed / len(df) * 1e9:.0f} ns/แถว")
+
+
+if __name__ == "__main__":
+    main()
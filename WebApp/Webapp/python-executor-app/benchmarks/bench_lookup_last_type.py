@@ -0,0 +1,70 @@
+"""
+Benchmark: ค้นหา Last_type ของไฟล์ BOM 100k แถว
+เทียบวิธีเดิม (read_excel + drop_duplicates + merge ทุกครั้ง) กับดัชนีในหน่วยความจำ
+
+รัน: python benchmarks/bench_lookup_last_type.py [จำนวน BOM ใน Last_Type] [จำนวนแถวที่ค้นหา]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions.PNP_CHANG_TYPE import LastTypeIndex, get_last_type_index, lookup_last_type_df  # noqa: E402
+from services.columnar import write_sidecar  # noqa: E402
+from generators import make_bom_query, make_last_type  # noqa: E402
+
+
+def legacy_lookup(df_bom, last_type_path):
+    """วิธีเดิม: อ่าน Excel และ merge ใหม่ทุกครั้ง"""
+    df_last = pd.read_excel(last_type_path)
+    df_last = df_last[['bom_no', 'assy_pack_type']].drop_duplicates()
+    df_last = df_last.rename(columns={'assy_pack_type': 'Last_type'})
+    return pd.merge(df_bom, df_last, on=['bom_no'], how='left')
+
+
+def timed(func, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    n_bom = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        last_type_path = os.path.join(output_dir, "Last_Type.xlsx")
+        make_last_type(n_bom).to_excel(last_type_path, index=False)
+        df_bom = make_bom_query(n_rows, n_bom)
+
+        legacy_s, legacy_df = timed(lambda: legacy_lookup(df_bom, last_type_path))
+        cold_s, _ = timed(lambda: lookup_last_type_df(df_bom, output_dir))
+        warm_s, index_df = timed(lambda: lookup_last_type_df(df_bom, output_dir), repeat=5)
+
+        assert get_last_type_index(output_dir) is not None
+        pd.testing.assert_frame_equal(legacy_df, index_df)
+
+        # โหลดดัชนีใหม่จากไฟล์ Feather ที่ run_all_years เขียนคู่กับ Last_Type.xlsx
+        sidecar = write_sidecar(last_type_path, pd.read_excel(last_type_path))
+        sidecar_s, sidecar_df = timed(lambda: LastTypeIndex(last_type_path).lookup(df_bom))
+        pd.testing.assert_frame_equal(legacy_df, sidecar_df)
+
+    print(f"Last_Type: {n_bom:,} BOM | query: {n_rows:,} แถว")
+    print(f"  เดิม (read_excel + merge): {legacy_s * 1000:10.1f} ms")
+    print(f"  ดัชนี ครั้งแรก (โหลดไฟล์): {cold_s * 1000:10.1f} ms")
+    if sidecar:
+        print(f"  ดัชนี ครั้งแรก (Feather):   {sidecar_s * 1000:10.1f} ms")
+    print(f"  ดัชนี ครั้งถัดไป:          {warm_s * 1000:10.1f} ms")
+    print(f"  เร็วขึ้น {legacy_s / warm_s:,.0f} เท่า")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: หา record แรก/ล่าสุดและสถานะ Changed/No Change ต่อ BOM ใน run_all_years
+ข้อมูลจำลอง 5 ปี (60 ไฟล์รายเดือน) รวม 5M แถว
+
+รัน: python benchmarks/bench_pnp_change_type.py [จำนวนแถว] [จำนวนแถวที่เทียบกับลูปเดิม]
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions.PNP_CHANG_TYPE import GROUP_COLS, OUTPUT_COLS, build_summary, reduce_records  # noqa: E402
+from generators import make_records  # noqa: E402
+
+
+def legacy_summary(df_all):
+    """ลูปเดิมของ run_all_years (ทีละกลุ่ม) ใช้เทียบผลและเวลา"""
+    df_all = df_all.sort_values(by=[
+        'bom_no', 'package_code', 'product_no', 'cust_code',
+        'file_year', 'month_num', 'start_date'
+    ]).reset_index(drop=True)
+
+    result_list = []
+    for name, group in df_all.groupby(GROUP_COLS):
+        group = group.sort_values('start_date').reset_index(drop=True)
+        first_record = group.iloc[0]
+        last_record = group.iloc[-1]
+        unique_types = group['assy_pack_type'].unique()
+        result_list.append({
+            'cust_code': first_record['cust_code'],
+            'package_code': first_record['package_code'],
+            'product_no': first_record['product_no'],
+            'bom_no': first_record['bom_no'],
+            'prev_assy_pack_type': first_record['assy_pack_type'],
+            'assy_pack_type': first_record['assy_pack_type'] if len(unique_types) == 1 else last_record['assy_pack_type'],
+            'prev_start_date': first_record['start_date'],
+            'start_date': last_record['start_date'],
+            'prev_month_name': first_record['start_date'].strftime('%b'),
+            'curr_month_name': last_record['start_date'].strftime('%b'),
+            'change_status': 'No Change' if len(unique_types) == 1 else 'Changed',
+        })
+    return pd.DataFrame(result_list)
+
+
+def vectorized_summary(df_all):
+    records, _ = reduce_records(df_all)
+    return build_summary(records)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def finish(summary_df):
+    # ขั้นตอนเรียงผลลัพธ์แบบเดียวกับ write_last_type
+    return summary_df.sort_values(by=['start_date']).reset_index(drop=True)[OUTPUT_COLS]
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    n_compare = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+
+    # เทียบผลกับลูปเดิมที่ขนาดเล็กกว่า (ลูปเดิมที่ 5M แถวใช้เวลานานมาก)
+    df_small = make_records(n_compare, seed=1)
+    legacy_s, legacy_df = timed(legacy_summary, df_small)
+    vector_s, vector_df = timed(vectorized_summary, df_small)
+    pd.testing.assert_frame_equal(finish(legacy_df), finish(vector_df))
+    print(f"{n_compare:,} แถว ({len(vector_df):,} BOM): ผลตรงกับลูปเดิม")
+    print(f"  ลูปเดิม:     {legacy_s:8.2f} s")
+    print(f"  vectorized: {vector_s:8.2f} s  (เร็วขึ้น {legacy_s / vector_s:,.0f} เท่า)")
+
+    start = time.perf_counter()
+    df_all = make_records(n_rows)
+    print(f"\nสร้างข้อมูล {n_rows:,} แถวใน {time.perf_counter() - start:.1f} s")
+    vector_s, vector_df = timed(vectorized_summary, df_all)
+    changed = (vector_df['change_status'] == 'Changed').sum()
+    print(f"  vectorized: {vector_s:8.2f} s  ({len(vector_df):,} BOM, Changed {changed:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+ตัวสร้างข้อมูลจำลองสำหรับ benchmark (seed เดียวกันได้ข้อมูลเดิมทุกครั้ง)
+- LOGVIEW: log เครื่อง (PRO/CUC/ERR, frame, strip) และไฟล์ export package and frame stock
+- DIE_ATTACK_AUTO_UPH: ชีต UPH กลุ่ม bom_no × Machine_Model
+- PNP_CHANG_TYPE: ไฟล์ WF size รายเดือน, df_all ที่ผ่าน prepare_records แล้ว, Last_Type และไฟล์ BOM ที่ค้นหา
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+PACK_TYPES = np.array(['TRAY', 'TUBE', 'REEL', 'BULK'], dtype=object)
+LOG_FRAMES = ['FU1234', 'FRAB12', 'F1X9Y8', 'FA0001', 'FW5678', 'FN0420']
+PACKAGE_FILE = "export package and frame stock Rev.04.xlsx"
+
+
+def _labels(prefix, n, width=7):
+    return np.array([f"{prefix}{i:0{width}d}" for i in range(n)], dtype=object)
+
+
+# ---------- LOGVIEW ----------
+
+def make_logview_lines(n_pro, seed=0, frames=LOG_FRAMES):
+    """
+    บรรทัด log ของเครื่องหนึ่งเครื่อง เรียงจากใหม่ไปเก่าเหมือนไฟล์จริง
+    - PRO ทุกรอบ มี CUC (ความเร็ว) ตามหลัง 70% และ error step ปน 5%
+    - No_strip นับถอยหลังแล้วเริ่มรอบใหม่, เปลี่ยน frame เป็นช่วงๆ, มีบรรทัดเสีย 1%
+    """
+    rng = np.random.default_rng(seed)
+    gaps = rng.choice([30, 31, 33, 35, 40, 45, 200], n_pro)
+    times = pd.Timestamp(2025, 7, 1, 8) + pd.to_timedelta(np.cumsum(gaps), unit='s')
+    stamps = times.strftime('%Y/%m/%d %I:%M:%S') + np.where(times.hour < 12, 'AM', 'PM')
+
+    frame_ids = np.cumsum(rng.random(n_pro) < 0.05) % len(frames)
+    strips = np.empty(n_pro, dtype=int)
+    strip = 5
+    for i in range(n_pro):
+        strips[i] = strip
+        strip = strip - 1 if strip > 1 else int(rng.choice([4, 5, 5, 5, 6]))
+    values = rng.integers(1, 100, n_pro)
+    has_cuc = rng.random(n_pro) < 0.7
+    speeds = rng.choice([762, 1000, 1016, 1270], n_pro)
+    errors = rng.choice(['ERRSET', 'ERRRCV', 'DMC', 'XYZ'], n_pro)
+    has_error = rng.random(n_pro) < 0.05
+    garbage = rng.random(n_pro) < 0.01
+
+    lines = []
+    for i in range(n_pro):
+        ts, frame = stamps[i], frames[frame_ids[i]]
+        lines.append(f"{ts}\tPRO\tX{frame},G1,{strips[i]},{values[i]},a,b,c")
+        if has_cuc[i]:
+            lines.append(f"{ts}\tCUC\t{frame},G,0,1,2,3,4,{speeds[i]},9")
+        if has_error[i]:
+            lines.append(f"{ts}\t{errors[i]}\tE,1")
+        if garbage[i]:
+            lines.append("garbage line")
+    lines.reverse()
+    return lines
+
+
+def make_logview_frame(n_lines, seed=0, frames=LOG_FRAMES, n_stamps=100_000):
+    """
+    DataFrame แบบเดียวกับ LOGVIEW.load_and_parse_file (คอลัมน์ที่ใช้ต่อ) ขนาด n_lines แถว สร้างแบบ vectorized
+    ใช้ทดสอบขนาดหลายล้านบรรทัดโดยไม่ต้องเขียนและอ่านไฟล์ log
+    - สัดส่วน PRO/CUC/error step เหมือน make_logview_lines เรียงจากใหม่ไปเก่า
+    - date/time วนจากชุดค่า n_stamps ค่า (ขั้นตอนที่ใช้ frame นี้ไม่ได้ใช้เวลา) เพื่อประหยัดหน่วยความจำ
+    """
+    rng = np.random.default_rng(seed)
+    n_pro = int(n_lines / 1.75) + 16
+    has_cuc = rng.random(n_pro) < 0.7
+    has_error = rng.random(n_pro) < 0.05
+    rows_per_pro = 1 + has_cuc + has_error
+    pro_at = np.cumsum(rows_per_pro) - rows_per_pro
+    total = int(rows_per_pro.sum())
+
+    step = np.full(total, 'PRO', dtype=object)
+    step[pro_at[has_cuc] + 1] = 'CUC'
+    step[pro_at[has_error] + 1 + has_cuc[has_error]] = rng.choice(
+        np.array(['ERRSET', 'ERRRCV', 'DMC', 'XYZ'], dtype=object), has_error.sum())
+    owner = np.repeat(np.arange(n_pro), rows_per_pro)
+    is_pro = step == 'PRO'
+    is_cuc = step == 'CUC'
+
+    frame_ids = np.cumsum(rng.random(n_pro) < 0.05) % len(frames)
+    frame = np.asarray(frames, dtype=object)[frame_ids][owner]
+    frame[~is_pro & ~is_cuc] = ''
+    strips = np.array(['1', '2', '3', '4', '5'], dtype=object)[4 - np.arange(n_pro) % 5][owner]
+    strips[~is_pro] = np.where(is_cuc[~is_pro], '0', '')
+    speeds = np.array(['762', '1000', '1016', '1270'], dtype=object)[rng.integers(0, 4, n_pro)][owner]
+    value_5 = np.where(is_cuc, speeds, '').astype(object)
+
+    times = pd.Timestamp(2025, 7, 1, 8) + pd.to_timedelta(np.arange(n_stamps) * 35, unit='s')
+    dates = np.asarray(times.strftime('%Y/%m/%d'), dtype=object)
+    clocks = np.asarray(times.strftime('%I:%M:%S'), dtype=object)
+    stamp_ids = owner % n_stamps
+
+    df = pd.DataFrame({
+        'date': dates[stamp_ids],
+        'time': clocks[stamp_ids],
+        'step': step,
+        'frame': frame,
+        'G': np.where(is_pro, 'G1', 'G').astype(object),
+        'No_strip': strips,
+        'value_1': np.where(is_pro, '7', '1').astype(object),
+        'value_5': value_5,
+    })
+    return df.iloc[::-1].iloc[:n_lines].reset_index(drop=True)
+
+
+def write_logview_logs(input_dir, n_files, n_pro, seed=0):
+    """เขียนไฟล์ log 'MC <n>.txt' จำนวน n_files ไฟล์ คืน list ของ path"""
+    os.makedirs(input_dir, exist_ok=True)
+    paths = []
+    for k in range(n_files):
+        path = os.path.join(input_dir, f"MC {k + 1}.txt")
+        with open(path, 'w', encoding='latin-1') as f:
+            f.write("\n".join(make_logview_lines(n_pro, seed + k)) + "\n")
+        paths.append(path)
+    return paths
+
+
+def logview_stages(df, error_steps=None):
+    """
+    DataFrame ระหว่างทางของ LOGVIEW._process_single_file จาก log ที่อ่านแล้ว (ผลของ load_and_parse_file)
+    ใช้ benchmark/test ทีละขั้นตอนด้วยข้อมูลเดียวกับที่ขั้นตอนนั้นได้รับตอนรันจริง
+    Returns:
+        dict: ชื่อ function -> DataFrame ที่เป็น input ของ function นั้น (ห้ามแก้ไข ใช้ .copy() ก่อนส่งให้ function ที่แก้ input)
+    """
+    import functions.LOGVIEW as logview
+
+    stages = {'extract_pro_and_speed': df}
+    df_pro = logview.mark_errors(df, logview.extract_pro_and_speed(df), error_steps)
+    value_cols = [col for col in df_pro.columns if col.startswith('value_')][:1]
+    selected_cols = ['date', 'time', 'step', 'package', 'frame', 'No_strip'] + value_cols + ['speed', 'MC']
+    df_pro = df_pro[[col for col in selected_cols if col in df_pro.columns]]
+    stages['insert_blank_rows'] = df_pro
+
+    df_with_blank = logview.insert_blank_rows(df_pro)
+    stages['calculate_time_diff'] = df_with_blank
+    df_time = logview.calculate_time_diff(df_with_blank.copy())
+    df_time['frame'] = df_time['frame'].astype(str).str.strip()
+    for col in ['speed', 'value_1', 'No_strip']:
+        if col in df_time.columns:
+            df_time[col] = pd.to_numeric(df_time[col], errors='coerce')
+    df_filtered = df_time[df_time['frame'].notna()]
+    stages['assign_subgroups_and_insert_empty_rows'] = df_filtered
+
+    df_analyzed = logview.assign_subgroups_and_insert_empty_rows(df_filtered.copy(), 'No_strip', 'frame')
+    stages['mark_outlier_subgroups'] = df_analyzed
+    df_analyzed = logview.mark_outlier_subgroups(df_analyzed.copy(), 'subgroup_id', 'No_strip')
+    stages['detect_outliers_combined'] = df_analyzed
+    df_analyzed = logview.detect_outliers_combined(df_analyzed.copy(), 'frame', 'seconds', 'No_strip')
+    stages['add_avg_exclude_outliers_by_frame'] = df_analyzed
+    df_analyzed = logview.add_avg_exclude_outliers_by_frame(df_analyzed.copy(), value_col='seconds', group_col='frame')
+    df_analyzed['sec/strip'] = df_analyzed['avg_ex_outliers']
+    stages['summarize_by_frame'] = df_analyzed
+    return stages
+
+
+def write_package_stock(base_dir, frames=LOG_FRAMES):
+    """
+    สร้าง <base_dir>/Upload/export package and frame stock Rev.04.xlsx
+    (LOGVIEW.run หาไฟล์นี้จาก BASE_DIR/../Upload จึงตั้ง LOGVIEW.BASE_DIR เป็น <base_dir>/functions)
+    """
+    upload_dir = os.path.join(base_dir, "Upload")
+    os.makedirs(upload_dir, exist_ok=True)
+    n = len(frames)
+    df = pd.DataFrame({
+        'FRAME_STOCK': frames,
+        'PACKAGE_CODE': [f"P{i + 1}" for i in range(n)],
+        'Package size ': np.array(['3x3', '4x4', '5x5'])[np.arange(n) % 3],
+        'Package group': np.array(['QFN', 'SLP'])[np.arange(n) % 2],
+        'Frame type ': [chr(ord('a') + i) for i in range(n)],
+        'Unit/strip': np.array([100, 200])[np.arange(n) % 2],
+    })
+    path = os.path.join(upload_dir, PACKAGE_FILE)
+    df.to_excel(path, index=False, sheet_name="Export Worksheet")
+    return path
+
+
+# ---------- DIE_ATTACK_AUTO_UPH ----------
+
+def make_die_attach(n_rows, n_groups=None, seed=0):
+    """
+    ชีต Die Attach UPH: กลุ่ม bom_no × Machine_Model ขนาดไม่เท่ากัน
+    UPH กระจายแบบปกติรอบค่ากลางของแต่ละกลุ่ม มีค่าผิดปกติปน 3% และบางกลุ่มมีน้อยกว่า 15 แถว
+    """
+    rng = np.random.default_rng(seed)
+    n_groups = n_groups or max(n_rows // 200, 1)
+    n_models = min(8, n_groups)
+    n_bom = -(-n_groups // n_models)
+    weights = rng.pareto(1.5, n_groups) + 0.05
+    group_ids = rng.choice(n_groups, n_rows, p=weights / weights.sum())
+
+    centers = rng.uniform(800, 2500, n_groups)
+    uph = rng.normal(centers[group_ids], centers[group_ids] * 0.05)
+    outlier = rng.random(n_rows) < 0.03
+    uph[outlier] *= rng.choice([0.2, 0.5, 1.8, 3.0], outlier.sum())
+
+    return pd.DataFrame({
+        'bom_no': _labels("BOM", n_bom)[group_ids // n_models],
+        'Machine_Model': _labels("MDL", n_models, 2)[group_ids % n_models],
+        'optn_code': _labels("OP", n_bom, 4)[group_ids // n_models],
+        'operation': 'DIE ATTACH',
+        'UPH': uph.round(1),
+    })
+
+
+def write_die_attach(input_dir, n_rows, n_groups=None, seed=0, n_files=1):
+    """เขียนชีต Die Attach เป็น .xlsx จำนวน n_files ไฟล์ คืน list ของ path"""
+    os.makedirs(input_dir, exist_ok=True)
+    paths = []
+    for k in range(n_files):
+        path = os.path.join(input_dir, f"die_attach_{k + 1}.xlsx")
+        make_die_attach(n_rows, n_groups, seed + k).to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+# ---------- PNP_CHANG_TYPE ----------
+
+def make_wf_size_month(year, month, n_rows, n_bom, seed=0):
+    """ไฟล์ WF size หนึ่งเดือน (มีคอลัมน์อื่นที่ไม่ได้ใช้ปนอยู่เหมือนไฟล์จริง)"""
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, n_bom, n_rows)
+    changed = rng.random(n_rows) < 0.03
+    type_idx = np.where(changed, rng.integers(0, 4, n_rows), ids % 3)
+    day = rng.integers(1, 29, n_rows)
+    return pd.DataFrame({
+        'lot_no': _labels("LOT", n_rows, 8),
+        'cust_code': np.array(['C01', 'C02', 'C03'], dtype=object)[ids % 3],
+        'package_code': _labels("PKG", 40, 3)[ids % 40],
+        'product_no': _labels("PRD", n_bom // 2 + 1)[ids // 2],
+        'bom_no': _labels("BOM", n_bom)[ids],
+        'assy_pack_type': PACK_TYPES[type_idx],
+        'start_date': pd.to_datetime({'year': np.full(n_rows, year), 'month': np.full(n_rows, month), 'day': day}),
+        'wafer_qty': rng.integers(1, 25, n_rows),
+        'die_qty': rng.integers(100, 50_000, n_rows),
+        'remark': '',
+    })
+
+
+def write_wf_size_files(input_dir, years, n_rows, n_bom, seed=0, fmt='xlsx'):
+    """เขียนไฟล์ "WF size <เดือน>'<ปี> (UTL1).<fmt>" ทุกเดือนของแต่ละปี คืน list ของ path"""
+    os.makedirs(input_dir, exist_ok=True)
+    paths = []
+    for year in years:
+        for month in range(1, 13):
+            df = make_wf_size_month(year, month, n_rows, n_bom, seed + year * 100 + month)
+            path = os.path.join(input_dir, f"WF size {MONTHS[month - 1]}'{year % 100:02d} (UTL1).{fmt}")
+            if fmt == 'csv':
+                df.to_csv(path, index=False)
+            else:
+                df.to_excel(path, index=False)
+            paths.append(path)
+    return paths
+
+
+def make_records(n_rows, n_bom=None, seed=0, years=(2023, 2024, 2025, 2026, 2027)):
+    """
+    df_all จำลอง (รูปแบบเดียวกับผลของ prepare_records) เรียงตามไฟล์ปี → เดือน
+    BOM ส่วนใหญ่ใช้ assy_pack_type เดิม มีบางแถวเปลี่ยนเป็นแบบอื่น
+    """
+    rng = np.random.default_rng(seed)
+    n_bom = n_bom or max(n_rows // 15, 1)
+    bom_labels, product_labels = _labels("BOM", n_bom), _labels("PRD", n_bom // 2 + 1)
+    cust_labels, package_labels = np.array(['C01', 'C02', 'C03'], dtype=object), _labels("PKG", 40)
+
+    months = [(year, month) for year in years for month in range(1, 13)]
+    month_idx = np.sort(rng.integers(0, len(months), n_rows))
+    file_year = np.array([months[i][0] for i in range(len(months))])[month_idx]
+    month_num = np.array([months[i][1] for i in range(len(months))])[month_idx]
+    day = rng.integers(1, 29, n_rows)
+
+    ids = rng.integers(0, n_bom, n_rows)
+    changed = rng.random(n_rows) < 0.02
+    type_idx = np.where(changed, rng.integers(0, 4, n_rows), ids % 3)
+
+    month_names = np.array(MONTHS, dtype=object)
+    return pd.DataFrame({
+        'cust_code': cust_labels[ids % 3],
+        'package_code': package_labels[ids % 40],
+        'product_no': product_labels[ids // 2],
+        'bom_no': bom_labels[ids],
+        'assy_pack_type': PACK_TYPES[type_idx],
+        'start_date': pd.to_datetime({'year': file_year, 'month': month_num, 'day': day}),
+        'month': month_names[month_num - 1],
+        'file_year': file_year,
+        'month_short': month_names[month_num - 1],
+        'month_num': month_num,
+    })
+
+
+def make_last_type(n_bom, seed=0):
+    """Last_Type.xlsx จำลอง: 1 แถวต่อ BOM"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'cust_code': rng.choice(['C01', 'C02', 'C03'], n_bom),
+        'package_code': rng.choice(['P10', 'P20', 'P30', 'P40'], n_bom),
+        'product_no': [f"PRD{i:06d}" for i in range(n_bom)],
+        'bom_no': [f"BOM{i:06d}" for i in range(n_bom)],
+        'prev_assy_pack_type': rng.choice(['TRAY', 'TUBE', 'REEL'], n_bom),
+        'assy_pack_type': rng.choice(['TRAY', 'TUBE', 'REEL'], n_bom),
+    })
+
+
+def make_bom_query(n_rows, n_bom, seed=1):
+    """ไฟล์ BOM ที่ผู้ใช้อัปโหลด (มี BOM ที่ไม่พบปนอยู่ 10%)"""
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, int(n_bom * 1.1), n_rows)
+    return pd.DataFrame({'bom_no': [f"BOM{i:06d}" for i in ids]})
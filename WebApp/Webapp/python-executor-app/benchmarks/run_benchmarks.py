@@ -0,0 +1,389 @@
+"""
+Benchmark suite: จับเวลา public function ของ LOGVIEW, DIE_ATTACK_AUTO_UPH และ PNP_CHANG_TYPE
+ด้วยข้อมูลจำลองจาก generators.py หลายขนาด แล้วบันทึกผลเป็น JSON เพื่อเทียบระหว่าง commit
+
+รัน:
+    python benchmarks/run_benchmarks.py [--scales small,medium] [--modules LOGVIEW,PNP_CHANG_TYPE]
+                                        [--repeat 3] [--output ผล.json]
+    python benchmarks/run_benchmarks.py --compare ผลเดิม.json ผลใหม่.json [--threshold 1.2]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import functions.DIE_ATTACK_AUTO_UPH as die_attach  # noqa: E402
+import functions.LOGVIEW as logview  # noqa: E402
+import functions.PNP_CHANG_TYPE as pnp  # noqa: E402
+import generators as gen  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# ขนาดข้อมูลของแต่ละระดับ
+SCALES = {
+    'small': {
+        'log_files': 2, 'log_pro': 2_000,
+        'die_rows': 5_000, 'die_files': 2,
+        'wf_years': 1, 'wf_rows': 2_000, 'wf_bom': 500,
+        'lookup_bom': 5_000, 'lookup_rows': 20_000,
+    },
+    'medium': {
+        'log_files': 4, 'log_pro': 20_000,
+        'die_rows': 50_000, 'die_files': 4,
+        'wf_years': 2, 'wf_rows': 10_000, 'wf_bom': 3_000,
+        'lookup_bom': 20_000, 'lookup_rows': 100_000,
+    },
+    'large': {
+        'log_files': 4, 'log_pro': 100_000,
+        'die_rows': 300_000, 'die_files': 8,
+        'wf_years': 5, 'wf_rows': 50_000, 'wf_bom': 20_000,
+        'lookup_bom': 100_000, 'lookup_rows': 1_000_000,
+    },
+    # โรงงานเต็ม: log 30 เครื่อง ไฟล์ขนาดปานกลาง (ดูผลของ process pool และ IN_MEMORY_PIPELINE ต่อ LOGVIEW.run)
+    'fleet': {
+        'log_files': 30, 'log_pro': 5_000,
+        'die_rows': 50_000, 'die_files': 30,
+        'wf_years': 2, 'wf_rows': 10_000, 'wf_bom': 3_000,
+        'lookup_bom': 20_000, 'lookup_rows': 100_000,
+    },
+}
+MODULES = ['LOGVIEW', 'DIE_ATTACK_AUTO_UPH', 'PNP_CHANG_TYPE']
+
+
+class Suite:
+    """เก็บผลจับเวลาของทุก function (setup ไม่นับเวลา)"""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def bench(self, module, function, scale, rows, func, setup=None, **params):
+        """
+        จับเวลา func(*setup()) repeat ครั้ง
+        Args:
+            rows: จำนวนแถวของข้อมูลเข้า (ใช้คำนวณ rows_per_s)
+            setup: callable คืน tuple ของ argument ใหม่ทุกรอบ (เช่น copy DataFrame ที่ func แก้ไข)
+        """
+        runs = []
+        for _ in range(self.repeat):
+            args = setup() if setup else ()
+            gc.collect()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                func(*args)
+                runs.append(time.perf_counter() - start)
+        best = min(runs)
+        self.results.append({
+            'module': module,
+            'function': function,
+            'scale': scale,
+            'rows': rows,
+            'params': params,
+            'best_s': round(best, 6),
+            'mean_s': round(sum(runs) / len(runs), 6),
+            'runs_s': [round(run, 6) for run in runs],
+            'rows_per_s': round(rows / best) if rows and best > 0 else None,
+        })
+        print(f"  {module}.{function:<48} {scale:<7} {rows:>10,} แถว  {best * 1000:10.1f} ms")
+
+
+def quiet(func, *args, **kwargs):
+    # เรียก function ตอนเตรียมข้อมูลโดยไม่แสดง print
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return func(*args, **kwargs)
+
+
+def fresh_dir(parent):
+    return lambda: (tempfile.mkdtemp(dir=parent),)
+
+
+@contextlib.contextmanager
+def override(module, **values):
+    """ตั้งค่าคงที่ของ module ชั่วคราว (เช่น IN_MEMORY_PIPELINE) แล้วคืนค่าเดิม"""
+    previous = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(module, name, value)
+
+
+def call_with(module, func, **values):
+    """func(*args) ที่รันภายใต้ override(module, **values)"""
+    def wrapper(*args):
+        with override(module, **values):
+            return func(*args)
+    return wrapper
+
+
+# ---------- LOGVIEW ----------
+
+def bench_logview(suite, scale, params, workdir):
+    input_dir = os.path.join(workdir, "logs")
+    paths = gen.write_logview_logs(input_dir, params['log_files'], params['log_pro'])
+    package_path = gen.write_package_stock(workdir)
+    logview.BASE_DIR = os.path.join(workdir, "functions")
+    outputs = os.path.join(workdir, "out")
+    os.makedirs(outputs)
+    first = paths[0]
+    with open(first, encoding='latin-1') as f:
+        n_lines = sum(1 for _ in f)
+    n_total = n_lines * len(paths)
+
+    suite.bench('LOGVIEW', 'load_and_parse_file', scale, n_lines,
+                lambda: logview.load_and_parse_file(first))
+    suite.bench('LOGVIEW', 'load_and_parse_file(streaming)', scale, n_lines,
+                lambda: logview.load_and_parse_file(first, streaming=True))
+    suite.bench('LOGVIEW', 'load_pipeline_rows', scale, n_lines,
+                lambda: logview.load_pipeline_rows(first, logview.get_error_steps(first)))
+
+    df = logview.load_and_parse_file(first)
+    suite.bench('LOGVIEW', 'extract_pro_and_speed', scale, len(df),
+                lambda: logview.extract_pro_and_speed(df))
+    df_pro = logview.extract_pro_and_speed(df)
+    suite.bench('LOGVIEW', 'mark_errors', scale, len(df),
+                lambda pro: logview.mark_errors(df, pro, logview.get_error_steps(first)),
+                setup=lambda: (df_pro.copy(),))
+
+    # ขั้นตอนต่อจาก mark_errors ใน _process_single_file แต่ละขั้นใช้ input ที่ได้จากไฟล์ first จริง
+    # (function ที่เพิ่มคอลัมน์ให้ input ได้สำเนาใหม่ทุกรอบ)
+    stages = gen.logview_stages(df, logview.get_error_steps(first))
+    for name, copy_input in [
+        ('insert_blank_rows', False),
+        ('calculate_time_diff', True),
+        ('assign_subgroups_and_insert_empty_rows', True),
+        ('mark_outlier_subgroups', True),
+        ('detect_outliers_combined', True),
+        ('add_avg_exclude_outliers_by_frame', True),
+        ('summarize_by_frame', False),
+    ]:
+        stage_input = stages[name]
+        suite.bench('LOGVIEW', name, scale, len(stage_input), getattr(logview, name),
+                    setup=(lambda frame=stage_input, copy=copy_input: (frame.copy() if copy else frame,)))
+
+    suite.bench('LOGVIEW', 'process_single_file_complete(in-memory)', scale, n_lines,
+                lambda out: logview.process_single_file_complete(first, out, return_data=True, write_excel=False),
+                setup=fresh_dir(outputs))
+    suite.bench('LOGVIEW', 'process_single_file_complete(excel)', scale, n_lines,
+                lambda out: logview.process_single_file_complete(first, out),
+                setup=fresh_dir(outputs))
+    suite.bench('LOGVIEW', 'process_multiple_files_complete', scale, n_total,
+                lambda out: logview.process_multiple_files_complete(input_dir, out, return_data=True, write_excel=False),
+                setup=fresh_dir(outputs), files=len(paths))
+
+    results = quiet(logview.process_multiple_files_complete, input_dir, outputs, return_data=True, write_excel=False)
+    frames = {os.path.splitext(os.path.basename(message))[0]: df_final for success, message, df_final in results if success}
+    n_processed = sum(len(frame) for frame in frames.values())
+    suite.bench('LOGVIEW', 'summarize_sec_strip_frames', scale, n_processed,
+                lambda: logview.summarize_sec_strip_frames(frames))
+    summary_df = quiet(logview.summarize_sec_strip_frames, frames)
+    suite.bench('LOGVIEW', 'analyze_and_export_csv_from_df', scale, len(summary_df),
+                lambda out: logview.analyze_and_export_csv_from_df(summary_df, package_path, os.path.join(out, "Summary.csv")),
+                setup=fresh_dir(outputs))
+
+    # run() ทั้งสองโหมด: ส่ง DataFrame ต่อในหน่วยความจำ กับเขียน Excel ลง temp แล้วอ่านกลับแบบเดิม
+    suite.bench('LOGVIEW', 'run', scale, n_total,
+                call_with(logview, lambda out: logview.run(input_dir, out), IN_MEMORY_PIPELINE=True),
+                setup=fresh_dir(outputs), files=len(paths), in_memory_pipeline=True)
+    suite.bench('LOGVIEW', 'run(in-memory, no processed excel)', scale, n_total,
+                call_with(logview, lambda out: logview.run(input_dir, out),
+                          IN_MEMORY_PIPELINE=True, WRITE_PROCESSED_EXCEL=False),
+                setup=fresh_dir(outputs), files=len(paths), in_memory_pipeline=True)
+    suite.bench('LOGVIEW', 'run(excel round-trip)', scale, n_total,
+                call_with(logview, lambda out: logview.run(input_dir, out), IN_MEMORY_PIPELINE=False),
+                setup=fresh_dir(outputs), files=len(paths), in_memory_pipeline=False)
+
+
+# ---------- DIE_ATTACK_AUTO_UPH ----------
+
+def bench_die_attach(suite, scale, params, workdir):
+    input_dir = os.path.join(workdir, "die_attach")
+    paths = gen.write_die_attach(input_dir, params['die_rows'], n_files=params['die_files'])
+    df = gen.make_die_attach(params['die_rows'])
+    outputs = os.path.join(workdir, "out")
+    os.makedirs(outputs, exist_ok=True)
+
+    groups = df.groupby(['bom_no', 'Machine_Model'])
+    largest = groups.get_group(groups.size().idxmax())
+    suite.bench('DIE_ATTACK_AUTO_UPH', 'remove_outliers_auto(largest group)', scale, len(largest),
+                lambda group: die_attach.remove_outliers_auto(group),
+                setup=lambda: (largest.copy(),))
+    suite.bench('DIE_ATTACK_AUTO_UPH', 'summarize_uph_by_group(all groups)', scale, len(df),
+                lambda: die_attach.summarize_uph_by_group(df, 'UPH'), groups=groups.ngroups)
+
+    suite.bench('DIE_ATTACK_AUTO_UPH', 'process_die_attach_data', scale, len(df),
+                lambda out: die_attach.process_die_attach_data(paths[0], out),
+                setup=fresh_dir(outputs), groups=groups.ngroups)
+    suite.bench('DIE_ATTACK_AUTO_UPH', 'run', scale, len(df) * len(paths),
+                lambda out: die_attach.run(input_dir, out),
+                setup=fresh_dir(outputs), files=len(paths))
+
+
+# ---------- PNP_CHANG_TYPE ----------
+
+def bench_pnp(suite, scale, params, workdir):
+    input_dir = os.path.join(workdir, "wf_size")
+    years = pnp.TARGET_YEARS[:params['wf_years']]
+    paths = gen.write_wf_size_files(input_dir, years, params['wf_rows'], params['wf_bom'])
+    outputs = os.path.join(workdir, "out")
+    os.makedirs(outputs, exist_ok=True)
+    n_total = params['wf_rows'] * len(paths)
+
+    suite.bench('PNP_CHANG_TYPE', 'find_monthly_files', scale, len(paths),
+                lambda: pnp.find_monthly_files(input_dir))
+    files_by_year = quiet(pnp.find_monthly_files, input_dir)
+    jobs = [(filepath, year) for year in sorted(files_by_year) for filepath in files_by_year[year]]
+    suite.bench('PNP_CHANG_TYPE', 'load_monthly_files', scale, n_total,
+                lambda: pnp.load_monthly_files(jobs), files=len(jobs))
+
+    df_list = quiet(pnp.load_monthly_files, jobs)
+    suite.bench('PNP_CHANG_TYPE', 'prepare_records', scale, n_total,
+                lambda: pnp.prepare_records(pnp.concat_monthly(df_list)))
+    df_all = quiet(pnp.prepare_records, pnp.concat_monthly(df_list))
+    suite.bench('PNP_CHANG_TYPE', 'reduce_records', scale, n_total,
+                lambda: pnp.reduce_records(df_all))
+    records, _ = pnp.reduce_records(df_all)
+    suite.bench('PNP_CHANG_TYPE', 'build_summary', scale, len(records),
+                lambda: pnp.build_summary(records))
+
+    suite.bench('PNP_CHANG_TYPE', 'run_all_years(full)', scale, n_total,
+                lambda out: pnp.run_all_years(input_dir, out, incremental=False),
+                setup=fresh_dir(outputs), files=len(paths))
+    suite.bench('PNP_CHANG_TYPE', 'run_all_years(incremental, new state)', scale, n_total,
+                lambda out: pnp.run_all_years(input_dir, out, incremental=True),
+                setup=fresh_dir(outputs), files=len(paths))
+    warm_dir = tempfile.mkdtemp(dir=outputs)
+    quiet(pnp.run_all_years, input_dir, warm_dir, incremental=True)
+    suite.bench('PNP_CHANG_TYPE', 'run_all_years(incremental, no new files)', scale, n_total,
+                lambda: pnp.run_all_years(input_dir, warm_dir, incremental=True), files=len(paths))
+
+    # ค้นหา Last_type ด้วยไฟล์ BOM ที่อัปโหลด
+    lookup_dir = tempfile.mkdtemp(dir=outputs)
+    last_type_path = os.path.join(lookup_dir, "Last_Type.xlsx")
+    gen.make_last_type(params['lookup_bom']).to_excel(last_type_path, index=False)
+    df_bom = gen.make_bom_query(params['lookup_rows'], params['lookup_bom'])
+    suite.bench('PNP_CHANG_TYPE', 'LastTypeIndex.lookup(cold)', scale, len(df_bom),
+                lambda: pnp.LastTypeIndex(last_type_path).lookup(df_bom), last_type_rows=params['lookup_bom'])
+    suite.bench('PNP_CHANG_TYPE', 'lookup_last_type_df(warm)', scale, len(df_bom),
+                lambda: pnp.lookup_last_type_df(df_bom, lookup_dir), last_type_rows=params['lookup_bom'])
+
+
+SUITES = {
+    'LOGVIEW': bench_logview,
+    'DIE_ATTACK_AUTO_UPH': bench_die_attach,
+    'PNP_CHANG_TYPE': bench_pnp,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scales, modules, repeat, output):
+    suite = Suite(repeat)
+    commit = git_commit()
+    for scale in scales:
+        print(f"📏 {scale}")
+        for module in modules:
+            workdir = tempfile.mkdtemp(prefix=f"bench_{module}_")
+            try:
+                SUITES[module](suite, scale, SCALES[scale], workdir)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+            'scales': {scale: SCALES[scale] for scale in scales},
+        },
+        'results': suite.results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"bench_{stamp}_{commit or 'nogit'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 บันทึกผลที่ {output}")
+    return output
+
+
+def compare(base_path, new_path, threshold):
+    """เทียบเวลาดีที่สุดของสองไฟล์ผล คืนจำนวนรายการที่ช้าลงเกิน threshold เท่า"""
+    def load(path):
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        return report['meta'], {(r['module'], r['function'], r['scale']): r for r in report['results']}
+
+    base_meta, base = load(base_path)
+    new_meta, new = load(new_path)
+    print(f"เดิม: {base_meta.get('git_commit')}  ใหม่: {new_meta.get('git_commit')}")
+    regressions = 0
+    for key in sorted(set(base) & set(new)):
+        ratio = new[key]['best_s'] / base[key]['best_s'] if base[key]['best_s'] > 0 else float('inf')
+        flag = ""
+        if ratio > threshold:
+            flag = "  ⚠️ ช้าลง"
+            regressions += 1
+        elif ratio < 1 / threshold:
+            flag = "  ✅ เร็วขึ้น"
+        module, function, scale = key
+        print(f"  {module}.{function:<48} {scale:<7} {base[key]['best_s'] * 1000:10.1f} → "
+              f"{new[key]['best_s'] * 1000:10.1f} ms  ×{ratio:5.2f}{flag}")
+    for key in sorted(set(base) ^ set(new)):
+        print(f"  {'.'.join(key[:2])} ({key[2]}): มีเฉพาะใน{'ผลเดิม' if key in base else 'ผลใหม่'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='small,medium', help=f"คั่นด้วย , จาก {', '.join(SCALES)}")
+    parser.add_argument('--modules', default=','.join(MODULES), help="คั่นด้วย ,")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="path ของไฟล์ JSON (ค่าเริ่มต้น benchmarks/results/)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="เทียบไฟล์ผลสองไฟล์")
+    parser.add_argument('--threshold', type=float, default=1.2, help="อัตราส่วนเวลาที่ถือว่าช้าลง")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    modules = [module.strip() for module in args.modules.split(',') if module.strip()]
+    unknown = [name for name in scales if name not in SCALES] + [name for name in modules if name not in SUITES]
+    if unknown:
+        parser.error(f"ไม่รู้จัก: {unknown}")
+    warnings.simplefilter('ignore')
+    run_suite(scales, modules, args.repeat, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,19 @@ import pandas as pd
 import socket
 import datetime
 import logging
-from functions.PNP_CHANG_TYPE import lookup_last_type
+import multiprocessing
+from functions.PNP_CHANG_TYPE import lookup_last_type, lookup_last_type_df
+from services.job_queue import JobManager, Job
+from services.result_table import parse_datatables_args
+from services.result_cache import result_cache
+from services.columnar import read_sidecar, write_sidecar
+from services.metrics import metrics, stage
+from services.staging import stage_files
+from services.run_cache import run_cache
+from services.upload_store import upload_store, UploadError, parse_upload_list, safe_filename
+from services.run_outputs import (RUNS_DIR, create_run_dir, build_manifest, restore_shared_state,
+                                  clear_shared_state, publish_shared_outputs)
+from services.retention import retention
 
 # Configuration Class
 class Config:
@@ -19,6 +31,37 @@ class Config:
     HOST = '0.0.0.0'
     PORT = 80
     DEBUG = True
+    # Background jobs: จำนวน worker รวม และจำนวนงานพร้อมกันสูงสุดต่อ function
+    JOB_WORKERS = 4
+    JOB_CONCURRENCY = {'LOGVIEW': 1, 'PNP_CHANG_TYPE': 1, 'DIE_ATTACK_AUTO_UPH': 1}
+    DEFAULT_JOB_CONCURRENCY = 2
+    JOB_HISTORY = 200
+    # จำนวน process รวมที่งานทุกงานใช้อ่าน/ประมวลผลไฟล์แบบขนานได้พร้อมกัน
+    CPU_WORKERS = int(os.environ.get('CPU_WORKERS', os.cpu_count() or 1))
+    # แคช DataFrame ผลลัพธ์ (ใช้แสดงตาราง/แบ่งหน้าโดยไม่ต้องอ่านไฟล์ซ้ำ)
+    RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+    RESULT_CACHE_MAX_ITEMS = 16
+    # จำนวนการรันล่าสุดที่เก็บผลวัดเวลา/หน่วยความจำแต่ละขั้นตอนไว้ (ดูที่ /api/metrics)
+    METRICS_HISTORY = 50
+    # โหมดเลือกจากโฟลเดอร์: hard link/symlink ไฟล์เข้าโฟลเดอร์ชั่วคราวแทนการคัดลอก (False = คัดลอกแบบเดิม)
+    LINK_FOLDER_INPUTS = True
+    # ไฟล์อัปโหลดเก็บแบบ content-addressed (ไฟล์เดิมไม่ต้องอัปโหลดซ้ำ) และอัปโหลดเป็นช่วงต่อจากจุดที่ค้างได้
+    UPLOAD_STORE_DIR = os.path.join(BASE_DIR, "upload_store")
+    UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB
+    UPLOAD_SESSION_TTL = 24 * 3600  # ลบการอัปโหลดที่ค้างเกิน 1 วัน
+    # ไฟล์ใน upload store ที่ไม่ได้ใช้เกิน 7 วัน หรือขนาดรวมเกิน 5GB ถูกลบในรอบตรวจของ retention
+    # (ยกเว้นไฟล์ input ของผลที่ยังอยู่ในแคชผลการรัน)
+    UPLOAD_STORE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+    UPLOAD_STORE_MAX_AGE = 7 * 24 * 3600
+    # แคชผลการรัน: function + source module + input เดิม ได้ไฟล์ผลลัพธ์เดิมทันทีโดยไม่ต้องรันใหม่
+    RUN_CACHE_INDEX = os.path.join(BASE_DIR, "run_cache.json")
+    RUN_CACHE_MAX_ENTRIES = 500
+    # เก็บผลลัพธ์ใน output_* ตามอายุ/จำนวนการรันล่าสุด/ขนาดรวม (None = ไม่จำกัด) ตรวจและลบเบื้องหลังทุก RETENTION_INTERVAL วินาที
+    RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', '1') != '0'
+    RETENTION_DEFAULT_POLICY = {'max_bytes': 2 * 1024 * 1024 * 1024, 'max_age': 30 * 24 * 3600, 'keep_last': 200}
+    RETENTION_POLICIES = {'lookup_last_type': {'max_age': 7 * 24 * 3600}, 'LOGVIEW': {'keep_last': 100}}
+    RETENTION_INTERVAL = 3600
+    RETENTION_INCOMPLETE_TTL = 24 * 3600  # โฟลเดอร์การรันที่ไม่มี manifest (รันไม่สำเร็จ)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,6 +70,48 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config.from_object(Config)
 
+job_manager = JobManager(
+    max_workers=Config.JOB_WORKERS,
+    concurrency=Config.JOB_CONCURRENCY,
+    default_concurrency=Config.DEFAULT_JOB_CONCURRENCY,
+    history=Config.JOB_HISTORY,
+    cpu_workers=Config.CPU_WORKERS,
+)
+
+result_cache.configure(max_bytes=Config.RESULT_CACHE_MAX_BYTES, max_items=Config.RESULT_CACHE_MAX_ITEMS)
+metrics.configure(history=Config.METRICS_HISTORY)
+upload_store.configure(root=Config.UPLOAD_STORE_DIR, max_file_size=Config.MAX_FILE_SIZE,
+                       chunk_size=Config.UPLOAD_CHUNK_SIZE, session_ttl=Config.UPLOAD_SESSION_TTL)
+run_cache.configure(path=Config.RUN_CACHE_INDEX, max_entries=Config.RUN_CACHE_MAX_ENTRIES)
+retention.configure(base_dir=Config.BASE_DIR, default_policy=Config.RETENTION_DEFAULT_POLICY,
+                    policies=Config.RETENTION_POLICIES, interval=Config.RETENTION_INTERVAL,
+                    incomplete_ttl=Config.RETENTION_INCOMPLETE_TTL)
+
+def sweep_upload_store():
+    """ลบการอัปโหลดที่ค้างและไฟล์อัปโหลดที่ไม่มีผลในแคชผลการรันอ้างอิง"""
+    sessions = upload_store.cleanup_sessions()
+    result = upload_store.evict(max_bytes=Config.UPLOAD_STORE_MAX_BYTES, max_age=Config.UPLOAD_STORE_MAX_AGE,
+                                keep=run_cache.referenced_inputs())
+    return dict(result, expired_sessions=sessions)
+
+retention.add_task('upload_store', sweep_upload_store)
+
+def start_retention():
+    """
+    เริ่ม thread ลบผลลัพธ์เก่าตาม policy (รอบแรกสร้าง index ของผลลัพธ์ที่เก็บไว้) ถ้ายังไม่ได้เริ่มใน process นี้
+    - python app.py แบบ debug: process แม่ของ reloader ไม่รับ request จึงไม่ต้องเริ่ม (process ลูกมี WERKZEUG_RUN_MAIN)
+    - gunicorn --preload: thread ที่เริ่มก่อน fork ไม่ติดไปกับ worker จึงเรียกซ้ำทุก request (เริ่มใหม่ถ้ายังไม่มี)
+    - worker ของ process pool แบบ spawn (Windows) import app.py ใหม่เป็น __mp_main__ ไม่ต้องเริ่ม
+    """
+    if not Config.RETENTION_ENABLED or multiprocessing.parent_process() is not None:
+        return
+    if __name__ == "__main__" and Config.DEBUG and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return
+    retention.start()
+
+start_retention()
+app.before_request(start_retention)
+
 # Utility Classes
 class FileUtils:
     @staticmethod
@@ -48,6 +133,11 @@ class FileUtils:
             file_ext = os.path.splitext(file_path)[1].lower()
             
             if file_ext in ['.xlsx', '.xls']:
+                # ใช้ไฟล์ Feather ที่ function เขียนคู่กับ Excel ถ้ามี
+                df = read_sidecar(file_path)
+                if df is not None:
+                    return df, None
+                
                 # สำหรับไฟล์ Excel
                 try:
                     # ลองใช้ openpyxl สำหรับ .xlsx
@@ -110,6 +200,7 @@ class FileUtils:
         
         try:
             df.to_excel(file_path, index=False, engine='openpyxl')
+            write_sidecar(file_path, df)
         except:
             # ถ้าเซฟ Excel ไม่ได้ เซฟเป็น CSV
             filename = f"{prefix}_{timestamp}.csv"
@@ -207,6 +298,160 @@ def get_folder_files():
             "message": str(e)
         })
 
+def make_run_key(func_name, module, input_dir, known_digests=None):
+    """
+    key ของการรัน function กับไฟล์ใน input_dir (ใช้รวมงานที่เหมือนกันและค้นแคชผลการรัน)
+    คำนวณภายใน job เพราะต้องอ่านไฟล์ input ทั้งหมดเพื่อ hash (ไฟล์ใน known_digests ไม่ต้องอ่าน)
+    Returns:
+        tuple: (key หรือ None ถ้าคำนวณไม่ได้, module ใช้แคชผลการรันได้หรือไม่)
+    """
+    try:
+        with stage('run_key'):
+            return run_cache.make_key(func_name, module, input_dir, known_digests), run_cache.cacheable(module)
+    except Exception as e:
+        # อ่านไฟล์ไม่ได้: รันตามปกติ (ข้อผิดพลาดจริงจะแสดงตอนรัน)
+        logger.warning(f"Cannot compute run key for {func_name}: {e}")
+        return None, False
+
+def run_function_job(func_name, input_dir, output_dir, input_digests=None, reset_state=False):
+    """
+    รัน function module (ทำงานใน background job)
+    - input และ module เดิมที่เคยรันแล้ว: คืนผลลัพธ์เดิมจากแคชผลการรัน (result["cached"] = True)
+    - มีงานที่ function และ input เหมือนกันกำลังรันอยู่: รอผลจากงานนั้นแทนการรันซ้ำ
+    Args:
+        input_digests: {ชื่อไฟล์: sha256} ของไฟล์ input ที่รู้อยู่แล้ว (file_id ของ upload store)
+        reset_state: ไม่ใช้สถานะที่สะสมจากการรันก่อน (SHARED_STATE) เริ่มสะสมใหม่จากไฟล์ชุดนี้
+    Returns:
+        dict: func_name, output_dir, filename (path ของตารางหลักเทียบกับ output_dir), run_id และ manifest
+    """
+    try:
+        module = importlib.import_module(f"functions.{func_name}")
+        run_key, cacheable = make_run_key(func_name, module, input_dir, input_digests)
+        if run_key and reset_state:
+            run_key += ":reset"
+        cache_key = run_key if cacheable else None
+
+        def compute():
+            cached = run_cache.get(cache_key) if cache_key else None
+            if cached:
+                logger.info(f"⚡ {func_name}: ใช้ผลลัพธ์จากการรันครั้งก่อนที่ใช้ไฟล์เดียวกัน")
+                return dict(cached, cached=True)
+            result = execute_function(func_name, module, input_dir, output_dir, reset_state)
+            if cache_key:
+                run_cache.put(cache_key, result, (input_digests or {}).values())
+            return result
+
+        if run_key is None:
+            return compute()
+        return job_manager.run_once(run_key, compute)
+    finally:
+        # ลบไฟล์ชั่วคราวเสมอ
+        if input_dir and os.path.exists(input_dir):
+            shutil.rmtree(input_dir)
+
+def execute_function(func_name, module, input_dir, output_dir, reset_state=False):
+    """
+    รัน module.run หนึ่งครั้ง
+    แต่ละการรันเขียนผลลงโฟลเดอร์ของตัวเอง (output_<func>/runs/<run_id>) แล้วใช้ manifest หาไฟล์ผลลัพธ์
+    """
+    run_id, run_dir = create_run_dir(output_dir)
+    logger.info(f"Running function: {func_name}")
+    logger.info(f"Input directory: {input_dir}")
+    logger.info(f"Output directory: {run_dir}")
+    
+    if reset_state:
+        logger.info(f"{func_name}: เริ่มสถานะใหม่ ไม่ใช้ข้อมูลที่สะสมจากการรันก่อน")
+    else:
+        restore_shared_state(module, output_dir, run_dir)
+    # เก็บผลวัดทุกขั้นตอนที่ module รายงานระหว่างรัน
+    with metrics.track_run(func_name):
+        module.run(input_dir, run_dir)
+        with stage('manifest') as s:
+            manifest = build_manifest(func_name, run_id, run_dir)
+            s.rows = len(manifest["artifacts"])
+    
+    publish_shared_outputs(module, run_dir, output_dir)
+    if not manifest["primary"]:
+        raise RuntimeError("ไม่พบไฟล์ผลลัพธ์ใน output")
+    retention.register_run(func_name, run_id, run_dir, manifest)
+    
+    return {
+        "func_name": func_name,
+        "output_dir": output_dir,
+        "filename": f"{RUNS_DIR}/{run_id}/{manifest['primary']}",
+        "run_id": run_id,
+        "manifest": manifest,
+    }
+
+def get_output_dir(func_name):
+    """โฟลเดอร์ผลลัพธ์ของ function (lookup_last_type ใช้โฟลเดอร์ของตัวเอง)"""
+    if func_name == 'lookup_last_type':
+        return os.path.join(Config.BASE_DIR, AppConstants.OUTPUT_DIR_LOOKUP)
+    return os.path.join(Config.BASE_DIR, f"output_{func_name}")
+
+def resolve_output_file(func_name, filename):
+    """
+    path ของไฟล์ผลลัพธ์จากชื่อที่อ้างอิงเทียบกับโฟลเดอร์ output (เช่น runs/<run_id>/Summary.csv)
+    Returns:
+        str: path ของไฟล์ หรือ None ถ้าชื่อชี้ออกนอกโฟลเดอร์ output
+    """
+    output_dir = os.path.abspath(get_output_dir(func_name))
+    file_path = os.path.abspath(os.path.join(output_dir, filename))
+    if file_path == output_dir or os.path.commonpath([output_dir, file_path]) != output_dir:
+        return None
+    return file_path
+
+def find_output_file(func_name, filename):
+    """path ของไฟล์ผลลัพธ์: หาจาก index ของ retention ก่อน ถ้าไม่มี (เช่น Last_Type.xlsx) ใช้ resolve_output_file"""
+    return retention.resolve(func_name, filename) or resolve_output_file(func_name, filename)
+
+def load_result_table(func_name, filename):
+    """
+    หาตารางผลลัพธ์สำหรับแบ่งหน้า จากแคชก่อน (function ลงทะเบียนไว้ หรือเคยอ่านแล้ว)
+    ถ้าไม่มีหรือไฟล์ถูกแก้ไขจะอ่านจากไฟล์
+    Returns:
+        tuple: (TableView หรือ None, warning message)
+    """
+    file_path = find_output_file(func_name, filename)
+    if file_path is None:
+        return None, "ไม่พบไฟล์ผลลัพธ์"
+    return result_cache.get_view(file_path, FileUtils.read_file_safely)
+
+def render_function_result(func_name, output_dir, filename):
+    """แสดงไฟล์ผลลัพธ์ของ function เป็นตาราง (ข้อมูลแต่ละหน้าโหลดจาก /api/results)"""
+    download_link = url_for("download_file", func_name=func_name, filename=filename)
+
+    try:
+        # อ่านไฟล์ผลลัพธ์ครั้งเดียวแล้วเก็บไว้ให้ API แบ่งหน้า
+        view, read_warning = load_result_table(func_name, filename)
+        
+        if view is not None:
+            # แสดงคำเตือนถ้าอ่านไฟล์มีปัญหา
+            if read_warning:
+                flash(read_warning, "warning")
+            
+            flash("ประมวลผลสำเร็จ", "success")
+            return render_template("result.html", 
+                                 columns=view.columns, 
+                                 data_url=url_for("get_result_page", func_name=func_name, filename=filename),
+                                 download_link=download_link,
+                                 total_records=len(view),
+                                 func_name=func_name)
+        else:
+            flash(f"ไม่สามารถแสดงตารางได้: {read_warning}", "warning")
+            return render_template("result.html", 
+                                 columns=None, 
+                                 download_link=download_link,
+                                 func_name=func_name)
+            
+    except Exception as e:
+        logger.error(f"Error displaying table: {e}")
+        flash(f"ไม่สามารถแสดงตารางได้: {str(e)}", "warning")
+        return render_template("result.html", 
+                             columns=None, 
+                             download_link=download_link,
+                             func_name=func_name)
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     functions = list_functions()
@@ -222,6 +467,9 @@ def index():
             # Check input method
             input_method = request.form.get('inputMethod', 'upload')
             temp_input = None
+            input_digests = None
+            # PNP_CHANG_TYPE สะสมไฟล์ทุกเดือนที่เคยส่ง: ติ๊ก "ล้างข้อมูลที่สะสมไว้" เพื่อเริ่มใหม่จากไฟล์ชุดนี้
+            reset_state = request.form.get('reset_state') in ('on', 'true', '1')
             
             if input_method == 'folder':
                 # Handle folder-based file selection
@@ -234,49 +482,56 @@ def index():
                 
                 selected_filenames = selected_files_str.split(',')
                 
-                # Create temporary directory and copy selected files
+                # Create temporary directory and link (or copy) selected files
                 temp_input = tempfile.mkdtemp()
                 try:
-                    copied_files = 0
-                    for filename in selected_filenames:
-                        if filename.strip():  # Skip empty strings
-                            source_path = os.path.join(selected_folder, filename.strip())
-                            if os.path.exists(source_path):
-                                dest_path = os.path.join(temp_input, filename.strip())
-                                shutil.copy2(source_path, dest_path)
-                                copied_files += 1
-                                logger.info(f"Copied file: {filename.strip()}")
+                    with stage('stage_inputs') as s:
+                        staged = stage_files(selected_folder, selected_filenames, temp_input,
+                                             link=Config.LINK_FOLDER_INPUTS)
+                        s.rows = len(staged)
                     
-                    if copied_files == 0:
+                    if not staged:
                         flash("ไม่พบไฟล์ที่เลือกในโฟลเดอร์", "error")
                         if temp_input:
                             shutil.rmtree(temp_input)
                         return redirect(url_for("index"))
-                    
-                    logger.info(f"Successfully copied {copied_files} files to temp directory")
                         
                 except Exception as e:
-                    logger.error(f"Error copying files: {e}")
+                    logger.error(f"Error staging files: {e}")
                     if temp_input and os.path.exists(temp_input):
                         shutil.rmtree(temp_input)
                     raise e
                     
             else:
-                # Handle normal file upload
+                # Handle file upload: ไฟล์ที่อัปโหลดแบบแบ่งช่วงเข้า upload store แล้วส่งมาแค่ file_id
+                uploaded_files = request.form.get('uploaded_files')
                 files = request.files.getlist("input_files")
-                if not files or all(f.filename == "" for f in files):
+                if not uploaded_files and (not files or all(f.filename == "" for f in files)):
                     flash("กรุณาเลือกไฟล์ก่อน", "error")
                     return redirect(url_for("index"))
                 
-                # Create temporary directory and save uploaded files
+                # Create temporary directory and link uploaded files from the store
                 temp_input = tempfile.mkdtemp()
                 try:
-                    for f in files:
-                        if f.filename:
-                            file_path = os.path.join(temp_input, f.filename)
-                            f.save(file_path)
-                            logger.info(f"Saved uploaded file: {f.filename}")
-                            
+                    if uploaded_files:
+                        entries = parse_upload_list(uploaded_files)
+                    else:
+                        # ฟอร์มอัปโหลดปกติ (ไม่มี JavaScript): เก็บเข้า store ด้วย จำกัดขนาดและไม่เก็บไฟล์ซ้ำ
+                        entries = [(upload_store.save_stream(f.stream, f.filename), safe_filename(f.filename))
+                                   for f in files if f.filename]
+                    
+                    # file_id คือ sha256 ของเนื้อหาไฟล์ ใช้เป็น key ของการรันได้โดยไม่ต้อง hash ซ้ำ
+                    input_digests = {}
+                    for file_id, filename in entries:
+                        if filename in input_digests:
+                            continue
+                        method = upload_store.stage(file_id, temp_input, filename)
+                        input_digests[filename] = file_id
+                        logger.info(f"Staged uploaded file: {filename} ({method})")
+                
+                except UploadError as e:
+                    flash(str(e), "error")
+                    return redirect(url_for("index"))
                 except Exception as e:
                     logger.error(f"Error saving uploaded files: {e}")
                     if temp_input and os.path.exists(temp_input):
@@ -289,88 +544,186 @@ def index():
             # Ensure output directory exists
             os.makedirs(output_dir, exist_ok=True)
             
-            # Import and run function
-            logger.info(f"Running function: {func_name}")
-            logger.info(f"Input directory: {temp_input}")
-            logger.info(f"Output directory: {output_dir}")
-            
-            module = importlib.import_module(f"functions.{func_name}")
-            module.run(temp_input, output_dir)
-            
-            # Find output files
-            output_files = [f for f in os.listdir(output_dir) if f.endswith((".xlsx", ".csv"))]
-            if not output_files:
-                flash("ไม่พบไฟล์ผลลัพธ์ใน output", "error")
-                return redirect(url_for("index"))
-
-            # Get latest file
-            output_files.sort(key=lambda x: os.path.getmtime(os.path.join(output_dir, x)), reverse=True)
-            output_fp = os.path.join(output_dir, output_files[0])
-            download_link = url_for("download_file", func_name=func_name, filename=output_files[0])
-
-            # Handle table display
-            show_table = True
-            if show_table:
-                try:
-                    # อ่านไฟล์ผลลัพธ์เพื่อแสดงเป็นตาราง
-                    df, read_warning = FileUtils.read_file_safely(output_fp)
-                    
-                    if df is not None:
-                        # แสดงคำเตือนถ้าอ่านไฟล์มีปัญหา
-                        if read_warning:
-                            flash(read_warning, "warning")
-                        
-                        # เพิ่มเลขลำดับให้แต่ละแถว
-                        df.index = range(1, len(df) + 1)
-                        
-                        # สร้างตาราง HTML
-                        table_html = df.to_html(
-                            classes="result-table table table-striped table-hover",
-                            table_id="dataTable",
-                            index=True,
-                            border=0,
-                            escape=False
-                        )
-                        
-                        flash("ประมวลผลสำเร็จ", "success")
-                        return render_template("result.html", 
-                                             table_html=table_html, 
-                                             download_link=download_link,
-                                             total_records=len(df),
-                                             func_name=func_name)
-                    else:
-                        flash(f"ไม่สามารถแสดงตารางได้: {read_warning}", "warning")
-                        return render_template("result.html", 
-                                             table_html=None, 
-                                             download_link=download_link,
-                                             func_name=func_name)
-                        
-                except Exception as e:
-                    logger.error(f"Error displaying table: {e}")
-                    flash(f"ไม่สามารถแสดงตารางได้: {str(e)}", "warning")
-                    return render_template("result.html", 
-                                         table_html=None, 
-                                         download_link=download_link,
-                                         func_name=func_name)
-            else:
-                flash("ประมวลผลสำเร็จ สามารถดาวน์โหลดไฟล์ผลลัพธ์ได้", "success")
-                return render_template("result.html", 
-                                     table_html=None, 
-                                     download_link=download_link,
-                                     func_name=func_name)
+            # รัน function เป็น background job แล้วส่งผู้ใช้ไปหน้าสถานะทันที
+            # (job เป็นผู้ hash input เพื่อค้นแคชผลการรันและรวมกับงานที่เหมือนกันที่กำลังรันอยู่)
+            job = job_manager.submit(func_name, run_function_job,
+                                     func_name, temp_input, output_dir, input_digests, reset_state)
+            temp_input = None  # job เป็นผู้ลบโฟลเดอร์ชั่วคราวเมื่อรันเสร็จ
+            return redirect(url_for("job_status", job_id=job.id))
                 
         except Exception as e:
             logger.error(f"Error in index route: {e}")
             flash(f"เกิดข้อผิดพลาด: {str(e)}", "error")
             return redirect(url_for("index"))
         finally:
-            # ลบไฟล์ชั่วคราวเสมอ
+            # ลบไฟล์ชั่วคราวถ้ายังไม่ได้ส่งต่อให้ job
             if temp_input and os.path.exists(temp_input):
                 shutil.rmtree(temp_input)
     
     # ถ้าเป็น GET request ให้แสดงหน้าหลัก
     return render_template("index.html", functions=functions)
 
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """หน้ารอผลของ background job (redirect ไปหน้าผลลัพธ์เมื่อเสร็จ)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        flash("ไม่พบงานที่ต้องการ หรืองานหมดอายุแล้ว", "error")
+        return redirect(url_for("index"))
+    
+    if job.status == Job.DONE:
+        return redirect(url_for("job_result", job_id=job_id))
+    if job.status == Job.FAILED:
+        flash(f"เกิดข้อผิดพลาด: {job.error}", "error")
+        return redirect(url_for("index"))
+    
+    return render_template("job_status.html", job=job.to_dict())
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    """แสดงผลลัพธ์ของ job ที่เสร็จแล้ว"""
+    job = job_manager.get(job_id)
+    if job is None or job.status != Job.DONE:
+        return redirect(url_for("job_status", job_id=job_id))
+    
+    result = job.result
+    if result.get("cached"):
+        flash("ใช้ผลลัพธ์จากการรันครั้งก่อนที่ใช้ไฟล์เดียวกัน", "info")
+    return render_function_result(result["func_name"], result["output_dir"], result["filename"])
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """สถานะของ job สำหรับ polling"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "message": "ไม่พบงานที่ต้องการ"
+        }), 404
+    
+    data = job.to_dict()
+    if job.status == Job.DONE:
+        data["result_url"] = url_for("job_result", job_id=job_id)
+        data["manifest"] = job.result.get("manifest")
+    return jsonify({
+        "success": True,
+        "job": data
+    })
+
+@app.route("/api/jobs")
+def get_jobs():
+    """จำนวนงานที่กำลังรันและรอคิวของแต่ละ function"""
+    return jsonify({
+        "success": True,
+        **job_manager.stats()
+    })
+
+@app.route("/api/results/<func_name>/<path:filename>")
+def get_result_page(func_name, filename):
+    """ข้อมูลตารางผลลัพธ์ทีละหน้าสำหรับ DataTables (serverSide)"""
+    params = parse_datatables_args(request.args)
+    try:
+        view, read_warning = load_result_table(func_name, filename)
+        if view is None:
+            return jsonify({
+                "draw": params["draw"],
+                "error": read_warning or "ไม่พบไฟล์ผลลัพธ์"
+            }), 404
+        
+        records_filtered, rows = view.query(
+            start=params["start"],
+            length=params["length"],
+            search=params["search"],
+            order_col=params["order_col"],
+            order_dir=params["order_dir"],
+        )
+        return jsonify({
+            "draw": params["draw"],
+            "recordsTotal": len(view),
+            "recordsFiltered": records_filtered,
+            "data": rows
+        })
+    except Exception as e:
+        logger.error(f"Error getting result page: {e}")
+        return jsonify({
+            "draw": params["draw"],
+            "error": str(e)
+        }), 500
+
+@app.route("/api/cache")
+def get_cache_stats():
+    """สถิติแคชผลลัพธ์ (hit/miss, จำนวนรายการ, หน่วยความจำที่ใช้) และแคชผลการรัน"""
+    return jsonify({
+        "success": True,
+        "result_cache": result_cache.stats(),
+        "run_cache": run_cache.stats()
+    })
+
+@app.route("/api/state/<func_name>/reset", methods=["POST"])
+def reset_function_state(func_name):
+    """ลบสถานะที่ function สะสมจากการรันก่อนๆ (เช่น Last_Type_state.pkl ของ PNP_CHANG_TYPE)"""
+    if func_name not in list_functions():
+        return jsonify({"success": False, "message": "ไม่พบฟังก์ชันที่ระบุ"}), 404
+    module = importlib.import_module(f"functions.{func_name}")
+    removed = clear_shared_state(module, get_output_dir(func_name))
+    return jsonify({"success": True, "removed": removed})
+
+@app.route("/api/retention")
+def get_retention():
+    """
+    policy และขนาดผลลัพธ์ที่เก็บไว้ของแต่ละ function พร้อมผลการตรวจครั้งล่าสุด
+    Query: func (แสดงรายการผลลัพธ์ที่เก็บไว้ของ function นี้)
+    """
+    func_name = request.args.get("func") or None
+    data = {"success": True, **retention.stats()}
+    if func_name:
+        data["runs"] = retention.runs(func_name)
+    return jsonify(data)
+
+@app.route("/api/metrics")
+def get_metrics():
+    """
+    ผลวัดเวลา/CPU/หน่วยความจำแต่ละขั้นตอนของการรันล่าสุด (ใหม่สุดก่อน)
+    Query: limit (จำนวนการรัน), func (กรองตามชื่อ function)
+    """
+    limit = request.args.get("limit", type=int)
+    func_name = request.args.get("func") or None
+    return jsonify({
+        "success": True,
+        "runs": metrics.recent(limit=limit, func_name=func_name)
+    })
+
+@app.route("/api/uploads", methods=["POST"])
+def create_upload():
+    """
+    เริ่มอัปโหลดไฟล์แบบแบ่งช่วง
+    Body (JSON): filename, size, sha256 (ถ้ามีและเคยอัปโหลดแล้ว จะตอบ complete ทันทีไม่ต้องส่งข้อมูล)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = upload_store.create_session(data.get("filename"), data.get("size"), data.get("sha256"))
+    except UploadError as e:
+        return jsonify({"success": False, "message": str(e)}), e.status
+    return jsonify({"success": True, **result})
+
+@app.route("/api/uploads/<upload_id>", methods=["GET", "PUT"])
+def upload_chunk(upload_id):
+    """
+    GET: จำนวน byte ที่ได้รับแล้ว (ใช้ส่งต่อจากจุดที่ค้างหลังการเชื่อมต่อหลุด)
+    PUT ?offset=N: ข้อมูลช่วงถัดไปเป็น body ตอบ complete พร้อม file_id เมื่อได้รับครบ
+    """
+    try:
+        if request.method == "GET":
+            result = upload_store.session_status(upload_id)
+        else:
+            offset = request.args.get("offset", type=int)
+            if offset is None:
+                raise UploadError("ต้องระบุ offset")
+            result = upload_store.write_chunk(upload_id, offset, request.stream)
+    except UploadError as e:
+        return jsonify({"success": False, "message": str(e)}), e.status
+    return jsonify({"success": True, **result})
+
 @app.route("/result")
 def result():
     """
@@ -380,18 +733,13 @@ def result():
     flash("ไม่พบข้อมูลผลลัพธ์", "error")
     return redirect(url_for("index"))
 
-@app.route("/download/<func_name>/<filename>")
+@app.route("/download/<func_name>/<path:filename>")
 def download_file(func_name, filename):
     """Download processed files"""
     try:
-        if func_name == 'lookup_last_type':
-            output_dir = os.path.join(Config.BASE_DIR, "output_lookup_last_type")
-        else:
-            output_dir = os.path.join(Config.BASE_DIR, f"output_{func_name}")
-        
-        file_path = os.path.join(output_dir, filename)
+        file_path = find_output_file(func_name, filename)
         
-        if not os.path.exists(file_path):
+        if file_path is None or not os.path.isfile(file_path):
             flash("ไม่พบไฟล์ที่ต้องการดาวน์โหลด", "error")
             return redirect(url_for("index"))
         
@@ -403,7 +751,8 @@ def download_file(func_name, filename):
 
 @app.route("/lookup_last_type", methods=["GET", "POST"]) 
 def lookup_last_type_route():
-    table_html = None
+    columns = None
+    data_url = None
     download_link = None
     total_records = 0
     
@@ -458,23 +807,20 @@ def lookup_last_type_route():
             os.makedirs(output_dir, exist_ok=True)
             
             logger.info("🔍 เริ่มค้นหาข้อมูล...")
-            df_result = lookup_last_type(file_path, output_dir)
+            # ใช้ DataFrame ที่อ่านไว้แล้ว ค้นหาจากดัชนี Last_Type ในหน่วยความจำ
+            with metrics.track_run('lookup_last_type'), stage('lookup', rows=len(temp_df)):
+                df_result = lookup_last_type_df(temp_df, output_dir)
             
             if df_result is not None and not df_result.empty:
-                # เพิ่มเลขแถว
-                df_result.index = range(1, len(df_result) + 1)
-                table_html = df_result.to_html(
-                    classes="result-table table table-striped table-hover", 
-                    table_id="dataTable",
-                    index=True, 
-                    border=0,
-                    escape=False
-                )
-                
                 # Save result using utility
-                download_dir = os.path.join(Config.BASE_DIR, "output_lookup_last_type")
+                download_dir = get_output_dir('lookup_last_type')
                 filename, result_path = FileUtils.save_result_file(df_result, download_dir, "last_type_result")
+                retention.register_file('lookup_last_type', filename, result_path)
                 
+                # เก็บผลลัพธ์ไว้ให้ API แบ่งหน้า ไม่ต้องสร้างตาราง HTML ทั้งก้อน
+                view = result_cache.register(result_path, df_result)
+                columns = view.columns
+                data_url = url_for('get_result_page', func_name='lookup_last_type', filename=filename)
                 download_link = url_for('download_file', func_name='lookup_last_type', filename=filename)
                 total_records = len(df_result)
                 
@@ -504,7 +850,8 @@ def lookup_last_type_route():
                 shutil.rmtree(temp_dir)
     
     return render_template("lookup_last_type.html", 
-                         table_html=table_html, 
+                         columns=columns, 
+                         data_url=data_url,
                          download_link=download_link,
                          total_records=total_records)
 
@@ -592,25 +939,6 @@ class FileProcessingService:
         
         return True, None
     
-    @staticmethod
-    def get_output_files(output_dir):
-        """
-        หาไฟล์ผลลัพธ์ในโฟลเดอร์ output
-        Args:
-            output_dir: path ของโฟลเดอร์ output
-        Returns:
-            list: รายการชื่อไฟล์ (เรียงจากใหม่ไปเก่า)
-        """
-        if not os.path.exists(output_dir):
-            return []
-        
-        # หาไฟล์ที่เป็น Excel หรือ CSV
-        output_files = [f for f in os.listdir(output_dir) if f.endswith((".xlsx", ".csv"))]
-        
-        # เรียงจากไฟล์ใหม่ไปเก่า (ตาม modified time)
-        output_files.sort(key=lambda x: os.path.getmtime(os.path.join(output_dir, x)), reverse=True)
-        return output_files
-    
     @staticmethod
     def cleanup_temp_files(temp_dir):
         """
@@ -626,34 +954,6 @@ class TableRenderingService:
     Service สำหรับสร้างและจัดการตาราง HTML
     """
     
-    @staticmethod
-    def generate_table_html(df, include_index=True):
-        """
-        สร้าง HTML table จาก DataFrame
-        Args:
-            df: pandas DataFrame
-            include_index: แสดงเลขลำดับหรือไม่
-        Returns:
-            str: HTML table string หรือ None ถ้า df ว่าง
-        """
-        if df is None or df.empty:
-            return None
-        
-        # เพิ่มเลขลำดับถ้าต้องการ
-        if include_index:
-            df.index = range(1, len(df) + 1)
-        
-        # สร้าง HTML table พร้อม Bootstrap CSS classes
-        table_html = df.to_html(
-            classes="result-table table table-striped table-hover",  # CSS classes
-            table_id="dataTable",                                    # ID สำหรับ JavaScript/CSS
-            index=include_index,                                     # แสดงเลขลำดับ
-            border=0,                                               # ไม่มีขอบ
-            escape=False                                            # อนุญาต HTML tags
-        )
-        
-        return table_html
-    
     @staticmethod
     def create_download_link(func_name, filename):
         """
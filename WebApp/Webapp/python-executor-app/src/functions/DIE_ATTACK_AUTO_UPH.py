@@ -4,7 +4,46 @@ import glob
 import numpy as np
 from pathlib import Path
 import time
+import multiprocessing
 from datetime import datetime  
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+try:
+    from services.result_cache import register_result
+    from services.columnar import write_sidecar
+    from services.metrics import stage, call_with_stages, record_stages
+    from services.job_queue import cpu_budget, process_pool
+    cpu_lease = cpu_budget.lease
+except ImportError:
+    # รันไฟล์นี้เดี่ยวๆ นอก app: ไม่มีแคชผลลัพธ์ ไฟล์ Feather คู่กับ Excel และการวัดผลแต่ละขั้นตอน
+    def register_result(path, df):
+        return None
+
+    def write_sidecar(path, df, sheet_name=None):
+        return None
+
+    @contextmanager
+    def stage(name, rows=None, **fields):
+        yield SimpleNamespace(rows=rows)
+
+    def call_with_stages(func, *args, **kwargs):
+        return func(*args, **kwargs), []
+
+    def record_stages(stages):
+        return None
+
+    @contextmanager
+    def cpu_lease(wanted):
+        yield max(1, min(wanted, os.cpu_count() or 1))
+
+    def process_pool(workers):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+# จำนวน process สูงสุดสำหรับอ่านหลายไฟล์พร้อมกัน (1 = อ่านทีละไฟล์) ได้จริงไม่เกินงบที่เหลือของ server
+MAX_WORKERS = int(os.environ.get('DIE_ATTACH_WORKERS', os.cpu_count() or 1))
+REQUIRED_COLUMNS = ['bom_no', 'Machine_Model', 'optn_code', 'operation']
 
 def validate_input_file(input_path):
     """ตรวจสอบไฟล์ input"""
@@ -91,21 +130,171 @@ def remove_outliers_auto(df_model, max_iter=20):
     current_df['Outlier_Method'] = f'IQR-Z-Score Loop ×{max_iter}+'
     return current_df
 
-def process_die_attach_data(input_path, output_dir):
-    """ฟังก์ชันหลักสำหรับประมวลผลข้อมูล Die Attach"""
-    try:
-        print(f"🔍 เริ่มประมวลผล: {input_path}")
-        print(f"📁 Output directory: {output_dir}")
-        
-        # ตรวจสอบไฟล์ input
-        validate_input_file(input_path)
-        
-        # สร้าง output directory ถ้าไม่มี
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"✅ สร้าง output directory: {output_dir}")
-        
-        print("📊 กำลังโหลดข้อมูล...")
-        # อ่านข้อมูล
+# ---------- ตัด outliers ทุกกลุ่มพร้อมกัน ----------
+
+GROUP_COLS = ['bom_no', 'Machine_Model']
+SUMMARY_COLS = GROUP_COLS + ['optn_code', 'operation', 'Wire Per Hour']
+# กลุ่มที่มีข้อมูลน้อยกว่านี้ไม่ตัด outliers
+MIN_ROWS_TO_TRIM = 15
+
+
+def _kept_quantile(sorted_values, group_ids, kept, n_groups, q):
+    """
+    quantile แบบ linear (สูตรเดียวกับ Series.quantile) ของค่าที่ยังเหลือในแต่ละกลุ่ม
+    sorted_values เรียงตามกลุ่มแล้วตามค่า ค่าที่เหลือของแต่ละกลุ่มจึงเรียงอยู่แล้ว ไม่ต้อง sort ใหม่
+    """
+    counts = np.bincount(group_ids, weights=kept, minlength=n_groups).astype(np.int64)
+    cum_kept = np.cumsum(kept)
+    group_starts = np.searchsorted(group_ids, np.arange(n_groups))
+    kept_before = np.concatenate(([0], cum_kept))[group_starts]
+
+    virtual = (counts - 1) * q
+    previous = np.floor(virtual)
+    gamma = virtual - previous
+    previous = previous.astype(np.int64)
+    above = virtual >= counts - 1
+    previous[above] = counts[above] - 1
+    following = np.where(above, previous, previous + 1)
+
+    # ตำแหน่งของค่าลำดับที่ k (นับเฉพาะค่าที่เหลือ) ของแต่ละกลุ่ม
+    def kth(rank):
+        return np.searchsorted(cum_kept, kept_before + np.maximum(rank, 0) + 1).clip(max=len(sorted_values) - 1)
+
+    a = sorted_values[kth(previous)]
+    b = sorted_values[kth(following)]
+    diff = b - a
+    result = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    result[counts == 0] = np.nan
+    return result
+
+
+def _iqr_bounds(sorted_values, group_ids, kept, n_groups):
+    q1 = _kept_quantile(sorted_values, group_ids, kept, n_groups, 0.25)
+    q3 = _kept_quantile(sorted_values, group_ids, kept, n_groups, 0.75)
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def _has_outlier(values, group_ids, kept, lower, upper, n_groups):
+    # มีค่าที่เหลืออยู่นอกช่วง IQR หรือไม่ (แบบ has_outlier)
+    outside = kept & ((values < lower[group_ids]) | (values > upper[group_ids]))
+    return np.bincount(group_ids, weights=outside, minlength=n_groups) > 0
+
+
+def trim_outliers_by_group(values, group_ids, n_groups, max_iter=20):
+    """
+    ตัด outliers ด้วยการวนลูป Z-Score ±3 และ IQR แบบเดียวกับ remove_outliers_auto แต่ทำทุกกลุ่มพร้อมกัน
+    แต่ละรอบใช้ mask ของค่าที่ยังเหลือ และหยุดเฉพาะกลุ่มที่ไม่มี outlier แล้ว
+    Args:
+        values: ค่า UPH (ไม่มี NaN)
+        group_ids: เลขกลุ่มของแต่ละค่า (0..n_groups-1)
+        n_groups: จำนวนกลุ่ม
+        max_iter: จำนวนรอบสูงสุด
+    Returns:
+        tuple: (kept, methods)
+            kept: bool array ตามลำดับของ values ว่าค่านั้นเหลือหลังตัดหรือไม่
+            methods: Outlier_Method ของแต่ละกลุ่ม
+    """
+    values = np.asarray(values, dtype=float)
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+    order = np.lexsort((values, group_ids))
+    x, g = values[order], group_ids[order]
+    kept = np.ones(len(x), dtype=bool)
+
+    methods = np.full(n_groups, None, dtype=object)
+    small = np.bincount(g, minlength=n_groups) < MIN_ROWS_TO_TRIM
+    methods[small] = 'ไม่ตัด (ข้อมูลน้อย)'
+    active = ~small
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(max_iter):
+            if not active.any():
+                break
+
+            # Z-Score ±3 (mean/std ของค่าที่เหลือ ddof=1)
+            live = kept & active[g]
+            n = np.bincount(g, weights=live, minlength=n_groups)
+            mean = np.bincount(g, weights=np.where(live, x, 0), minlength=n_groups) / n
+            squares = np.where(live, (mean[g] - x) ** 2, 0)
+            std = np.sqrt(np.bincount(g, weights=squares, minlength=n_groups) / (n - 1))
+            std[n < 2] = np.nan
+
+            # std = 0 ไม่ตัดด้วย Z-Score (เหมือน apply_zscore คืนค่าเดิม) แต่ยังตรวจ IQR ต่อตามปกติ
+            rows = active[g] & (std[g] != 0)
+            z = (x[rows] - mean[g[rows]]) / std[g[rows]]
+            kept[rows] &= (z >= -3) & (z <= 3)
+
+            lower, upper = _iqr_bounds(x, g, kept, n_groups)
+            done = active & ~_has_outlier(x, g, kept, lower, upper, n_groups)
+            methods[done] = f'Z-Score Loop ×{i+1}'
+            active &= ~done
+
+            # IQR บนผลของ Z-Score
+            rows = active[g]
+            kept[rows] &= (x[rows] >= lower[g[rows]]) & (x[rows] <= upper[g[rows]])
+
+            lower, upper = _iqr_bounds(x, g, kept, n_groups)
+            done = active & ~_has_outlier(x, g, kept, lower, upper, n_groups)
+            methods[done] = f'IQR Loop ×{i+1}'
+            active &= ~done
+
+    methods[active] = f'IQR-Z-Score Loop ×{max_iter}+'
+    kept_by_row = np.empty_like(kept)
+    kept_by_row[order] = kept
+    return kept_by_row, methods
+
+
+def _kept_means(values, group_ids, kept, n_groups):
+    """
+    ค่าเฉลี่ยของค่าที่เหลือในแต่ละกลุ่ม
+    รวมตามลำดับแถวเดิมด้วย ndarray.sum แบบเดียวกับ Series.mean เพื่อให้ค่าที่ปัดเศษตรงกับวิธีเดิม
+    """
+    order = np.argsort(group_ids, kind='stable')
+    order = order[kept[order]]
+    kept_values = values[order]
+    counts = np.bincount(group_ids[order], minlength=n_groups)
+    ends = np.cumsum(counts)
+    sums = np.array([kept_values[end - count:end].sum() for count, end in zip(counts, ends)], dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / counts
+
+
+def summarize_uph_by_group(df, uph_col, max_iter=20):
+    """
+    Wire Per Hour ของแต่ละกลุ่ม bom_no × Machine_Model หลังตัด outliers (ทุกกลุ่มพร้อมกัน)
+    Returns:
+        pandas DataFrame: SUMMARY_COLS + Outlier_Method เรียงตามกลุ่มเหมือน groupby
+    """
+    grouped = df.groupby(GROUP_COLS)
+    n_groups = grouped.ngroups
+    group_ids = grouped.ngroup().to_numpy()
+    in_group = ~np.isnan(group_ids)
+    group_ids = np.where(in_group, group_ids, -1).astype(np.int64)
+
+    uph = pd.to_numeric(df[uph_col], errors='coerce').to_numpy(dtype=float)
+    valid = in_group & ~np.isnan(uph)
+    kept, methods = trim_outliers_by_group(uph[valid], group_ids[valid], n_groups, max_iter)
+    means = _kept_means(uph[valid], group_ids[valid], kept, n_groups)
+
+    # optn_code / operation จากแถวแรกของแต่ละกลุ่ม
+    positions = np.flatnonzero(in_group)
+    first = np.empty(n_groups, dtype=np.int64)
+    first[group_ids[positions][::-1]] = positions[::-1]
+
+    summary_df = grouped.size().index.to_frame(index=False)
+    for col in ['optn_code', 'operation']:
+        summary_df[col] = df[col].to_numpy()[first] if col in df.columns else ''
+    summary_df['Wire Per Hour'] = np.round(means, 2)
+    summary_df['Outlier_Method'] = methods
+    return summary_df
+
+
+# ---------- อ่านและรวมไฟล์ ----------
+
+def load_die_attach_file(input_path):
+    """อ่านไฟล์ Die Attach หนึ่งไฟล์ (Excel หรือ CSV)"""
+    validate_input_file(input_path)
+    with stage('load', file=os.path.basename(input_path)) as s:
         try:
             df = pd.read_excel(input_path)
         except Exception as e:
@@ -115,28 +304,134 @@ def process_die_attach_data(input_path, output_dir):
                 print("ℹ️ อ่านไฟล์เป็นรูปแบบ CSV")
             except:
                 raise Exception(f"ไม่สามารถอ่านไฟล์ได้: {str(e)}")
+        s.rows = len(df)
+    return df
+
+
+def check_die_attach_columns(df):
+    """ตรวจสอบว่ามีข้อมูลและคอลัมน์ที่จำเป็นครบ คืนชื่อคอลัมน์ UPH"""
+    if df.empty:
+        raise Exception("ไฟล์ข้อมูลว่างเปล่า")
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise Exception(f"ไม่พบคอลัมน์ที่จำเป็น: {missing_columns}")
+
+    col_map = {col.lower(): col for col in df.columns}
+    if 'uph' not in col_map:
+        raise Exception("ไม่พบคอลัมน์ UPH ในข้อมูล")
+    return col_map['uph']
+
+
+def load_die_attach_files(input_paths, workers=None):
+    """
+    อ่านไฟล์ Die Attach หลายไฟล์ใน process pool
+    Args:
+        input_paths: list ของ path ไฟล์
+        workers: จำนวน process (ค่าเริ่มต้น MAX_WORKERS)
+    Returns:
+        list: DataFrame (หรือ None ถ้าอ่านไม่ได้) ตามลำดับเดียวกับ input_paths
+    """
+    if workers is None:
+        workers = MAX_WORKERS
+    with cpu_lease(max(1, min(workers, len(input_paths)))) as workers:
+        return _load_die_attach_files(input_paths, workers)
+
+
+def _load_die_attach_files(input_paths, workers):
+    results = []
+    if workers == 1:
+        for path in input_paths:
+            try:
+                results.append(load_die_attach_file(path))
+            except Exception as e:
+                print(f"❌ อ่านไฟล์ {os.path.basename(path)} ผิดพลาด: {e}")
+                results.append(None)
+        return results
+
+    print(f"📂 อ่านไฟล์แบบขนาน {workers} processes")
+    with process_pool(workers) as executor:
+        # ผลวัดการอ่านใน worker ถูกส่งกลับมาเก็บเข้า run ของ process หลัก
+        futures = [executor.submit(call_with_stages, load_die_attach_file, path) for path in input_paths]
+        for path, future in zip(input_paths, futures):
+            try:
+                df, stages = future.result()
+                record_stages(stages)
+                results.append(df)
+            except Exception as e:
+                # ไฟล์เสียหรือ worker ล้ม ให้นับเป็นไฟล์ที่อ่านไม่ได้ ไม่กระทบไฟล์อื่น
+                print(f"❌ อ่านไฟล์ {os.path.basename(path)} ผิดพลาด: {e}")
+                results.append(None)
+    return results
+
+
+def merge_die_attach_files(input_paths, workers=None):
+    """
+    อ่านทุกไฟล์แล้วรวมเป็น DataFrame เดียว เพื่อจัดกลุ่มและตัด outliers ร่วมกันข้ามไฟล์
+    ไฟล์ที่อ่านไม่ได้หรือคอลัมน์ไม่ครบจะถูกข้ามพร้อมแจ้งเตือน
+    Returns:
+        tuple: (DataFrame ที่รวมแล้ว คอลัมน์ UPH ชื่อ 'UPH', list ของไฟล์ที่ใช้)
+    """
+    frames, used_files = [], []
+    for path, df in zip(input_paths, load_die_attach_files(input_paths, workers)):
+        if df is None:
+            continue
+        name = os.path.basename(path)
+        try:
+            uph_col = check_die_attach_columns(df)
+        except Exception as e:
+            print(f"⚠️ ข้ามไฟล์ {name}: {e}")
+            continue
+        print(f"  📄 {name}: {len(df)} แถว")
+        frames.append(df.rename(columns={uph_col: 'UPH'}))
+        used_files.append(path)
+
+    if not frames:
+        raise Exception("ไม่มีไฟล์ที่อ่านได้และมีคอลัมน์ครบ")
+
+    # คอลัมน์กลุ่มที่ชนิดข้อมูลไม่ตรงกันระหว่างไฟล์ (เช่น bom_no เป็นตัวเลขในบางไฟล์) แปลงเป็นข้อความเพื่อให้จัดกลุ่มร่วมกันได้
+    for col in GROUP_COLS:
+        if len({frame[col].dtype for frame in frames}) > 1:
+            frames = [frame.assign(**{col: frame[col].where(frame[col].isna(), frame[col].astype(str))})
+                      for frame in frames]
+    return pd.concat(frames, ignore_index=True, sort=False), used_files
+
+
+def process_die_attach_data(input_path, output_dir, workers=None):
+    """
+    ฟังก์ชันหลักสำหรับประมวลผลข้อมูล Die Attach
+    input_path เป็น path เดียวหรือ list ของ path ก็ได้ หลายไฟล์จะถูกอ่านแบบขนานแล้วรวมกลุ่มข้ามไฟล์ได้ไฟล์สรุปเดียว
+    """
+    try:
+        input_paths = [input_path] if isinstance(input_path, (str, os.PathLike)) else list(input_path)
+        print(f"🔍 เริ่มประมวลผล: {', '.join(str(path) for path in input_paths)}")
+        print(f"📁 Output directory: {output_dir}")
         
-        if df.empty:
-            raise Exception("ไฟล์ข้อมูลว่างเปล่า")
+        # ตรวจสอบไฟล์ input
+        if len(input_paths) == 1:
+            validate_input_file(input_paths[0])
         
-        print(f"📈 ขนาดข้อมูลเริ่มต้น: {len(df)} แถว")
-        print(f"📋 คอลัมน์ในข้อมูล: {list(df.columns)}")
+        # สร้าง output directory ถ้าไม่มี
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"✅ สร้าง output directory: {output_dir}")
         
-        # ตรวจสอบคอลัมน์ที่จำเป็น
-        required_columns = ['bom_no', 'Machine_Model', 'optn_code','operation']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise Exception(f"ไม่พบคอลัมน์ที่จำเป็น: {missing_columns}")
+        print("📊 กำลังโหลดข้อมูล...")
+        # อ่านข้อมูล (หลายไฟล์: อ่านแบบขนานแล้วรวมก่อนจัดกลุ่ม)
+        if len(input_paths) == 1:
+            df = load_die_attach_file(input_paths[0])
+            used_files = input_paths
+        else:
+            df, used_files = merge_die_attach_files(input_paths, workers)
+            print(f"✅ รวมข้อมูลจาก {len(used_files)}/{len(input_paths)} ไฟล์")
         
-        # ตรวจสอบคอลัมน์ UPH
-        col_map = {col.lower(): col for col in df.columns}
-        if 'uph' not in col_map:
-            raise Exception("ไม่พบคอลัมน์ UPH ในข้อมูล")
+        print(f"📈 ขนาดข้อมูลเริ่มต้น: {len(df)} แถว")
+        print(f"📋 คอลัมน์ในข้อมูล: {list(df.columns)}")
         
-        uph_col = col_map['uph']
+        # ตรวจสอบข้อมูล คอลัมน์ที่จำเป็น และคอลัมน์ UPH
+        uph_col = check_die_attach_columns(df)
         
         # จัดกลุ่มข้อมูล
-        grouped = df.groupby(['bom_no', 'Machine_Model'])
+        grouped = df.groupby(GROUP_COLS)
         
         # แสดงข้อมูล group
         print(f"\n🔢 จำนวน groups: {grouped.ngroups}")
@@ -147,60 +442,16 @@ def process_die_attach_data(input_path, output_dir):
         if grouped.ngroups == 0:
             raise Exception("ไม่พบข้อมูลสำหรับจัดกลุ่ม")
         
-        # ประมวลผลแต่ละ group และสร้างสรุปผลลัพธ์
+        # ตัด outliers ทุกกลุ่มพร้อมกัน แล้วสร้างสรุปผลลัพธ์
         print("\n🔧 === เริ่มการตัด outliers ===")
-        summary_results = []
-        
-        for name, group in grouped:
-            bom_no, machine_model = name
-            print(f"\n⚙️ กำลังประมวลผล BOM: {bom_no}, Machine: {machine_model}")
-            print(f"📊 ข้อมูลในกลุ่มนี้: {len(group)} แถว")
-            
-            # ดึงค่าจากแถวแรกของกลุ่ม
-            optn_code = group['optn_code'].iloc[0] if 'optn_code' in group.columns else ''
-            operation = group['operation'].iloc[0] if 'operation' in group.columns else ''
-            
-            original_count = len(group)
-            original_mean = group[uph_col].mean()
-            
-            try:
-                # ตัด outliers สำหรับกลุ่มนี้
-                cleaned_group = remove_outliers_auto(group.copy())
-                
-                # คำนวณสถิติหลังตัด outliers
-                cleaned_count = len(cleaned_group)
-                cleaned_mean = cleaned_group[uph_col].mean()
-                removed_count = original_count - cleaned_count
-                outlier_method = cleaned_group['Outlier_Method'].iloc[0] if len(cleaned_group) > 0 else 'Error'
-                
-                print(f"✅ ข้อมูลหลังตัด outliers: {cleaned_count} แถว")
-                print(f"📊 UPH เฉลี่ยเดิม: {original_mean:.2f}")
-                print(f"📊 UPH เฉลี่ยใหม่: {cleaned_mean:.2f}")
-                
-                # เพิ่มผลลัพธ์ลงใน summary
-                summary_results.append({
-                    'bom_no': bom_no,
-                    'Machine_Model': machine_model,
-                    'optn_code': optn_code,
-                    'operation': operation,
-                    'Wire Per Hour': round(cleaned_mean, 2)
-                })
-                
-            except Exception as e:
-                print(f"⚠️ เกิดข้อผิดพลาดกับกลุ่ม {name}: {str(e)}")
-                
-                # เพิ่มผลลัพธ์ที่เกิดข้อผิดพลาด
-                summary_results.append({
-                    'bom_no': bom_no,
-                    'Machine_Model': machine_model,
-                    'optn_code': optn_code,
-                    'operation': operation,
-                    'Wire Per Hour': round(original_mean, 2)
-                })
+        with stage('outlier_detection', rows=len(df), groups=grouped.ngroups):
+            summary_df = summarize_uph_by_group(df, uph_col)
+        print("📊 วิธีตัด outliers ที่ใช้:")
+        print(summary_df['Outlier_Method'].value_counts(dropna=False))
+        summary_df = summary_df[SUMMARY_COLS]
         
         # สร้าง DataFrame สรุปผลลัพธ์
-        if summary_results:
-            summary_df = pd.DataFrame(summary_results)
+        if not summary_df.empty:
             
             print(f"\n📋 === สรุปผลลัพธ์ ===")
             print(f"✅ จำนวนกลุ่มที่ประมวลผล: {len(summary_df)} กลุ่ม")
@@ -219,7 +470,10 @@ def process_die_attach_data(input_path, output_dir):
             # บันทึกผลลัพธ์
             print(f"\n💾 กำลังบันทึกไฟล์: {output_file}")
             try:
-                summary_df.to_excel(output_file, index=False, engine='openpyxl')
+                with stage('excel_write', rows=len(summary_df)):
+                    summary_df.to_excel(output_file, index=False, engine='openpyxl')
+                    write_sidecar(output_file, summary_df)
+                register_result(output_file, summary_df)
                 
                 # ตรวจสอบว่าไฟล์ถูกสร้างแล้ว
                 if os.path.exists(output_file):
@@ -236,6 +490,7 @@ def process_die_attach_data(input_path, output_dir):
                 print(f"⚠️ ไม่สามารถบันทึก Excel ได้ กำลังบันทึกเป็น CSV: {output_file}")
                 
                 summary_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                register_result(output_file, summary_df)
                 
                 if os.path.exists(output_file):
                     file_size = os.path.getsize(output_file)
@@ -248,6 +503,7 @@ def process_die_attach_data(input_path, output_dir):
                 "message": f"ประมวลผลสำเร็จ ได้ไฟล์สรุป: {os.path.basename(output_file)}",
                 "output_file": output_file,
                 "total_groups": len(summary_df),
+                "input_files": [os.path.basename(path) for path in used_files],
                 "avg_uph": round(summary_df['Wire Per Hour'].mean(), 2),
                 "file_size": os.path.getsize(output_file) if os.path.exists(output_file) else 0
             }
@@ -285,7 +541,7 @@ def run(input_dir, output_dir):
         # ค้นหาไฟล์ CSV
         csv_files.extend(glob.glob(os.path.join(input_dir, '*.csv')))
         
-        all_files = excel_files + csv_files
+        all_files = sorted(excel_files) + sorted(csv_files)
         
         print(f"🔍 พบไฟล์: {len(all_files)} ไฟล์")
         for file in all_files:
@@ -298,11 +554,10 @@ def run(input_dir, output_dir):
                 "error": "No input files found"
             }
         
-        # ประมวลผลไฟล์แรกที่พบ
-        input_file = all_files[0]
-        print(f"📊 กำลังประมวลผลไฟล์: {os.path.basename(input_file)}")
+        # ประมวลผลทุกไฟล์รวมกัน ได้ไฟล์สรุปเดียว
+        print(f"📊 กำลังประมวลผล {len(all_files)} ไฟล์")
         
-        result = process_die_attach_data(input_file, output_dir)
+        result = process_die_attach_data(all_files, output_dir)
         
         if result["success"]:
             print(f"✅ ประมวลผลเสร็จสิ้น: {result['message']}")
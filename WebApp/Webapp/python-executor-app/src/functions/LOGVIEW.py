@@ -7,8 +7,55 @@ import time
 from datetime import datetime  
 import tempfile
 import shutil
+import multiprocessing
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+try:
+    from services.result_cache import register_result
+    from services.columnar import read_sidecar, write_sidecar
+    from services.metrics import stage, call_with_stages, record_stages
+    from services.job_queue import cpu_budget, process_pool
+    cpu_lease = cpu_budget.lease
+except ImportError:
+    # รันไฟล์นี้เดี่ยวๆ นอก app: ไม่มีแคชผลลัพธ์ ไฟล์ Feather คู่กับ Excel และการวัดผลแต่ละขั้นตอน
+    def register_result(path, df):
+        return None
+
+    def write_sidecar(path, df, sheet_name=None):
+        return None
+
+    def read_sidecar(path, sheet_name=None, columns=None):
+        return None
+
+    @contextmanager
+    def stage(name, rows=None, **fields):
+        yield SimpleNamespace(rows=rows)
+
+    def call_with_stages(func, *args, **kwargs):
+        return func(*args, **kwargs), []
+
+    def record_stages(stages):
+        return None
+
+    @contextmanager
+    def cpu_lease(wanted):
+        yield max(1, min(wanted, os.cpu_count() or 1))
+
+    def process_pool(workers):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# จำนวน process สูงสุดสำหรับประมวลผลหลายเครื่องพร้อมกัน (1 = ทำทีละไฟล์) ได้จริงไม่เกินงบที่เหลือของ server
+MAX_WORKERS = int(os.environ.get('LOGVIEW_WORKERS', os.cpu_count() or 1))
+# ส่งผลขั้นตอนที่ 1 ให้ขั้นตอนที่ 2 ในหน่วยความจำ (False = เขียน Excel แล้วอ่านกลับแบบเดิม)
+IN_MEMORY_PIPELINE = True
+# เขียนไฟล์ Processed_Data ของแต่ละเครื่องใน output_dir ด้วยหรือไม่ (ใช้ในโหมด in-memory)
+WRITE_PROCESSED_EXCEL = True
+# อ่าน log ทีละ chunk เก็บเฉพาะแถว/คอลัมน์ที่ใช้ต่อ (False = อ่านทั้งไฟล์เป็น DataFrame เดียวแบบเดิม)
+STREAMING_PARSE = True
 
 
 # ---------- 1. TXT → Excel ----------
@@ -17,12 +64,106 @@ def find_input_files(input_pattern: str):
     if os.path.isdir(input_pattern):
         files = glob.glob(os.path.join(input_pattern, "*.txt")) + \
         glob.glob(os.path.join(input_pattern, "*.TXT"))
-        files = list(set(os.path.abspath(f) for f in files))
+        files = sorted(set(os.path.abspath(f) for f in files))
     else:
-        files = glob.glob(input_pattern)
+        files = sorted(glob.glob(input_pattern))
     return files
 
-def load_and_parse_file(input_file: str) -> pd.DataFrame:
+FRAME_PATTERN = r'(FU|FR|FA|FW|FN|FJ|F1|F2|F3|F4|F5|F6|F7|F8|F9|F0)(\w{4})'
+CHUNK_LINES = 500_000  # จำนวนบรรทัดต่อ chunk ในโหมด streaming
+
+def _parse_lines(lines, min_values_len: int = 0, start: int = 0) -> pd.DataFrame:
+    """แปลงบรรทัด log ชุดหนึ่งเป็น DataFrame แบบ vectorized (ผลเหมือน load_and_parse_file)"""
+    parts = pd.Series(lines, dtype=object).str.strip().str.split('\t', n=3, expand=True)
+    if parts.shape[1] < 3:
+        return pd.DataFrame()
+    parts = parts[parts[2].notna()]
+    # timestamp ต้องมีรูปแบบ "date time" (มีช่องว่างเพียงช่องเดียว)
+    parts = parts[parts[0].str.count(' ') == 1]
+    if parts.empty:
+        return pd.DataFrame()
+    timestamp = parts[0].str.partition(' ')
+    values = parts[2].str.split(',', expand=True).fillna('')
+    values_len = max(values.shape[1], min_values_len)
+    values = values.reindex(columns=range(values_len + 3), fill_value='')
+    values.columns = ['frame', 'G', 'No_strip'] + [f'value_{i}' for i in range(1, values_len + 1)]
+    df = pd.concat([
+        pd.DataFrame({
+            'date': timestamp[0],
+            'time': timestamp[2].str.replace('AM', '').str.replace('PM', '').str.strip(),
+            'step': parts[1],
+        }),
+        values,
+    ], axis=1)
+    frame = df['frame'].astype(str).str.extract(FRAME_PATTERN)
+    df['frame'] = frame[0].fillna('') + frame[1].fillna('')
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+def iter_parse_file(input_file: str, chunk_lines: int = CHUNK_LINES):
+    """
+    อ่านไฟล์ log ทีละ chunk และ yield DataFrame ของแต่ละ chunk
+    - step เป็น category, value columns กว้างเท่าเดิมหรือมากขึ้นตาม chunk ก่อนหน้า
+    - ใช้หน่วยความจำตามขนาด chunk ไม่ใช่ขนาดไฟล์
+    - อ่านไฟล์ไม่ได้จะ raise ต่อให้ผู้เรียกจัดการ
+    """
+    values_len = 0
+    start = 0
+    with open(input_file, 'r', encoding='latin-1') as file:
+        while True:
+            lines = list(islice(file, chunk_lines))
+            if not lines:
+                break
+            df_chunk = _parse_lines(lines, values_len, start)
+            if df_chunk.empty:
+                continue
+            values_len = len(df_chunk.columns) - 6
+            start += len(df_chunk)
+            df_chunk['step'] = df_chunk['step'].astype('category')
+            yield df_chunk
+
+# คอลัมน์ที่ขั้นตอนหลังการอ่านใช้ (value_5 ของแถว CUC คือความเร็ว) และคอลัมน์ที่แปลงเป็นตัวเลขตั้งแต่ตอนอ่าน
+PIPELINE_COLUMNS = ['date', 'time', 'step', 'frame', 'No_strip', 'value_1', 'value_5']
+NUMERIC_VALUE_COLUMNS = ['value_1', 'value_5']
+
+def load_pipeline_rows(input_file: str, error_steps=None, chunk_lines: int = CHUNK_LINES) -> pd.DataFrame:
+    """
+    อ่าน log แบบ streaming เก็บเฉพาะแถว PRO, CUC และ error steps กับคอลัมน์ใน PIPELINE_COLUMNS
+    (value columns เป็นตัวเลขตั้งแต่แต่ละ chunk) index เป็นลำดับแถวในไฟล์เหมือน load_and_parse_file
+    extract_pro_and_speed และ mark_errors ใช้แค่แถวเหล่านี้ ผลจึงเหมือนการอ่านทั้งไฟล์
+    แต่ใช้หน่วยความจำตามขนาด chunk กับจำนวนแถวที่เก็บ ไม่ใช่ขนาดไฟล์
+    """
+    if error_steps is None:
+        error_steps = DEFAULT_ERROR_STEPS
+    keep_steps = ['PRO', 'CUC', *error_steps]
+    chunks = []
+    for df_chunk in iter_parse_file(input_file, chunk_lines):
+        df_chunk = df_chunk.loc[df_chunk['step'].isin(keep_steps).to_numpy(),
+                                [col for col in PIPELINE_COLUMNS if col in df_chunk.columns]]
+        for col in NUMERIC_VALUE_COLUMNS:
+            if col in df_chunk.columns:
+                df_chunk[col] = pd.to_numeric(df_chunk[col], errors='coerce')
+        # step เป็น object เหมือนการอ่านทั้งไฟล์ (category ของแต่ละ chunk รวมกันไม่ได้ และผลลัพธ์ต้องเหมือนเดิม)
+        df_chunk['step'] = df_chunk['step'].astype(str)
+        chunks.append(df_chunk)
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks)
+
+def load_and_parse_file(input_file: str, streaming: bool = False, chunk_lines: int = CHUNK_LINES) -> pd.DataFrame:
+    if streaming:
+        try:
+            chunks = list(iter_parse_file(input_file, chunk_lines))
+        except Exception as e:
+            print(f"Error reading {input_file}: {e}")
+            return pd.DataFrame()
+        if not chunks:
+            return pd.DataFrame()
+        df = pd.concat(chunks)
+        value_cols = [col for col in df.columns if col.startswith('value_')]
+        df[value_cols] = df[value_cols].fillna('')
+        df['step'] = df['step'].astype('category')
+        return df
     try:
         with open(input_file, 'r', encoding='latin-1') as file:
             lines = file.readlines()
@@ -53,64 +194,72 @@ def load_and_parse_file(input_file: str) -> pd.DataFrame:
         row += [''] * (max_len - len(row))
     columns = ['date', 'time', 'step', 'frame', 'G', 'No_strip'] + [f'value_{i}' for i in range(1, max_values_len + 1)]
     df = pd.DataFrame(rows, columns=columns)
-    pattern = r'(FU|FR|FA|FW|FN|FJ|F1|F2|F3|F4|F5|F6|F7|F8|F9|F0)(\w{4})'
     df['frame'] = df['frame'].astype(str)
-    df['frame'] = df['frame'].str.extract(pattern).fillna('').agg(''.join, axis=1)
+    df['frame'] = df['frame'].str.extract(FRAME_PATTERN).fillna('').agg(''.join, axis=1)
     return df
 
 def extract_pro_and_speed(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame()
-    df_pro = df[df['step'] == 'PRO'].copy()
-    if df_pro.empty:
+    steps = df['step'].to_numpy()
+    pro_pos = np.flatnonzero(steps == 'PRO')
+    if len(pro_pos) == 0:
         return pd.DataFrame()
-    df_pro['speed'] = None
-    for idx in df_pro.index:
-        speed_value = None
-        pos = df.index.get_loc(idx)
-        for j in range(pos + 1, len(df)):
-            if df.loc[df.index[j], 'step'] == 'CUC':
-                if 'value_5' in df.columns and len(df.columns) > df.columns.get_loc('value_5'):
-                    speed_value = df.loc[df.index[j], 'value_5']
-                break
-        df_pro.at[idx, 'speed'] = speed_value
+    df_pro = df.iloc[pro_pos].copy()
+    # หา CUC แถวถัดไปของแต่ละ PRO ด้วย searchsorted (ครั้งเดียวทั้งไฟล์)
+    speed = np.full(len(pro_pos), None, dtype=object)
+    if 'value_5' in df.columns:
+        cuc_pos = np.flatnonzero(steps == 'CUC')
+        next_cuc = np.searchsorted(cuc_pos, pro_pos, side='right')
+        has_cuc = next_cuc < len(cuc_pos)
+        speed[has_cuc] = df['value_5'].to_numpy()[cuc_pos[next_cuc[has_cuc]]]
+    df_pro['speed'] = speed
     df_pro['speed'] = pd.to_numeric(df_pro['speed'], errors='coerce')
     df_pro['speed'] = df_pro['speed'] / 10 / 25.4
     df_pro['speed'] = df_pro['speed'].apply(lambda x: int(x) if x % 1 == 0 else round(x, 2))
     return df_pro
 
-def mark_errors(df: pd.DataFrame, df_pro: pd.DataFrame) -> pd.DataFrame:
+# step ที่ถือว่าเครื่องมี error ระหว่าง PRO สองครั้ง
+DEFAULT_ERROR_STEPS = ['ERRSET', 'ERRRCV', 'ERRCLR', 'DMC', 'DMW']
+# error steps เฉพาะกลุ่มเครื่อง {prefix ของชื่อไฟล์ log เช่น 'MC 1': [steps]} ถ้าไม่ตรงใช้ DEFAULT_ERROR_STEPS
+ERROR_STEPS_BY_FAMILY = {}
+
+def get_error_steps(input_file: str):
+    name = Path(input_file).stem.upper()
+    for prefix in sorted(ERROR_STEPS_BY_FAMILY, key=len, reverse=True):
+        if name.startswith(prefix.upper()):
+            return ERROR_STEPS_BY_FAMILY[prefix]
+    return DEFAULT_ERROR_STEPS
+
+def mark_errors(df: pd.DataFrame, df_pro: pd.DataFrame, error_steps=None) -> pd.DataFrame:
     if df.empty or df_pro.empty:
         return df_pro
+    if error_steps is None:
+        error_steps = DEFAULT_ERROR_STEPS
     df_pro['MC'] = None
-    pro_indices = df.index[df['step'] == 'PRO'].tolist()
-    for i in range(1, len(pro_indices)):
-        current_idx = pro_indices[i]
-        prev_idx = pro_indices[i - 1]
-        start_idx = min(prev_idx, current_idx)
-        end_idx = max(prev_idx, current_idx)
-        df_slice = df.loc[start_idx:end_idx]
-        error_steps = ['ERRSET', 'ERRRCV', 'ERRCLR', 'DMC', 'DMW']
-        has_error = df_slice['step'].isin(error_steps).any()
-        if has_error and prev_idx in df_pro.index:
-            df_pro.at[prev_idx, 'MC'] = 'MC error'
+    pro_pos = np.flatnonzero((df['step'] == 'PRO').to_numpy())
+    if len(pro_pos) < 2:
+        return df_pro
+    # นับ error สะสมครั้งเดียว แล้วเทียบค่าที่ PRO แต่ละคู่ (O(n))
+    error_count = np.cumsum(df['step'].isin(error_steps).to_numpy())
+    has_error = error_count[pro_pos[1:]] > error_count[pro_pos[:-1]]
+    error_idx = df.index[pro_pos[:-1][has_error]]
+    error_idx = error_idx[error_idx.isin(df_pro.index)]
+    df_pro.loc[error_idx, 'MC'] = 'MC error'
     return df_pro
 
 def insert_blank_rows(df_pro: pd.DataFrame) -> pd.DataFrame:
     if df_pro.empty:
         return df_pro
-    new_rows = []
-    for i in range(len(df_pro)):
-        row = df_pro.iloc[i]
-        new_rows.append(row)
-        try:
-            first_strip = float(row['No_strip']) == 1
-        except (ValueError, TypeError):
-            first_strip = False
-        if first_strip:
-            empty_row = pd.Series([None] * len(df_pro.columns), index=df_pro.columns)
-            new_rows.append(empty_row)
-    df_with_blank = pd.DataFrame(new_rows).reset_index(drop=True)
+    first_strip = (pd.to_numeric(df_pro['No_strip'], errors='coerce') == 1).to_numpy()
+    # เลื่อนตำแหน่งแต่ละแถวตามจำนวนแถวว่างที่แทรกก่อนหน้า แล้ว reindex ครั้งเดียว
+    positions = np.arange(len(df_pro)) + np.cumsum(first_strip) - first_strip
+    df_with_blank = df_pro.reset_index(drop=True)
+    df_with_blank.index = positions
+    df_with_blank = df_with_blank.reindex(pd.RangeIndex(len(df_pro) + first_strip.sum()))
+    blank_rows = ~df_with_blank.index.isin(positions)
+    object_cols = df_with_blank.columns[df_with_blank.dtypes == object]
+    df_with_blank.loc[blank_rows, object_cols] = None
     return df_with_blank
 
 def calculate_time_diff(df: pd.DataFrame) -> pd.DataFrame:
@@ -127,36 +276,24 @@ def calculate_time_diff(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def assign_subgroups_and_insert_empty_rows(df, column_strip='No_strip', frame_group='frame'):
-    subgroup_id = 0
-    subgroups = []
-    prev_val = None
-    for val in df[column_strip]:
-        if pd.isna(val):
-            subgroups.append(np.nan)
-            prev_val = None
-            continue
-        if prev_val is None:
-            subgroup_id += 1
-        elif val > prev_val:
-            subgroup_id += 1
-        subgroups.append(subgroup_id)
-        prev_val = val
-    df['subgroup_id'] = subgroups
-    result_rows = []
-    subgroup_keys = df['subgroup_id'].dropna().unique()
-    for group in subgroup_keys:
-        group_df = df[df['subgroup_id'] == group].reset_index(drop=True)
-        result_rows.append(group_df.iloc[[0]])
-        for i in range(1, len(group_df)):
-            prev_frame = group_df.loc[i - 1, frame_group]
-            curr_frame = group_df.loc[i, frame_group]
-            if prev_frame != curr_frame:
-                empty_row = pd.DataFrame({col: [np.nan] for col in df.columns})
-                result_rows.append(empty_row)
-            result_rows.append(group_df.iloc[[i]])
-        empty_row = pd.DataFrame({col: [np.nan] for col in df.columns})
-        result_rows.append(empty_row)
-    result_df = pd.concat(result_rows, ignore_index=True).reset_index(drop=True)
+    strip = df[column_strip]
+    has_strip = strip.notna()
+    # เริ่ม subgroup ใหม่เมื่อแถวก่อนหน้าว่าง หรือ No_strip เพิ่มขึ้น
+    prev_strip = strip.shift(1)
+    new_group = has_strip & (prev_strip.isna() | (strip > prev_strip))
+    df['subgroup_id'] = new_group.cumsum().where(has_strip)
+
+    # แถวว่างคั่นเมื่อ frame เปลี่ยนภายใน subgroup และหลังจบแต่ละ subgroup
+    rows = df[has_strip].reset_index(drop=True)
+    if rows.empty:
+        return pd.DataFrame(columns=df.columns)
+    group_start = new_group[has_strip].to_numpy()
+    frame_change = ~group_start & (rows[frame_group] != rows[frame_group].shift(1)).to_numpy()
+    groups_before = np.cumsum(group_start) - 1
+    positions = np.arange(len(rows)) + np.cumsum(frame_change) + groups_before
+    total_rows = len(rows) + frame_change.sum() + group_start.sum()
+    rows.index = positions
+    result_df = rows.reindex(pd.RangeIndex(total_rows))
     return result_df
 
 def mark_outlier_subgroups(df, subgroup_col='subgroup_id', no_strip_col='No_strip'):
@@ -171,27 +308,19 @@ def detect_outliers_combined(df, group_col='frame', value_col='seconds', no_stri
                              iqr_factor=1, zscore_threshold=2, min_diff_seconds=90):
     df['is_outlier'] = False
     df_filtered = df[~((df[no_strip_col] == 2) & (df[no_strip_col].shift(-1) == 1))]
-    for group_name, group in df_filtered.groupby(group_col):
-        values = group[value_col].dropna().values
-        if len(values) == 0:
-            continue
-        median = np.median(values)
-        q1 = np.percentile(values, 25)
-        q3 = np.percentile(values, 75)
-        iqr = q3 - q1
-        upper_bound = q3 + iqr_factor * iqr
-        mean = np.mean(values)
-        std = np.std(values)
-        for idx in group.index:
-            val = df.loc[idx, value_col]
-            if pd.isna(val):
-                continue
-            if val > upper_bound and abs(val - median) > min_diff_seconds:
-                df.at[idx, 'is_outlier'] = True
-            elif std > 0:
-                z_score = (val - mean) / std
-                if z_score > zscore_threshold and abs(val - mean) > min_diff_seconds:
-                    df.at[idx, 'is_outlier'] = True
+    grouped = df_filtered.groupby(group_col)[value_col]
+    # กระจายสถิติของแต่ละ frame กลับไปทุกแถวในครั้งเดียว
+    values = df_filtered[value_col]
+    median = grouped.transform('median')
+    q1 = grouped.transform('quantile', 0.25)
+    q3 = grouped.transform('quantile', 0.75)
+    mean = grouped.transform('mean')
+    std = grouped.transform('std', ddof=0)
+    upper_bound = q3 + iqr_factor * (q3 - q1)
+    iqr_outlier = (values > upper_bound) & ((values - median).abs() > min_diff_seconds)
+    zscore_outlier = (std > 0) & ((values - mean) / std > zscore_threshold) & ((values - mean).abs() > min_diff_seconds)
+    outliers = iqr_outlier | zscore_outlier
+    df.loc[outliers.index[outliers.to_numpy()], 'is_outlier'] = True
     return df
 
 def add_avg_exclude_outliers_by_frame(
@@ -228,7 +357,7 @@ def summarize_by_frame(df):
     }).reset_index()
     return summary
 
-def process_single_file_complete(input_file: str, output_dir: str):
+def _process_single_file(input_file: str, output_dir: str, write_excel: bool = True):
     print(f"กำลังประมวลผล: {input_file}")
     input_path = Path(input_file)
     output_path = Path(output_dir)
@@ -239,15 +368,23 @@ def process_single_file_complete(input_file: str, output_dir: str):
     output_file = output_path / f"{input_path.stem}_{timestamp}.xlsx"
     
     try:
-        df = load_and_parse_file(input_file)
+        with stage('parse', file=input_path.name) as s:
+            if STREAMING_PARSE:
+                df = load_pipeline_rows(input_file, get_error_steps(input_file))
+            else:
+                df = load_and_parse_file(input_file)
+            s.rows = len(df)
         if df.empty:
-            return False, f"ไม่สามารถโหลดข้อมูลจาก {input_file}"
+            return False, f"ไม่สามารถโหลดข้อมูลจาก {input_file}", None
         
-        df_pro = extract_pro_and_speed(df)
+        with stage('extract_pro_and_speed', file=input_path.name) as s:
+            df_pro = extract_pro_and_speed(df)
+            s.rows = len(df_pro)
         if df_pro.empty:
-            return False, f"ไม่พบข้อมูล PRO ในไฟล์ {input_file}"
+            return False, f"ไม่พบข้อมูล PRO ในไฟล์ {input_file}", None
         
-        df_pro = mark_errors(df, df_pro)
+        with stage('mark_errors', file=input_path.name, rows=len(df_pro)):
+            df_pro = mark_errors(df, df_pro, get_error_steps(input_file))
         
         # เลือกคอลัมน์ที่ต้องการ
         available_value_cols = [col for col in df_pro.columns if col.startswith('value_')]
@@ -257,8 +394,10 @@ def process_single_file_complete(input_file: str, output_dir: str):
         df_pro = df_pro[existing_cols]
         
         # ประมวลผลข้อมูล
-        df_with_blank = insert_blank_rows(df_pro)
-        df_time = calculate_time_diff(df_with_blank)
+        with stage('time_diff', file=input_path.name) as s:
+            df_with_blank = insert_blank_rows(df_pro)
+            df_time = calculate_time_diff(df_with_blank)
+            s.rows = len(df_time)
         
         # แปลงชนิดข้อมูล
         for col in ['frame', 'speed','value_1']:
@@ -273,13 +412,15 @@ def process_single_file_complete(input_file: str, output_dir: str):
         
         df_filtered = df_time[df_time['frame'].notna()]
         if df_filtered.empty:
-            return False, f"ไม่พบข้อมูล frame ที่ใช้งานได้ในไฟล์ {input_file}"
+            return False, f"ไม่พบข้อมูล frame ที่ใช้งานได้ในไฟล์ {input_file}", None
         
         # วิเคราะห์ข้อมูล
-        df_analyzed = assign_subgroups_and_insert_empty_rows(df_filtered, 'No_strip', 'frame')
-        df_analyzed = mark_outlier_subgroups(df_analyzed, 'subgroup_id', 'No_strip')
-        df_analyzed = detect_outliers_combined(df_analyzed, 'frame', 'seconds', 'No_strip')
-        df_analyzed = add_avg_exclude_outliers_by_frame(df_analyzed, value_col='seconds', group_col='frame')
+        with stage('outlier_detection', file=input_path.name) as s:
+            df_analyzed = assign_subgroups_and_insert_empty_rows(df_filtered, 'No_strip', 'frame')
+            df_analyzed = mark_outlier_subgroups(df_analyzed, 'subgroup_id', 'No_strip')
+            df_analyzed = detect_outliers_combined(df_analyzed, 'frame', 'seconds', 'No_strip')
+            df_analyzed = add_avg_exclude_outliers_by_frame(df_analyzed, value_col='seconds', group_col='frame')
+            s.rows = len(df_analyzed)
         
         # จัดการ Error columns
         if 'outlier_subgroup' in df_analyzed.columns and 'is_outlier' in df_analyzed.columns and 'MC' in df_analyzed.columns:
@@ -300,44 +441,95 @@ def process_single_file_complete(input_file: str, output_dir: str):
         df_final = df_analyzed.drop(columns=['avg_ex_outliers'])
         
         # บันทึกไฟล์ Excel
-        with pd.ExcelWriter(output_file) as writer:
-            df_final.to_excel(writer, index=False, sheet_name='Processed_Data')
-            summary.to_excel(writer, index=False, sheet_name='Summary')
+        if write_excel:
+            with stage('excel_write', file=input_path.name, rows=len(df_final)):
+                with pd.ExcelWriter(output_file) as writer:
+                    df_final.to_excel(writer, index=False, sheet_name='Processed_Data')
+                    summary.to_excel(writer, index=False, sheet_name='Summary')
+                write_sidecar(output_file, df_final, sheet_name='Processed_Data')
+                write_sidecar(output_file, summary, sheet_name='Summary')
         
-        return True, str(output_file)
+        return True, str(output_file), df_final
         
     except Exception as e:
-        return False, f"เกิดข้อผิดพลาดในการประมวลผล {input_file}: {str(e)}"
+        return False, f"เกิดข้อผิดพลาดในการประมวลผล {input_file}: {str(e)}", None
+
+def process_single_file_complete(input_file: str, output_dir: str, return_data: bool = False, write_excel: bool = True):
+    """
+    ประมวลผล log ของเครื่องหนึ่งเครื่อง
+    - return_data=True จะคืน (success, message, df_final) เพื่อให้ขั้นตอน summary ใช้ต่อได้โดยไม่ต้องอ่าน Excel กลับ
+    - write_excel=False ข้ามการเขียนไฟล์ Processed_Data (message ยังเป็น path ที่ควรจะได้)
+    """
+    success, message, df_final = _process_single_file(input_file, output_dir, write_excel)
+    if return_data:
+        return success, message, df_final
+    return success, message
+
+def _iter_results_parallel(files, output_dir, workers, return_data=False, write_excel=True):
+    """รันแต่ละไฟล์ใน process pool และคืนผลตามลำดับไฟล์เดิม"""
+    with process_pool(workers) as executor:
+        # ผลวัดแต่ละขั้นตอนใน worker ถูกส่งกลับมาเก็บเข้า run ของ process หลัก
+        futures = [executor.submit(call_with_stages, process_single_file_complete,
+                                   file_path, output_dir, return_data, write_excel)
+                   for file_path in files]
+        for file_path, future in zip(files, futures):
+            try:
+                result, stages = future.result()
+                record_stages(stages)
+                yield result
+            except Exception as e:
+                # worker ล้ม (เช่น BrokenProcessPool) ให้นับเป็นไฟล์ที่ล้มเหลว ไม่กระทบไฟล์อื่น
+                message = f"เกิดข้อผิดพลาดในการประมวลผล {file_path}: {str(e)}"
+                yield (False, message, None) if return_data else (False, message)
 
-def process_multiple_files_complete(input_pattern: str, output_dir: str):
+def process_multiple_files_complete(input_pattern: str, output_dir: str, workers: int = None,
+                                    return_data: bool = False, write_excel: bool = True):
     files = find_input_files(input_pattern)
     if not files:
         print(f" ไม่พบไฟล์ที่ตรงกับ pattern: {input_pattern}")
         return
     print(f" พบไฟล์ทั้งหมด {len(files)} ไฟล์")
-    print("=" * 60)
+    if workers is None:
+        workers = MAX_WORKERS
     successful = 0
     failed = 0
+    outputs = []
+    # จับเวลาตั้งแต่ก่อนเริ่ม pool และส่งงาน (รวมเวลาเริ่ม worker)
     start_time = time.time()
-    for i, file_path in enumerate(files, 1):
-        print(f"[{i}/{len(files)}] ", end="")
-        success, message = process_single_file_complete(file_path, output_dir)
-        if success:
-            print(f" สำเร็จ: {message}")
-            successful += 1
+    with cpu_lease(max(1, min(workers, len(files)))) as workers:
+        if workers > 1:
+            print(f" ประมวลผลแบบขนาน {workers} processes")
+            results = _iter_results_parallel(files, output_dir, workers, return_data, write_excel)
         else:
-            print(f" ล้มเหลว: {message}")
-            failed += 1
+            results = (process_single_file_complete(file_path, output_dir, return_data, write_excel) for file_path in files)
+        print("=" * 60)
+        for i, result in enumerate(results, 1):
+            outputs.append(result)
+            success, message = result[0], result[1]
+            print(f"[{i}/{len(files)}] ", end="")
+            if success:
+                print(f" สำเร็จ: {message}")
+                successful += 1
+            else:
+                print(f" ล้มเหลว: {message}")
+                failed += 1
     end_time = time.time()
     print("\n" + "=" * 60)
     print(f" ใช้เวลา: {end_time - start_time:.2f} วินาที")
     print(f" ผลลัพธ์: สำเร็จ {successful} ไฟล์, ล้มเหลว {failed} ไฟล์")
+    return outputs
 
 # ---------- 2. รวม Summary ----------
 
 def load_sec_strip_by_frame(filepath, sheet_name='Processed_Data'):
     print(f"         📄 อ่านไฟล์: {os.path.basename(filepath)}")
     
+    # ใช้ไฟล์ Feather ที่เขียนคู่กับ Excel ถ้ามี (เร็วกว่าอ่าน Excel มาก)
+    df = read_sidecar(filepath, sheet_name=sheet_name)
+    if df is not None:
+        print(f"         ✅ อ่าน sidecar '{sheet_name}' ได้: {df.shape}")
+        return prepare_sec_strip(df)
+    
     try:
         df = pd.read_excel(filepath, sheet_name=sheet_name)
         print(f"         ✅ อ่าน sheet '{sheet_name}' ได้: {df.shape}")
@@ -353,6 +545,10 @@ def load_sec_strip_by_frame(filepath, sheet_name='Processed_Data'):
         print(f"         ❌ ไม่สามารถอ่านไฟล์: {str(e)}")
         raise
     
+    return prepare_sec_strip(df)
+
+def prepare_sec_strip(df):
+    """ตรวจคอลัมน์และกรองข้อมูล sec/strip (ใช้ได้ทั้ง DataFrame ที่อ่านจาก Excel และที่อยู่ในหน่วยความจำ)"""
     print(f"         📋 คอลัมน์ที่มี: {list(df.columns)}")
     
     required_cols = ['frame', 'speed', 'sec/strip']
@@ -364,7 +560,9 @@ def load_sec_strip_by_frame(filepath, sheet_name='Processed_Data'):
     
     print(f"         ✅ มีครบทุกคอลัมน์ที่ต้องการ")
     
-    df['frame'] = df['frame'].astype(str)
+    df = df[required_cols].copy()
+    # frame ว่างจะกลายเป็น NaN เมื่ออ่านจาก Excel ทำให้ผลเหมือนกันทั้งสองทาง
+    df['frame'] = df['frame'].replace('', np.nan).astype(str)
     df['speed'] = pd.to_numeric(df['speed'], errors='coerce')
     df['sec/strip'] = pd.to_numeric(df['sec/strip'], errors='coerce')
     
@@ -408,8 +606,7 @@ def summarize_sec_strip(files_folder, file_list):
                 failed_files += 1
                 continue
                 
-            summary = df.groupby(['frame', 'speed'])['sec/strip'].mean()
-            summary.index = summary.index.map(lambda x: f"{x[0]}_speed{x[1]}")
+            summary = _sec_strip_by_frame_speed(df)
             file_key = os.path.splitext(filename)[0]
             data[file_key] = summary
             
@@ -433,6 +630,52 @@ def summarize_sec_strip(files_folder, file_list):
     
     return result_df
 
+def _sec_strip_by_frame_speed(df):
+    summary = df.groupby(['frame', 'speed'])['sec/strip'].mean()
+    summary.index = summary.index.map(lambda x: f"{x[0]}_speed{x[1]}")
+    return summary
+
+def summarize_sec_strip_frames(frames):
+    """
+    สร้าง summary จาก DataFrame ที่ได้จาก process_single_file_complete(return_data=True) โดยตรง
+    Args:
+        frames: dict {ชื่อไฟล์ (ไม่มีนามสกุล): df_final}
+    """
+    print(f"   📋 รายการข้อมูล: {list(frames)}")
+    
+    data = {}
+    successful_files = 0
+    failed_files = 0
+    
+    for file_key, df in frames.items():
+        print(f"   🔍 ประมวลผล: {file_key}")
+        try:
+            df = prepare_sec_strip(df)
+            if df.empty:
+                print(f"      ⚠️  ไม่มีข้อมูล: {file_key}")
+                failed_files += 1
+                continue
+            
+            data[file_key] = _sec_strip_by_frame_speed(df)
+            print(f"      ✅ สำเร็จ: {len(data[file_key])} กลุ่มข้อมูล")
+            successful_files += 1
+            
+        except Exception as e:
+            print(f"      ❌ ข้ามข้อมูล {file_key} : {str(e)}")
+            failed_files += 1
+    
+    print(f"   📊 สรุป: สำเร็จ {successful_files} ไฟล์, ล้มเหลว {failed_files} ไฟล์")
+    
+    if not data:
+        print(f"   ❌ ไม่มีข้อมูลใดๆ จากไฟล์ทั้งหมด")
+        return pd.DataFrame()
+    
+    result_df = pd.DataFrame(data)
+    result_df = result_df.sort_index()
+    print(f"   ✅ สร้าง result DataFrame: {result_df.shape}")
+    
+    return result_df
+
 def save_summary(df, output_path):
     df.index.name = "FRAME_STOCK"
     df.to_excel(output_path, index=True)
@@ -604,6 +847,7 @@ def analyze_and_export_csv_from_df(summary_df, package_path, output_csv):
     # บันทึกไฟล์ CSV
     print(f"💾 บันทึกไฟล์ CSV: {output_csv}")
     df_final.to_csv(output_csv, index=False)
+    register_result(output_csv, df_final)
     print(f"✅ Exported summary CSV: {output_csv}")
     
     return df_final
@@ -854,6 +1098,14 @@ def group_and_average_across_frames_unique_frame(df_merged):
     print("✅ เสร็จสิ้นการจัดกลุ่มและคำนวณค่าเฉลี่ย")
     return df_unique
 
+def package_file_path():
+    """ไฟล์ export package and frame stock ในโฟลเดอร์ Upload ที่ใช้เติมข้อมูล package ให้ Summary"""
+    return os.path.abspath(os.path.join(BASE_DIR, "..", "Upload", "export package and frame stock Rev.04.xlsx"))
+
+def cache_dependencies():
+    """ไฟล์นอก input_dir ที่ผลลัพธ์ขึ้นอยู่ด้วย (app ใช้รวมใน key ของแคชผลการรัน)"""
+    return [package_file_path()]
+
 def run(input_path, output_dir):
     """
     ฟังก์ชันหลักสำหรับประมวลผลไฟล์ LOGVIEW
@@ -862,41 +1114,60 @@ def run(input_path, output_dir):
     print(f"📁 Input: {input_path}")
     print(f"📁 Output: {output_dir}")
     
-    # 1. ประมวลผลไฟล์ input และเก็บชื่อไฟล์ .xlsx ที่สร้างใหม่
+    # 1. ประมวลผลไฟล์ input
     print("📊 ขั้นตอนที่ 1: ประมวลผลไฟล์ input...")
-    before_files = set(f for f in os.listdir(output_dir) if f.lower().endswith('.xlsx'))
+    if IN_MEMORY_PIPELINE:
+        # ส่ง DataFrame ต่อให้ขั้นตอนที่ 2 โดยตรง ไม่ต้องเขียน temp แล้วอ่าน Excel กลับ
+        results = process_multiple_files_complete(
+            input_path, output_dir, return_data=True, write_excel=WRITE_PROCESSED_EXCEL
+        )
+        frames = {Path(message).stem: df for success, message, df in (results or []) if success}
+        if not frames:
+            print(" ไม่มีไฟล์ที่ประมวลผลสำเร็จ")
+            return
+        print(f" ได้ข้อมูล {len(frames)} เครื่อง")
+    else:
+        before_files = set(f for f in os.listdir(output_dir) if f.lower().endswith('.xlsx'))
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # ประมวลผลในไฟล์ชั่วคราว
-        process_multiple_files_complete(input_path, temp_dir)
-        # หาไฟล์ใหม่ที่สร้างขึ้น
-        temp_files = set(f for f in os.listdir(temp_dir) if f.lower().endswith('.xlsx'))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # ประมวลผลในไฟล์ชั่วคราว
+            process_multiple_files_complete(input_path, temp_dir)
+            # หาไฟล์ใหม่ที่สร้างขึ้น
+            temp_files = set(f for f in os.listdir(temp_dir) if f.lower().endswith('.xlsx'))
         
-        if not temp_files:
-            print(" ไม่พบไฟล์ .xlsx ใหม่")
-            return
+            if not temp_files:
+                print(" ไม่พบไฟล์ .xlsx ใหม่")
+                return
 
-        print(f" สร้างไฟล์ใหม่ {len(temp_files)} ไฟล์")
+            print(f" สร้างไฟล์ใหม่ {len(temp_files)} ไฟล์")
         
-        # คัดลอกไฟล์จาก temp_dir ไปยัง output_dir
-        import shutil
-        new_files = []
-        for filename in temp_files:
-            src = os.path.join(temp_dir, filename)
-            dst = os.path.join(output_dir, filename)
-            shutil.copy2(src, dst)
-            new_files.append(filename)
-            print(f"   ✅ คัดลอก: {filename}")
-    
-    # ตรวจสอบไฟล์ที่คัดลอกมาแล้ว
-    if not new_files:
-        print(" ไม่สามารถคัดลอกไฟล์ได้")
-        return
+            # คัดลอกไฟล์จาก temp_dir ไปยัง output_dir
+            new_files = []
+            for filename in temp_files:
+                src = os.path.join(temp_dir, filename)
+                dst = os.path.join(output_dir, filename)
+                shutil.copy2(src, dst)
+                new_files.append(filename)
+                print(f"   ✅ คัดลอก: {filename}")
+            # คัดลอกไฟล์ Feather ที่คู่กับ Excel ไปด้วย (copy2 คง mtime ไว้ จึงยังใช้แทน Excel ได้)
+            for filename in os.listdir(temp_dir):
+                if filename.endswith('.feather'):
+                    shutil.copy2(os.path.join(temp_dir, filename), os.path.join(output_dir, filename))
+    
+        # ตรวจสอบไฟล์ที่คัดลอกมาแล้ว
+        if not new_files:
+            print(" ไม่สามารถคัดลอกไฟล์ได้")
+            return
 
     # 2. สร้าง summary DataFrame
     print("📊 ขั้นตอนที่ 2: สร้าง summary...")
     try:
-        summary_df = summarize_sec_strip(output_dir, new_files)
+        with stage('summary') as s:
+            if IN_MEMORY_PIPELINE:
+                summary_df = summarize_sec_strip_frames(frames)
+            else:
+                summary_df = summarize_sec_strip(output_dir, new_files)
+            s.rows = len(summary_df)
         print(f"   ✅ ข้อมูล summary: {summary_df.shape}")
         
         if summary_df.empty:
@@ -909,8 +1180,7 @@ def run(input_path, output_dir):
     
     # 3. ตรวจสอบไฟล์ package
     print("📊 ขั้นตอนที่ 3: ตรวจสอบไฟล์ package...")
-    package_path = os.path.join(BASE_DIR, "..", "Upload", "export package and frame stock Rev.04.xlsx")
-    package_path = os.path.abspath(package_path)
+    package_path = package_file_path()
     
     print(f"   📁 ตรวจสอบ package path: {package_path}")
     
@@ -931,7 +1201,8 @@ def run(input_path, output_dir):
     
     try:
         # ✅ ฟังก์ชันนี้จะเรียกใช้ group_and_average_across_frames_unique_frame ในขั้นตอนสุดท้าย
-        final_df = analyze_and_export_csv_from_df(summary_df, package_path, output_csv)
+        with stage('analyze_export', rows=len(summary_df)):
+            final_df = analyze_and_export_csv_from_df(summary_df, package_path, output_csv)
         
         print(f"🎉 ประมวลผลเสร็จสิ้น!")
         print(f"   📄 ไฟล์ผลลัพธ์: {output_csv}")
@@ -1,11 +1,80 @@
 import pandas as pd
+import numpy as np
 import glob
 import os
+import hashlib
 import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+from pandas.api.types import union_categoricals
 
-def run_all_years(input_path, output_dir):
-    target_years = [2023, 2024, 2025, 2026, 2027]
-    print(f"กำลังประมวลผลไฟล์จาก {input_path} สำหรับปี {target_years}")
+try:
+    from services.result_cache import register_result
+    from services.columnar import read_sidecar, write_sidecar
+    from services.metrics import stage
+    from services.job_queue import cpu_budget, process_pool
+    cpu_lease = cpu_budget.lease
+except ImportError:
+    # รันไฟล์นี้เดี่ยวๆ นอก app: ไม่มีแคชผลลัพธ์ ไฟล์ Feather คู่กับ Excel และการวัดผลแต่ละขั้นตอน
+    def register_result(path, df):
+        return None
+
+    def write_sidecar(path, df, sheet_name=None):
+        return None
+
+    def read_sidecar(path, sheet_name=None, columns=None):
+        return None
+
+    @contextmanager
+    def stage(name, rows=None, **fields):
+        yield SimpleNamespace(rows=rows)
+
+    @contextmanager
+    def cpu_lease(wanted):
+        yield max(1, min(wanted, os.cpu_count() or 1))
+
+    def process_pool(workers):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+TARGET_YEARS = [2023, 2024, 2025, 2026, 2027]
+# คอลัมน์ที่ต้องใช้
+REQUIRED_COLS = ['cust_code', 'package_code', 'product_no', 'bom_no', 'assy_pack_type', 'start_date', 'month']
+GROUP_COLS = ['cust_code', 'package_code', 'product_no', 'bom_no']
+# คอลัมน์ที่อ่านจากไฟล์รายเดือน (month มาจากชื่อไฟล์) และคอลัมน์รหัสที่เก็บเป็น category
+SOURCE_COLS = [c for c in REQUIRED_COLS if c != 'month']
+CODE_COLS = GROUP_COLS + ['assy_pack_type']
+# จำนวน process สูงสุดที่ใช้อ่านไฟล์รายเดือนพร้อมกัน ได้จริงไม่เกินงบที่เหลือของ server
+LOAD_WORKERS = int(os.environ.get('PNP_WORKERS', os.cpu_count() or 1))
+MONTH_ORDER = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+OUTPUT_COLS = GROUP_COLS + [
+    'prev_assy_pack_type', 'assy_pack_type',
+    'prev_start_date', 'start_date',
+    'prev_month_name', 'curr_month_name',
+    'change_status'
+]
+# อ่านเฉพาะไฟล์รายเดือนที่ใหม่/เปลี่ยน แล้วรวมกับสถานะต่อ BOM ที่เก็บไว้ใน output_dir
+# หมายเหตุ: Last_Type จึงรวมทุกไฟล์ที่เคยส่งมา ไม่ใช่เฉพาะไฟล์ที่ส่งรอบนี้
+# ส่งไฟล์ผิดไปแล้วให้รันใหม่โดยติ๊ก "ล้างข้อมูลที่สะสมไว้" ในหน้าหลัก หรือ POST /api/state/PNP_CHANG_TYPE/reset
+INCREMENTAL = True
+# ผลลัพธ์ขึ้นกับสถานะที่สะสมจากการรันก่อนๆ ด้วย จึงใช้แคชผลการรันของ app ไม่ได้เมื่อเปิด INCREMENTAL
+CACHEABLE = not INCREMENTAL
+STATE_FILE = "Last_Type_state.pkl"
+STATE_VERSION = 2
+# app รันแต่ละครั้งในโฟลเดอร์ของตัวเอง: คัดลอกสถานะเข้ามาก่อนรัน แล้ววาง Last_Type และสถานะกลับโฟลเดอร์กลาง
+# (หน้า lookup อ่าน Last_Type.xlsx จากโฟลเดอร์ output_PNP_CHANG_TYPE)
+SHARED_STATE = [STATE_FILE]
+SHARED_OUTPUTS = ["Last_Type.xlsx", "Last_Type.feather"]
+# คอลัมน์ของ record แรก/ล่าสุดที่เก็บในสถานะ
+RECORD_COLS = ['assy_pack_type', 'start_date', 'file_year', 'month_num']
+ORDER_COLS = ['start_date', 'file_year', 'month_num']
+
+
+def find_monthly_files(input_path, target_years=TARGET_YEARS):
+    """หาไฟล์ WF size รายเดือนแล้วแยกตามปี"""
     # หาไฟล์ทั้งหมดที่ตรงชื่อ
     all_files = glob.glob(os.path.join(input_path, "WF size* (UTL1).*"))
     print(f"เจอไฟล์ทั้งหมด {len(all_files)} ไฟล์")
@@ -21,143 +90,139 @@ def run_all_years(input_path, output_dir):
                 files_by_year.setdefault(file_year, []).append(filepath)
         else:
             print(f"⚠️ ไฟล์ {filename} ไม่มีปีในชื่อ")
+    return files_by_year
 
-    df_list = []
 
-    for year in sorted(files_by_year):
-        for filepath in files_by_year[year]:
-            filename = os.path.basename(filepath)
-            month_match = re.search(r"WF size ([^ ]+)", filename)
-            month = month_match.group(1) if month_match else "Unknown"
+def load_monthly_file(filepath, year):
+    """
+    อ่านไฟล์รายเดือนหนึ่งไฟล์ พร้อมคอลัมน์ month และ file_year (None ถ้าอ่านไม่ได้)
+    อ่านเฉพาะคอลัมน์ที่ใช้ เก็บรหัสเป็น category และแปลง start_date เป็น datetime
+    """
+    filename = os.path.basename(filepath)
+    month_match = re.search(r"WF size ([^ ]+)", filename)
+    month = month_match.group(1) if month_match else "Unknown"
+
+    usecols = lambda col: col in SOURCE_COLS
+    try:
+        if filepath.endswith(('.xls', '.xlsx')):
+            df = pd.read_excel(filepath, engine="openpyxl" if filepath.endswith('.xlsx') else None, usecols=usecols)
+        elif filepath.endswith('.csv'):
+            df = pd.read_csv(filepath, usecols=usecols)
+        else:
+            print(f"❌ ไม่รู้จักฟอร์แมต: {filename}")
+            return None
+    except Exception as e:
+        print(f"❌ อ่านไฟล์ {filename} ผิดพลาด: {e}")
+        return None
+
+    # แปลงหลังอ่าน (ไม่ใช้ dtype ของ reader) เพื่อให้รหัสที่เป็นตัวเลขยังเป็นตัวเลขเหมือนเดิม
+    for col in CODE_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'start_date' in df.columns:
+        df['start_date'] = pd.to_datetime(df['start_date'], errors='coerce')
+    df['month'] = pd.Categorical([month] * len(df))
+    df['file_year'] = year
+    return df
 
+
+def load_monthly_files(jobs, workers=None):
+    """
+    อ่านไฟล์รายเดือนหลายไฟล์ใน process pool
+    Args:
+        jobs: list ของ (filepath, year)
+        workers: จำนวน process (ค่าเริ่มต้น LOAD_WORKERS)
+    Returns:
+        list: DataFrame (หรือ None ถ้าอ่านไม่ได้) ตามลำดับเดียวกับ jobs
+    """
+    if workers is None:
+        workers = LOAD_WORKERS
+    with cpu_lease(max(1, min(workers, len(jobs)))) as workers:
+        return _load_monthly_files(jobs, workers)
+
+
+def _load_monthly_files(jobs, workers):
+    if workers == 1:
+        return [load_monthly_file(filepath, year) for filepath, year in jobs]
+
+    print(f"📂 อ่านไฟล์แบบขนาน {workers} processes")
+    results = []
+    with process_pool(workers) as executor:
+        futures = [executor.submit(load_monthly_file, filepath, year) for filepath, year in jobs]
+        for (filepath, _), future in zip(jobs, futures):
             try:
-                if filepath.endswith(('.xls', '.xlsx')):
-                    df = pd.read_excel(filepath, engine="openpyxl" if filepath.endswith('.xlsx') else None)
-                elif filepath.endswith('.csv'):
-                    df = pd.read_csv(filepath)
-                else:
-                    print(f"❌ ไม่รู้จักฟอร์แมต: {filename}")
-                    continue
+                results.append(future.result())
             except Exception as e:
-                print(f"❌ อ่านไฟล์ {filename} ผิดพลาด: {e}")
+                # worker ล้ม (เช่น BrokenProcessPool) ให้นับเป็นไฟล์ที่อ่านไม่ได้ ไม่กระทบไฟล์อื่น
+                print(f"❌ อ่านไฟล์ {os.path.basename(filepath)} ผิดพลาด: {e}")
+                results.append(None)
+    return results
+
+
+def concat_monthly(df_list):
+    """รวม DataFrame รายเดือน โดยรวมชุด category ของแต่ละไฟล์ให้คอลัมน์รหัสยังเป็น category"""
+    if len(df_list) > 1:
+        df_list = [df.copy(deep=False) for df in df_list]
+        for col in CODE_COLS + ['month']:
+            if not all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in df_list):
                 continue
+            try:
+                categories = union_categoricals([df[col] for df in df_list], sort_categories=True).categories
+            except TypeError:
+                continue  # ค่าหลายชนิดปนกันเรียงไม่ได้ ปล่อยให้ concat เป็น object
+            for df in df_list:
+                df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(df_list, ignore_index=True)
 
-            df['month'] = month
-            df['file_year'] = year
-            df_list.append(df)
 
-    if not df_list:
-        print("❌ ไม่มีไฟล์ที่โหลดได้เลย")
-        return
+def _decategorize(df):
+    # แปลงคอลัมน์ category กลับเป็นชนิดเดิมของค่า (สถานะและผลลัพธ์ไม่ขึ้นกับชุด category ของแต่ละไฟล์)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = np.asarray(df[col])
+    return df
 
-    df_all = pd.concat(df_list, ignore_index=True)
 
-    # คอลัมน์ที่ต้องใช้
-    required_cols = ['cust_code', 'package_code', 'product_no', 'bom_no', 'assy_pack_type', 'start_date', 'month']
-    missing = [c for c in required_cols if c not in df_all.columns]
+def prepare_records(df_all):
+    """เลือกคอลัมน์ที่ต้องใช้ แปลง start_date และเพิ่ม month_num (None ถ้าคอลัมน์ไม่ครบ)"""
+    missing = [c for c in REQUIRED_COLS if c not in df_all.columns]
     if missing:
         print(f"❌ คอลัมน์หายไป: {missing}")
-        return
+        return None
 
-    df_all = df_all[required_cols + ['file_year']]
+    df_all = df_all[REQUIRED_COLS + ['file_year']]
 
     # แปลง start_date เป็น datetime เพื่อเรียงตามวันที่
     df_all['start_date'] = pd.to_datetime(df_all['start_date'], errors='coerce')
 
     # จัดเรียงเดือน
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
-                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    month_map = {m: i for i, m in enumerate(month_order, 1)}
+    month_map = {m: i for i, m in enumerate(MONTH_ORDER, 1)}
     df_all['month_short'] = df_all['month'].str[:3]
     df_all['month_num'] = df_all['month_short'].map(month_map)
+    return df_all
 
-    # เรียงตาม BOM → เวลา (ปี → เดือน → วันที่)
-    df_all = df_all.sort_values(by=[
-        'bom_no', 'package_code', 'product_no', 'cust_code',
-        'file_year', 'month_num', 'start_date'
-    ]).reset_index(drop=True)
 
-    # จัดข้อมูลสำหรับแสดงผล: วิเคราะห์การเปลี่ยนแปลง assy_pack_type
-    group_cols = ['cust_code', 'package_code', 'product_no', 'bom_no']
-    
-    result_list = []
-    
-    for name, group in df_all.groupby(group_cols):
-        group = group.sort_values('start_date').reset_index(drop=True)
-        
-        # หาวันที่แรกสุดและวันที่ล่าสุดของ BOM นั้นๆ
-        first_record = group.iloc[0]   # record แรกสุด (วันที่เก่าสุด)
-        last_record = group.iloc[-1]   # record ล่าสุด (วันที่ใหม่สุด)
-        
-        # ตรวจสอบว่ามีการเปลี่ยนแปลง assy_pack_type หรือไม่
-        unique_types = group['assy_pack_type'].unique()
-        
-        if len(unique_types) == 1:
-            # ไม่มีการเปลี่ยนแปลง assy_pack_type
-            row_data = {
-                'cust_code': first_record['cust_code'],
-                'package_code': first_record['package_code'],
-                'product_no': first_record['product_no'],
-                'bom_no': first_record['bom_no'],
-                'prev_assy_pack_type': first_record['assy_pack_type'],
-                'assy_pack_type': first_record['assy_pack_type'],
-                'prev_start_date': first_record['start_date'],     # วันที่เจอครั้งแรก
-                'start_date': last_record['start_date'],           # วันที่เจอครั้งสุดท้าย
-                'prev_month_name': first_record['start_date'].strftime('%b'),
-                'curr_month_name': last_record['start_date'].strftime('%b'),
-                'change_status': 'No Change'
-            }
-            result_list.append(row_data)
-        else:
-            # มีการเปลี่ยนแปลง assy_pack_type
-            # หา assy_pack_type แรกและสุดท้าย
-            first_assy_type = first_record['assy_pack_type']
-            last_assy_type = last_record['assy_pack_type']
-            
-            row_data = {
-                'cust_code': first_record['cust_code'],
-                'package_code': first_record['package_code'],
-                'product_no': first_record['product_no'],
-                'bom_no': first_record['bom_no'],
-                'prev_assy_pack_type': first_assy_type,           # assy_pack_type แรก
-                'assy_pack_type': last_assy_type,                 # assy_pack_type สุดท้าย
-                'prev_start_date': first_record['start_date'],    # วันที่เจอครั้งแรก
-                'start_date': last_record['start_date'],          # วันที่เจอครั้งสุดท้าย
-                'prev_month_name': first_record['start_date'].strftime('%b'),
-                'curr_month_name': last_record['start_date'].strftime('%b'),
-                'change_status': 'Changed'
-            }
-            result_list.append(row_data)
-    
-    # สร้าง DataFrame จากผลลัพธ์
-    summary_df = pd.DataFrame(result_list)
-    
+def write_last_type(summary_df, output_dir):
+    """เรียงผลลัพธ์ตามวันที่ บันทึก Last_Type.xlsx และสรุปจำนวน"""
     # เรียงเดือนให้ถูกต้องด้วย Categorical
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
-                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    summary_df['prev_month_name'] = pd.Categorical(summary_df['prev_month_name'], categories=month_order, ordered=True)
-    summary_df['curr_month_name'] = pd.Categorical(summary_df['curr_month_name'], categories=month_order, ordered=True)
+    summary_df['prev_month_name'] = pd.Categorical(summary_df['prev_month_name'], categories=MONTH_ORDER, ordered=True)
+    summary_df['curr_month_name'] = pd.Categorical(summary_df['curr_month_name'], categories=MONTH_ORDER, ordered=True)
 
     # เรียงตามวันเวลา
     summary_df = summary_df.sort_values(by=['start_date']).reset_index(drop=True)
 
-    # เลือกคอลัมน์ส่งออก
-    output_cols = group_cols + [
-        'prev_assy_pack_type', 'assy_pack_type',
-        'prev_start_date', 'start_date',
-        'prev_month_name', 'curr_month_name',
-        'change_status'
-    ]
-
     # บันทึกผลลัพธ์ - ✅ เปลี่ยนชื่อไฟล์เป็น Last_Type.xlsx
     os.makedirs(output_dir, exist_ok=True)
     output_file = os.path.join(output_dir, "Last_Type.xlsx")  # ✅ เปลี่ยนชื่อไฟล์
     
     # ส่งออก Excel พร้อมจัดความกว้างคอลัมน์
-    with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
-        summary_df[output_cols].to_excel(writer, index=False, sheet_name='BOM Summary')
-        worksheet = writer.sheets['BOM Summary']
-        worksheet.set_column('A:K', 15)
+    with stage('excel_write', rows=len(summary_df)):
+        with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+            summary_df[OUTPUT_COLS].to_excel(writer, index=False, sheet_name='BOM Summary')
+            worksheet = writer.sheets['BOM Summary']
+            worksheet.set_column('A:K', 15)
+        write_sidecar(output_file, summary_df[OUTPUT_COLS])
+    register_result(output_file, summary_df[OUTPUT_COLS])
     print(f"✅ Output file saved at: {output_file}")  # เพิ่มบรรทัดนี้
 
     # นับข้อมูล
@@ -171,33 +236,381 @@ def run_all_years(input_path, output_dir):
     
     return summary_df
 
+
+# ---------- สถานะต่อ BOM สำหรับโหมด incremental ----------
+
+def _group_ids(df):
+    """เลขกลุ่ม BOM ของแต่ละแถว เรียงตามลำดับ key แบบเดียวกับ groupby (และจำนวนกลุ่ม)"""
+    grouped = df.groupby(GROUP_COLS, sort=True, observed=True)
+    return grouped.ngroup().to_numpy(), grouped.ngroups
+
+
+def _time_order(df):
+    """ตำแหน่งแถวเรียงตาม start_date → ปี → เดือน (ค่าว่างอยู่ท้าย) ค่าเท่ากันคงลำดับเดิม"""
+    keys = []
+    for col in reversed(ORDER_COLS):
+        values = df[col]
+        if col == 'start_date':
+            values = values.to_numpy('datetime64[ns]').view('int64')
+            values = np.where(values == np.iinfo('int64').min, np.iinfo('int64').max, values)
+        else:
+            values = values.to_numpy(dtype=float, na_value=np.inf)
+        keys.append(values)
+    return np.lexsort(keys)
+
+
+def _first_last_positions(group_ids, n_groups, order):
+    """ตำแหน่งแถวแรกและแถวสุดท้าย (ตามลำดับ order) ของแต่ละกลุ่ม"""
+    sorted_ids = group_ids[order]
+    first = np.empty(n_groups, dtype=np.int64)
+    last = np.empty(n_groups, dtype=np.int64)
+    # กำหนดค่าซ้ำที่ index เดียวกัน ค่าที่เขียนทีหลังจะถูกเก็บไว้
+    first[sorted_ids[::-1]] = order[::-1]
+    last[sorted_ids] = order
+    return first, last
+
+
+def _count_types(types, n_groups):
+    """จำนวน assy_pack_type ที่ไม่ซ้ำของแต่ละกลุ่ม (ชุด key เดียวกับ records จึงเรียงตรงกัน)"""
+    type_group_ids, _ = _group_ids(types)
+    return np.bincount(type_group_ids, minlength=n_groups)
+
+
+def reduce_records(df):
+    """
+    ย่อข้อมูลดิบเป็นสถานะต่อ BOM
+    Args:
+        df: DataFrame จาก prepare_records
+    Returns:
+        tuple: (records, types)
+            records: หนึ่งแถวต่อ BOM เรียงตาม key มี record แรก (first_*), record ล่าสุด (last_*)
+                     และจำนวน assy_pack_type ที่พบ (n_types)
+                     เรียงเวลาตาม start_date → ปี → เดือน (ค่าว่างอยู่ท้าย) ค่าเท่ากันใช้ลำดับเดิมของแถว
+            types: คู่ (BOM, assy_pack_type) ที่เคยพบ ไม่ซ้ำกัน
+    """
+    has_keys = df[GROUP_COLS].notna().all(axis=1)
+    if not has_keys.all():
+        df = df[has_keys]  # groupby ไม่นับ BOM ที่ key ว่าง
+    df = df.reset_index(drop=True)
+    for col in CODE_COLS:
+        # groupby เรียงกลุ่มตามลำดับ category ถ้า category ไม่ได้เรียงไว้ (ค่าหลายชนิดปนกัน) ใช้ค่าเดิม
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and not df[col].cat.categories.is_monotonic_increasing:
+            df[col] = np.asarray(df[col])
+
+    group_ids, n_groups = _group_ids(df)
+    first, last = _first_last_positions(group_ids, n_groups, _time_order(df))
+
+    type_codes, type_values = pd.factorize(df['assy_pack_type'], use_na_sentinel=False)
+    pairs = pd.Series(group_ids.astype(np.int64) * max(len(type_values), 1) + type_codes)
+    types = _decategorize(df.loc[~pairs.duplicated().to_numpy(), GROUP_COLS + ['assy_pack_type']].reset_index(drop=True))
+
+    return _build_records(df, first, df, last, _count_types(types, n_groups)), types
+
+
+def _build_records(first_df, first, last_df, last, n_types):
+    # หนึ่งแถวต่อกลุ่ม: key และ record แรกจาก first_df, record ล่าสุดจาก last_df
+    records = _decategorize(first_df.loc[first, GROUP_COLS].reset_index(drop=True))
+    for prefix, source, positions in (('first_', first_df, first), ('last_', last_df, last)):
+        for col in RECORD_COLS:
+            records[prefix + col] = source[col].to_numpy()[positions]
+    records['n_types'] = n_types
+    return records
+
+
+def merge_states(parts):
+    """
+    รวมสถานะหลายชุด (เรียงตามลำดับที่อ่านไฟล์) เป็นชุดเดียว
+    record แรกที่เวลาเท่ากันใช้ของชุดก่อน record ล่าสุดที่เวลาเท่ากันใช้ของชุดหลัง
+    """
+    parts = [part for part in parts if part is not None]
+    if len(parts) == 1:
+        return parts[0]
+
+    def stack(prefix):
+        frames = []
+        for records, _ in parts:
+            frame = records[GROUP_COLS + [prefix + col for col in RECORD_COLS]]
+            frame.columns = GROUP_COLS + RECORD_COLS
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    firsts, lasts = stack('first_'), stack('last_')
+    group_ids, n_groups = _group_ids(firsts)
+    first, _ = _first_last_positions(group_ids, n_groups, _time_order(firsts))
+    _, last = _first_last_positions(group_ids, n_groups, _time_order(lasts))
+
+    types = pd.concat([types for _, types in parts], ignore_index=True).drop_duplicates().reset_index(drop=True)
+    return _build_records(firsts, first, lasts, last, _count_types(types, n_groups)), types
+
+
+def _month_names(dates):
+    # ชื่อเดือนแบบเดียวกับ strftime('%b') แต่ไม่ต้องแปลงวันที่เป็นข้อความทีละแถว (NaT → NaN)
+    names = np.array(MONTH_ORDER + [np.nan], dtype=object)
+    return names[dates.dt.month.fillna(13).astype(int).to_numpy() - 1]
+
+
+def build_summary(records):
+    """สร้างตารางผลลัพธ์ (ก่อนเรียงตามวันที่) จากสถานะต่อ BOM เรียงตาม BOM เหมือน groupby"""
+    first_date = records['first_start_date']
+    last_date = records['last_start_date']
+
+    summary_df = records[GROUP_COLS].copy()
+    summary_df['prev_assy_pack_type'] = records['first_assy_pack_type']
+    summary_df['assy_pack_type'] = records['last_assy_pack_type']
+    summary_df['prev_start_date'] = first_date
+    summary_df['start_date'] = last_date
+    summary_df['prev_month_name'] = _month_names(first_date)
+    summary_df['curr_month_name'] = _month_names(last_date)
+    summary_df['change_status'] = np.where(records['n_types'] > 1, 'Changed', 'No Change')
+    return summary_df
+
+
+def file_fingerprint(filepath, previous=None):
+    """
+    ขนาด/mtime/sha1 ของไฟล์ ถ้าขนาดและ mtime ตรงกับครั้งก่อนจะใช้ sha1 เดิมโดยไม่ต้องอ่านไฟล์
+    """
+    stat = os.stat(filepath)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+        fingerprint['sha1'] = previous['sha1']
+        return fingerprint
+
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    fingerprint['sha1'] = digest.hexdigest()
+    return fingerprint
+
+
+def load_state(output_dir):
+    """อ่านสถานะที่เก็บไว้ (dict ว่างถ้ายังไม่มีหรือเป็นเวอร์ชันอื่น)"""
+    state_path = os.path.join(output_dir, STATE_FILE)
+    empty = {'version': STATE_VERSION, 'files': {}, 'parts': {}, 'records': None, 'types': None}
+    if not os.path.exists(state_path):
+        return empty
+    try:
+        state = pd.read_pickle(state_path)
+    except Exception as e:
+        print(f"⚠️ อ่านสถานะเดิมไม่ได้ เริ่มใหม่ทั้งหมด: {e}")
+        return empty
+    if state.get('version') != STATE_VERSION:
+        return empty
+    return state
+
+
+def save_state(state, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, STATE_FILE)
+    temp_path = state_path + ".tmp"
+    pd.to_pickle(state, temp_path)
+    os.replace(temp_path, state_path)
+
+
+def run_incremental(files_by_year, output_dir):
+    """
+    รวมไฟล์รายเดือนเข้ากับสถานะเดิม
+    - ไฟล์ที่ขนาด/mtime หรือ sha1 ตรงกับที่เคยอ่าน: ข้าม
+    - ไฟล์ใหม่: ย่อเป็นสถานะแล้วรวมกับสถานะเดิม
+    - ไฟล์ชื่อเดิมแต่เนื้อหาเปลี่ยน: แทนที่สถานะของไฟล์นั้น แล้วรวมสถานะทุกไฟล์ใหม่
+    ไฟล์ที่เคยอ่านแต่ไม่ได้ส่งมาในรอบนี้ยังนับรวมอยู่ในสถานะ
+    """
+    state = load_state(output_dir)
+    new_parts = []
+    replaced = False
+
+    pending = []
+    for year in sorted(files_by_year):
+        for filepath in files_by_year[year]:
+            filename = os.path.basename(filepath)
+            previous = state['files'].get(filename)
+            fingerprint = file_fingerprint(filepath, previous)
+            if previous and previous['sha1'] == fingerprint['sha1']:
+                state['files'][filename] = fingerprint
+                continue
+            pending.append((filepath, year, previous, fingerprint))
+
+    # อ่านเฉพาะไฟล์ใหม่/เปลี่ยนพร้อมกัน แล้วรวมเข้าสถานะตามลำดับไฟล์เดิม
+    with stage('load_files', files=len(pending)) as s:
+        frames = load_monthly_files([(filepath, year) for filepath, year, _, _ in pending])
+        s.rows = sum(len(df) for df in frames if df is not None)
+    for (filepath, year, previous, fingerprint), df in zip(pending, frames):
+        filename = os.path.basename(filepath)
+        if df is None:
+            continue
+        df = prepare_records(df)
+        if df is None:
+            print(f"⚠️ ข้ามไฟล์ {filename}")
+            continue
+
+        with stage('reduce_records', file=filename, rows=len(df)):
+            part = reduce_records(df)
+        print(f"{'🔄 อ่านใหม่' if previous else '📥 เพิ่ม'}: {filename} ({len(df)} แถว, {len(part[0])} BOM)")
+        replaced = replaced or filename in state['parts']
+        state['parts'].pop(filename, None)  # ให้ไฟล์ที่อ่านใหม่อยู่ท้ายลำดับ
+        state['parts'][filename] = part
+        state['files'][filename] = fingerprint
+        new_parts.append(part)
+
+    if not state['parts']:
+        print("❌ ไม่มีไฟล์ที่โหลดได้เลย")
+        return None
+
+    with stage('merge_states') as s:
+        if replaced or state['records'] is None:
+            state['records'], state['types'] = merge_states(list(state['parts'].values()))
+        elif new_parts:
+            state['records'], state['types'] = merge_states([(state['records'], state['types'])] + new_parts)
+        else:
+            print("✅ ไม่มีไฟล์ใหม่ สร้าง Last_Type.xlsx จากสถานะเดิม")
+        s.rows = len(state['records'])
+
+    summary_df = build_summary(state['records'])
+    summary_df = write_last_type(summary_df, output_dir)
+    save_state(state, output_dir)
+    print(f"💾 สถานะ: {len(state['files'])} ไฟล์, {len(state['records'])} BOM")
+    return summary_df
+
+
+def run_all_years(input_path, output_dir, incremental=None):
+    target_years = TARGET_YEARS
+    print(f"กำลังประมวลผลไฟล์จาก {input_path} สำหรับปี {target_years}")
+    files_by_year = find_monthly_files(input_path, target_years)
+
+    if incremental is None:
+        incremental = INCREMENTAL
+    if incremental:
+        return run_incremental(files_by_year, output_dir)
+
+    # อ่านทุกไฟล์พร้อมกันเฉพาะคอลัมน์ที่ใช้ ก่อนรวมเป็น df_all
+    jobs = [(filepath, year) for year in sorted(files_by_year) for filepath in files_by_year[year]]
+    with stage('load_files', files=len(jobs)) as s:
+        df_list = [df for df in load_monthly_files(jobs) if df is not None]
+        s.rows = sum(len(df) for df in df_list)
+
+    if not df_list:
+        print("❌ ไม่มีไฟล์ที่โหลดได้เลย")
+        return
+
+    df_all = prepare_records(concat_monthly(df_list))
+    if df_all is None:
+        return
+
+    # record แรก/ล่าสุด และจำนวน assy_pack_type ต่อ BOM ในรอบเดียว (ไม่วนลูปทีละกลุ่ม)
+    with stage('reduce_records', rows=len(df_all)):
+        records, types = reduce_records(df_all)
+    summary_df = build_summary(records)
+
+    return write_last_type(summary_df, output_dir)
+
 # ✅ เก็บฟังก์ชัน lookup_last_type ไว้เพื่อใช้กับเว็บ
-def lookup_last_type(input_bom_file, output_dir):
-    # โหลดไฟล์ Last_Type.xlsx
+class LastTypeIndex:
+    """
+    ดัชนี Last_type ในหน่วยความจำจากไฟล์ Last_Type.xlsx
+    - โหลดไฟล์ครั้งเดียว แล้วโหลดใหม่เฉพาะเมื่อไฟล์ถูกแก้ไข (mtime/ขนาดเปลี่ยน)
+    - ค้นหาด้วย hash map ของ bom_no (และ package_code/product_no ถ้าไฟล์ค้นหามี)
+    """
+
+    def __init__(self, last_type_path):
+        self.path = last_type_path
+        self._identity = None
+        self._tables = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # เรียกภายใต้ self._lock
+        stat = os.stat(self.path)
+        identity = (stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return
+        # ใช้ไฟล์ Feather ที่เขียนคู่กับ Last_Type.xlsx ถ้ามี
+        df_last = read_sidecar(self.path)
+        if df_last is None:
+            df_last = pd.read_excel(self.path)
+        print(f"📥 โหลด Last_Type index: {len(df_last)} แถว")
+        self._df_last = df_last
+        self._tables = {}
+        self._maps = {}
+        self._identity = identity
+
+    def _get_map(self, merge_cols):
+        # ตาราง (merge_cols + Last_type) ที่ตัดแถวซ้ำแล้ว และ Series สำหรับ map ถ้า key ไม่ซ้ำ
+        key = tuple(merge_cols)
+        if key not in self._tables:
+            cols = merge_cols + ['assy_pack_type']  # ใช้ assy_pack_type แทน Last_type
+            table = self._df_last[cols].drop_duplicates().rename(columns={'assy_pack_type': 'Last_type'})
+            self._tables[key] = table
+            if table.duplicated(merge_cols).any():
+                # BOM เดียวมีหลาย Last_type ต้อง merge เพื่อให้ได้ทุกแถวเหมือนเดิม
+                self._maps[key] = None
+            elif len(merge_cols) == 1:
+                self._maps[key] = table.set_index(merge_cols[0])['Last_type']
+            else:
+                self._maps[key] = table.set_index(merge_cols)['Last_type']
+        return self._tables[key], self._maps[key]
+
+    def lookup(self, df_bom):
+        """
+        เติมคอลัมน์ Last_type ให้ DataFrame ที่มีคอลัมน์ bom_no
+        Returns:
+            pandas DataFrame: ผลลัพธ์เหมือน left merge กับ Last_Type.xlsx
+        """
+        merge_cols = ['bom_no']
+        with self._lock:
+            self._load()
+            if 'package_code' in df_bom.columns and 'product_no' in df_bom.columns \
+                    and {'package_code', 'product_no'} <= set(self._df_last.columns):
+                merge_cols += ['package_code', 'product_no']
+            table, mapping = self._get_map(merge_cols)
+
+        if mapping is None or 'Last_type' in df_bom.columns:
+            return pd.merge(df_bom, table, on=merge_cols, how='left')
+
+        df_result = df_bom.copy()
+        if len(merge_cols) == 1:
+            df_result['Last_type'] = df_bom['bom_no'].map(mapping)
+        else:
+            keys = pd.MultiIndex.from_frame(df_bom[merge_cols])
+            df_result['Last_type'] = mapping.reindex(keys).to_numpy()
+        return df_result
+
+
+# ดัชนีที่โหลดไว้แล้ว แยกตาม path ของ Last_Type.xlsx
+_last_type_indexes = {}
+_last_type_indexes_lock = threading.Lock()
+
+
+def get_last_type_index(output_dir):
+    """ดัชนี Last_type ของโฟลเดอร์ output (None ถ้ายังไม่มีไฟล์ Last_Type.xlsx)"""
     last_type_path = os.path.join(output_dir, "Last_Type.xlsx")
     if not os.path.exists(last_type_path):
-        print(f"❌ ไม่พบไฟล์ {last_type_path}")
-        return
+        return None
+    with _last_type_indexes_lock:
+        index = _last_type_indexes.get(last_type_path)
+        if index is None:
+            index = _last_type_indexes[last_type_path] = LastTypeIndex(last_type_path)
+    return index
 
-    df_last = pd.read_excel(last_type_path)
-    # เลือกเฉพาะคอลัมน์ที่จำเป็น - ✅ ปรับให้ใช้กับโครงสร้างใหม่
-    cols = ['bom_no', 'assy_pack_type']  # ใช้ assy_pack_type แทน Last_type
-    df_last = df_last[cols].drop_duplicates()
-    df_last.rename(columns={'assy_pack_type': 'Last_type'}, inplace=True)  # เปลี่ยนชื่อคอลัมน์
 
-    # โหลดไฟล์ bom_no ที่อัปโหลด
-    df_bom = pd.read_excel(input_bom_file) if input_bom_file.endswith('.xlsx') else pd.read_csv(input_bom_file)
+def lookup_last_type_df(df_bom, output_dir):
+    """ค้นหา Last_type ของ DataFrame ที่อ่านมาแล้ว (ใช้ดัชนีในหน่วยความจำ)"""
+    index = get_last_type_index(output_dir)
+    if index is None:
+        print(f"❌ ไม่พบไฟล์ {os.path.join(output_dir, 'Last_Type.xlsx')}")
+        return
+
     if 'bom_no' not in df_bom.columns:
         print("❌ ไฟล์ที่อัปโหลดไม่มีคอลัมน์ bom_no")
         return
 
-    # รวมข้อมูล (merge) เพื่อดึง Last_type
-    merge_cols = ['bom_no']
-    if 'package_code' in df_bom.columns and 'product_no' in df_bom.columns:
-        merge_cols += ['package_code', 'product_no']
+    return index.lookup(df_bom)
+
 
-    df_merged = pd.merge(df_bom, df_last, on=merge_cols, how='left')
-    return df_merged
+def lookup_last_type(input_bom_file, output_dir):
+    # โหลดไฟล์ bom_no ที่อัปโหลด
+    df_bom = pd.read_excel(input_bom_file) if input_bom_file.endswith('.xlsx') else pd.read_csv(input_bom_file)
+    return lookup_last_type_df(df_bom, output_dir)
 
 def run(input_path, output_dir):
     return run_all_years(input_path, output_dir)
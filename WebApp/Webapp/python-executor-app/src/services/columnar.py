@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow
+    from pyarrow import feather
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_EXT = ".feather"
+# metadata ใน schema ของ Feather: (mtime_ns, ขนาด) ของไฟล์ Excel ตอนเขียน sidecar
+SOURCE_KEY = b"source_identity"
+
+
+def _source_identity(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def sidecar_path(path, sheet_name=None):
+    """
+    path ของไฟล์ Feather ที่วางคู่กับไฟล์ผลลัพธ์
+    - ไม่ระบุ sheet: sheet แรก (อ่านแบบเดียวกับ pd.read_excel(path))  เช่น Last_Type.feather
+    - ระบุ sheet: ไฟล์แยกต่อ sheet  เช่น MC01.Processed_Data.feather
+    """
+    stem = os.path.splitext(path)[0]
+    if sheet_name:
+        return f"{stem}.{sheet_name}{SIDECAR_EXT}"
+    return stem + SIDECAR_EXT
+
+
+def write_sidecar(path, df, sheet_name=None):
+    """
+    เขียน DataFrame เป็น Feather คู่กับไฟล์ Excel ที่เพิ่งเขียนเสร็จ
+    บันทึก mtime และขนาดของไฟล์ Excel ไว้ใน metadata ให้ read_sidecar ตรวจว่าเป็นไฟล์เดียวกัน
+    ถ้าไม่มี pyarrow หรือแปลงข้อมูลไม่ได้ จะข้ามไป (Excel ยังเป็นไฟล์หลัก)
+    Returns:
+        str: path ของ sidecar หรือ None ถ้าไม่ได้เขียน
+    """
+    if not HAS_ARROW or df is None:
+        return None
+    target = sidecar_path(path, sheet_name)
+    temp_path = target + ".tmp"
+    try:
+        frame = df if df.index.equals(pd.RangeIndex(len(df))) else df.reset_index(drop=True)
+        if any(not isinstance(col, str) for col in frame.columns):
+            frame = frame.rename(columns=str)
+        table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[SOURCE_KEY] = json.dumps(_source_identity(path)).encode()
+        feather.write_feather(table.replace_schema_metadata(metadata), temp_path)
+        os.replace(temp_path, target)
+        return target
+    except Exception as e:
+        logger.warning(f"Cannot write sidecar for {os.path.basename(path)}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+
+def read_sidecar(path, sheet_name=None, columns=None):
+    """
+    อ่าน Feather ที่วางคู่กับไฟล์ผลลัพธ์ ใช้ได้เฉพาะเมื่อ mtime และขนาดของไฟล์ Excel ตรงกับตอนเขียน sidecar ทุกค่า
+    (ไฟล์ Excel ที่ถูกแทนที่ แม้คัดลอกมาโดยคง mtime เดิม หรือ sidecar รุ่นเก่าที่ไม่มี metadata จะอ่านจาก Excel)
+    Returns:
+        pandas DataFrame หรือ None ถ้าต้องอ่านจาก Excel แทน
+    """
+    if not HAS_ARROW:
+        return None
+    target = sidecar_path(path, sheet_name)
+    try:
+        source_identity = _source_identity(path)
+        if not os.path.exists(target):
+            return None
+    except OSError:
+        return None
+    try:
+        table = feather.read_table(target, columns=columns)
+        stored = (table.schema.metadata or {}).get(SOURCE_KEY)
+        if stored is None or json.loads(stored) != source_identity:
+            # ไฟล์ Excel ถูกแทนที่หลังเขียน sidecar
+            return None
+        return table.to_pandas()
+    except Exception as e:
+        logger.warning(f"Cannot read sidecar {os.path.basename(target)}: {e}")
+        return None
@@ -0,0 +1,241 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """งานหนึ่งงานที่รันเบื้องหลัง (หนึ่งครั้งของการเรียก function)"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, func_name, target, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.func_name = func_name
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.status = Job.QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (Job.DONE, Job.FAILED)
+
+    def to_dict(self):
+        """ข้อมูลสถานะสำหรับส่งออกเป็น JSON"""
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "func_name": self.func_name,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round((self.finished_at or now) - (self.started_at or now), 2),
+        }
+
+
+class CpuBudget:
+    """
+    จำนวน process คำนวณที่ใช้ได้รวมกันทั้ง server
+    งานใน JobManager ที่รันพร้อมกันขอ process pool จากงบเดียวกัน รวมกันจึงไม่เกิน total
+    (แต่ละงานไม่ตั้ง pool เท่าจำนวน CPU เองจนแย่ง CPU กันและช้าลงทุกงาน)
+    """
+
+    def __init__(self, total=None):
+        self.total = total or os.cpu_count() or 1
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def configure(self, total=None):
+        with self._lock:
+            if total is not None:
+                self.total = max(1, total)
+
+    @contextmanager
+    def lease(self, wanted):
+        """
+        ขอ process ไม่เกิน wanted ตัวจากงบที่เหลือ (ได้อย่างน้อย 1 เสมอโดยไม่ต้องรอ = ทำใน thread ของงานเอง)
+        คืนงบเมื่อออกจาก with
+        """
+        with self._lock:
+            granted = max(1, min(wanted, self.total - self._used))
+            self._used += granted
+        try:
+            yield granted
+        finally:
+            with self._lock:
+                self._used -= granted
+
+    def stats(self):
+        with self._lock:
+            return {"total": self.total, "in_use": self._used}
+
+
+# งบ process ของทั้ง process (JobManager ตั้งค่า total) function modules ใช้ผ่าน cpu_budget.lease()
+cpu_budget = CpuBudget()
+
+
+def process_pool(workers):
+    """
+    ProcessPoolExecutor ที่เริ่ม worker ด้วย forkserver (หรือ spawn บน Windows)
+    ไม่ใช้ fork เพราะ server มี thread อื่นทำงานอยู่ (job, retention) worker ที่ fork อาจได้ lock ที่ค้างอยู่ติดไปด้วย
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+class _Flight:
+    """ผลของ run_once ที่งานอื่นที่ key เดียวกันรออยู่"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class JobManager:
+    """
+    คิวงานเบื้องหลังภายใน process
+    - รันงานใน thread pool ขนาด max_workers
+    - จำกัดจำนวนงานที่รันพร้อมกันต่อ function (งานหนักไม่แย่ง worker ของงานเบา)
+    - เก็บประวัติงานล่าสุดไม่เกิน history ชิ้น
+    - งานที่คำนวณ key เดียวกันได้ระหว่างรัน ใช้ run_once รอผลจากงานที่รันอยู่แทนการรันซ้ำ (single-flight)
+    - cpu_workers: งบ process pool รวมของทุกงาน (cpu_budget)
+    """
+
+    def __init__(self, max_workers=4, concurrency=None, default_concurrency=2, history=200, cpu_workers=None):
+        cpu_budget.configure(total=cpu_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._concurrency = dict(concurrency or {})
+        self._default_concurrency = default_concurrency
+        self._history = history
+        self._jobs = OrderedDict()
+        self._running = {}
+        self._pending = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, func_name):
+        return max(1, self._concurrency.get(func_name, self._default_concurrency))
+
+    def submit(self, func_name, target, *args, **kwargs):
+        """
+        เพิ่มงานเข้าคิว
+        Args:
+            func_name: ชื่อ function module (ใช้จำกัดจำนวนงานพร้อมกัน)
+            target: callable ที่จะรัน ค่าที่คืนจะเก็บไว้ใน job.result
+        Returns:
+            Job: งานที่สร้างขึ้น
+        """
+        job = Job(func_name, target, args, kwargs)
+        with self._lock:
+            self._enqueue(job)
+        return job
+
+    def run_once(self, key, compute):
+        """
+        เรียก compute() ครั้งเดียวต่อ key ในช่วงเวลาเดียวกัน (เรียกจากภายในงาน)
+        งานอื่นที่เรียกด้วย key เดียวกันระหว่างนั้นจะรอและได้ผล (หรือข้อผิดพลาด) เดียวกัน
+        Args:
+            key: key ของงาน (เช่น hash ของ function + input)
+            compute: callable ที่ไม่รับ argument
+        Returns:
+            ค่าที่ compute() คืน
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            logger.info(f"🔗 Waiting for identical running job ({key[:12]})")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = compute()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        """จำนวนงานที่กำลังรันและรอคิวของแต่ละ function"""
+        with self._lock:
+            return {
+                "running": dict(self._running),
+                "pending": {name: len(queue) for name, queue in self._pending.items() if queue},
+                "cpu": cpu_budget.stats(),
+            }
+
+    def _enqueue(self, job):
+        # เรียกภายใต้ self._lock
+        logger.info(f"📥 Job {job.id} ({job.func_name}) queued")
+        self._jobs[job.id] = job
+        self._trim_history()
+        if self._running.get(job.func_name, 0) < self.limit_for(job.func_name):
+            self._dispatch(job)
+        else:
+            self._pending.setdefault(job.func_name, deque()).append(job)
+
+    def _dispatch(self, job):
+        # เรียกภายใต้ self._lock
+        self._running[job.func_name] = self._running.get(job.func_name, 0) + 1
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        job.status = Job.RUNNING
+        job.started_at = time.time()
+        logger.info(f"▶️ Job {job.id} ({job.func_name}) started")
+        try:
+            job.result = job.target(*job.args, **job.kwargs)
+            job.status = Job.DONE
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.func_name}) failed: {e}")
+            job.error = str(e)
+            job.status = Job.FAILED
+        finally:
+            job.finished_at = time.time()
+            job.target = job.args = job.kwargs = None
+            logger.info(f"⏹️ Job {job.id} ({job.func_name}) {job.status} in {job.finished_at - job.started_at:.2f}s")
+            with self._lock:
+                self._running[job.func_name] -= 1
+                queue = self._pending.get(job.func_name)
+                if queue:
+                    self._dispatch(queue.popleft())
+
+    def _trim_history(self):
+        # ลบงานที่เสร็จแล้วที่เก่าที่สุดเมื่อเกินจำนวนที่เก็บ
+        while len(self._jobs) > self._history:
+            for job_id, old_job in self._jobs.items():
+                if old_job.finished:
+                    del self._jobs[job_id]
+                    break
+            else:
+                break
@@ -0,0 +1,218 @@
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows ไม่มี resource ใช้ psutil ถ้าติดตั้งไว้ (ไม่มีก็ไม่วัดหน่วยความจำ)
+    resource = None
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+logger = logging.getLogger("metrics")
+
+# run ที่กำลังเก็บ stage อยู่ใน thread/context นี้
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+
+
+def peak_rss_mb():
+    """หน่วยความจำสูงสุดของ process ตั้งแต่เริ่ม (MB) หรือ None ถ้าวัดไม่ได้"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux รายงานเป็น KB, macOS เป็น bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    return None
+
+
+def _log(event, record):
+    logger.info(json.dumps({"event": event, **record}, ensure_ascii=False, default=str))
+
+
+class StageRecord:
+    """ผลวัดของหนึ่งขั้นตอน ตั้งค่า rows (และค่าอื่นใน fields) ระหว่างอยู่ใน with ได้"""
+
+    def __init__(self, name, rows=None, **fields):
+        self.name = name
+        self.rows = rows
+        self.fields = fields
+
+    def to_dict(self):
+        return {"stage": self.name, "rows": self.rows, **self.fields}
+
+
+@contextmanager
+def stage(name, rows=None, **fields):
+    """
+    วัดเวลา/CPU/หน่วยความจำของหนึ่งขั้นตอน
+    Args:
+        name: ชื่อขั้นตอน เช่น 'parse', 'mark_errors', 'excel_write'
+        rows: จำนวนแถว (ตั้งภายหลังได้ผ่าน record.rows)
+        fields: ข้อมูลเพิ่มเติม เช่น file=ชื่อไฟล์
+    ตัวอย่าง:
+        with stage('parse', file=name) as s:
+            df = load_and_parse_file(path)
+            s.rows = len(df)
+    ผลจะถูก log เป็น JSON และเก็บไว้กับ run ปัจจุบัน (ถ้ามี)
+    """
+    record = StageRecord(name, rows, **fields)
+    peak_before = peak_rss_mb()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        peak_after = peak_rss_mb()
+        data = record.to_dict()
+        data.update({
+            "status": status,
+            "wall_s": round(time.perf_counter() - wall_start, 4),
+            "cpu_s": round(time.thread_time() - cpu_start, 4),
+            "peak_rss_mb": peak_after,
+            # หน่วยความจำสูงสุดที่เพิ่มขึ้นระหว่างขั้นตอนนี้ (0 = ไม่ได้ทำให้ peak สูงขึ้น)
+            "peak_rss_growth_mb": None if peak_after is None else round(peak_after - peak_before, 1),
+        })
+        _log("stage", data)
+        run = _current_run.get()
+        if run is not None:
+            run.add_stages([data])
+
+
+def timed(name=None):
+    """
+    decorator ของ stage ตั้ง rows จากผลลัพธ์ให้อัตโนมัติถ้าคืนค่าที่มีความยาว (เช่น DataFrame)
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                result = func(*args, **kwargs)
+                if hasattr(result, "__len__"):
+                    record.rows = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def call_with_stages(func, *args, **kwargs):
+    """
+    เรียก func แล้วคืน (ผลลัพธ์, list ของ stage ที่เกิดขึ้น)
+    ใช้ใน process pool: worker ส่ง stage กลับมาให้ process หลักเก็บเข้า run ด้วย record_stages
+    """
+    run = RunRecord(getattr(func, "__name__", "worker"))
+    token = _current_run.set(run)
+    try:
+        return func(*args, **kwargs), run.stages
+    finally:
+        _current_run.reset(token)
+
+
+def record_stages(stages):
+    """เพิ่ม stage ที่วัดจาก process อื่นเข้า run ปัจจุบัน"""
+    run = _current_run.get()
+    if run is not None and stages:
+        run.add_stages(stages)
+
+
+class RunRecord:
+    """ผลวัดของการรัน function หนึ่งครั้ง พร้อม stage ทั้งหมดที่เกิดขึ้นระหว่างรัน"""
+
+    def __init__(self, func_name, **fields):
+        self.func_name = func_name
+        self.fields = fields
+        self.stages = []
+        self.started_at = time.time()
+        self.status = "running"
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_mb = None
+        self._lock = threading.Lock()
+
+    def add_stages(self, stages):
+        with self._lock:
+            self.stages.extend(stages)
+
+    def to_dict(self):
+        with self._lock:
+            stages = list(self.stages)
+        return {
+            "func_name": self.func_name,
+            **self.fields,
+            "status": self.status,
+            "started_at": self.started_at,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "peak_rss_mb": self.peak_rss_mb,
+            "stages": stages,
+        }
+
+
+class MetricsRecorder:
+    """เก็บผลวัดของการรันล่าสุดไม่เกิน history ครั้ง (ใช้กับ /api/metrics)"""
+
+    def __init__(self, history=50):
+        self._runs = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def configure(self, history=None):
+        with self._lock:
+            if history is not None:
+                self._runs = deque(self._runs, maxlen=history)
+
+    @contextmanager
+    def track_run(self, func_name, **fields):
+        """
+        เก็บทุก stage ที่เกิดใน context นี้เป็นการรันหนึ่งครั้ง
+        Args:
+            func_name: ชื่อ function module
+            fields: ข้อมูลเพิ่มเติม เช่น job_id
+        """
+        run = RunRecord(func_name, **fields)
+        with self._lock:
+            self._runs.append(run)
+        token = _current_run.set(run)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield run
+            run.status = "ok"
+        except BaseException:
+            run.status = "error"
+            raise
+        finally:
+            _current_run.reset(token)
+            run.wall_s = round(time.perf_counter() - wall_start, 4)
+            run.cpu_s = round(time.thread_time() - cpu_start, 4)
+            run.peak_rss_mb = peak_rss_mb()
+            summary = run.to_dict()
+            summary["stages"] = len(summary["stages"])
+            _log("run", summary)
+
+    def recent(self, limit=None, func_name=None):
+        """การรันล่าสุด (ใหม่สุดก่อน) กรองตาม function ได้"""
+        with self._lock:
+            runs = list(self._runs)
+        runs = [run for run in reversed(runs) if func_name is None or run.func_name == func_name]
+        if limit is not None:
+            runs = runs[:limit]
+        return [run.to_dict() for run in runs]
+
+
+metrics = MetricsRecorder()
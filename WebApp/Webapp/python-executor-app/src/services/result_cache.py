@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from services.result_table import TableView
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    แคช DataFrame ผลลัพธ์แบบ LRU
+    - key คือ path ของไฟล์ผลลัพธ์ ใช้ได้เมื่อ mtime และขนาดไฟล์ยังตรงกับตอนที่เก็บ
+    - function ที่มี DataFrame อยู่แล้วลงทะเบียนได้ทันทีหลังเขียนไฟล์ (ไม่ต้องอ่าน Excel กลับ)
+    - ลบรายการที่ใช้ล่าสุดนานที่สุดออกเมื่อหน่วยความจำรวมหรือจำนวนรายการเกินกำหนด
+      (นับรวมข้อความค้นหาและลำดับการเรียงที่ TableView สร้างเพิ่มภายหลังด้วย)
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, max_items=16):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.registered = 0
+        self.evictions = 0
+
+    def configure(self, max_bytes=None, max_items=None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_items is not None:
+                self.max_items = max_items
+            self._evict()
+
+    @staticmethod
+    def _identity(path):
+        # (path, mtime, size) ของไฟล์ หรือ None ถ้าไม่มีไฟล์
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def register(self, path, df):
+        """
+        เก็บ DataFrame ของไฟล์ผลลัพธ์ที่เพิ่งเขียนเสร็จ
+        Args:
+            path: path ของไฟล์ผลลัพธ์ (ต้องเขียนเสร็จแล้ว)
+            df: DataFrame เดียวกับที่เขียนลงไฟล์ (sheet แรก)
+        Returns:
+            TableView หรือ None ถ้าไม่พบไฟล์
+        """
+        identity = self._identity(path)
+        if identity is None or df is None:
+            return None
+        view = self._put(identity, TableView(df))
+        with self._lock:
+            self.registered += 1
+        return view
+
+    def get_view(self, path, loader):
+        """
+        หา TableView ของไฟล์ผลลัพธ์ ถ้าไม่อยู่ในแคช (หรือไฟล์ถูกแก้) จะอ่านด้วย loader
+        Args:
+            path: path ของไฟล์ผลลัพธ์
+            loader: callable(path) -> (DataFrame หรือ None, warning message)
+        Returns:
+            tuple: (TableView หรือ None, warning message)
+        """
+        identity = self._identity(path)
+        if identity is None:
+            return None, "ไม่พบไฟล์ผลลัพธ์"
+
+        with self._lock:
+            entry = self._entries.get(identity[0])
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(identity[0])
+                self.hits += 1
+                return entry[1], None
+            self.misses += 1
+
+        df, warning = loader(path)
+        if df is None:
+            return None, warning
+        return self._put(identity, TableView(df)), warning
+
+    def peek(self, path):
+        """TableView ที่อยู่ในแคชแล้วของไฟล์นี้ (ไม่อ่านไฟล์ ไม่นับเป็น hit/miss) หรือ None"""
+        identity = self._identity(path)
+        if identity is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(identity[0])
+            if entry is not None and entry[0] == identity:
+                return entry[1]
+        return None
+
+    def _put(self, identity, view):
+        key = identity[0]
+        view.on_grow = partial(self._grow, key)
+        nbytes = int(view.df.memory_usage(index=True, deep=True).sum()) + view.extra_bytes
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[2]
+            self._entries[key] = (identity, view, nbytes)
+            self._total_bytes += nbytes
+            self._evict()
+        return view
+
+    def _grow(self, key, view, added):
+        # TableView สร้างข้อความค้นหา/ลำดับการเรียงเพิ่ม นับเข้าขนาดของรายการแล้วลบรายการเก่าถ้าเกินงบ
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] is not view:
+                # รายการถูกลบหรือแทนที่ไปแล้ว ข้อมูลของ view นี้จะหายไปพร้อม view
+                return
+            self._entries[key] = (entry[0], view, entry[2] + added)
+            self._total_bytes += added
+            self._evict()
+
+    def _evict(self):
+        # เรียกภายใต้ self._lock เก็บรายการล่าสุดไว้อย่างน้อยหนึ่งรายการเสมอ
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_items or self._total_bytes > self.max_bytes
+        ):
+            key, (_, _, nbytes) = self._entries.popitem(last=False)
+            self._total_bytes -= nbytes
+            self.evictions += 1
+            logger.info(f"🧹 Result cache evicted {os.path.basename(key)} ({nbytes / 1024 / 1024:.1f} MB)")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "registered": self.registered,
+                "evictions": self.evictions,
+            }
+
+
+# แคชเดียวของทั้ง process ใช้ร่วมกันระหว่าง app และ function modules
+result_cache = ResultCache()
+
+
+def register_result(path, df):
+    """ลงทะเบียน DataFrame ของไฟล์ผลลัพธ์ที่เพิ่งเขียนกับแคชของ process"""
+    try:
+        return result_cache.register(path, df)
+    except Exception as e:
+        # แคชเป็นแค่ตัวเร่ง ห้ามทำให้การประมวลผลล้ม
+        logger.warning(f"Cannot cache result {path}: {e}")
+        return None
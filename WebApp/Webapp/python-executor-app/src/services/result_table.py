@@ -0,0 +1,149 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# จำนวนแถวสูงสุดที่ส่งต่อหนึ่งหน้า
+MAX_PAGE_LENGTH = 1000
+
+
+def _json_value(value):
+    # ค่าที่ JSON รองรับตรงๆ ส่งตามเดิม ที่เหลือ (วันที่, inf ฯลฯ) แปลงเป็นข้อความ
+    if isinstance(value, float) and not np.isfinite(value):
+        return str(value)
+    if isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+class TableView:
+    """
+    มุมมองตารางผลลัพธ์สำหรับ DataTables แบบ server-side
+    - เก็บ DataFrame ไว้ครั้งเดียว แล้วตัดหน้า/ค้นหา/เรียงลำดับฝั่ง server
+    - สร้างข้อความค้นหาและลำดับการเรียงของแต่ละคอลัมน์ครั้งแรกที่ใช้ แล้วเก็บไว้ใช้ซ้ำ
+    - แจ้งขนาดของข้อมูลที่สร้างเพิ่มผ่าน on_grow(view, nbytes) ให้แคชนับรวมในงบหน่วยความจำ
+    """
+
+    def __init__(self, df, on_grow=None):
+        # ใช้ DataFrame เดิมถ้า index เป็น 0..n-1 อยู่แล้ว (ไม่ต้อง copy)
+        self.df = df if df.index.equals(pd.RangeIndex(len(df))) else df.reset_index(drop=True)
+        self.columns = [str(col) for col in self.df.columns]
+        self._search_text = None
+        self._sort_orders = {}
+        self._extra_bytes = 0
+        self._lock = threading.Lock()
+        self.on_grow = on_grow
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def extra_bytes(self):
+        """ขนาดรวมของข้อความค้นหาและลำดับการเรียงที่สร้างไว้แล้ว (bytes)"""
+        with self._lock:
+            return self._extra_bytes
+
+    def _grew(self, nbytes):
+        # เรียกหลังปล่อย self._lock แล้ว (callback อาจเรียก extra_bytes หรือ lock ของแคช)
+        if nbytes and self.on_grow is not None:
+            self.on_grow(self, nbytes)
+
+    def _get_search_text(self):
+        # ข้อความทุกคอลัมน์ของแต่ละแถวรวมเป็นตัวพิมพ์เล็ก (สร้างครั้งเดียว)
+        added = 0
+        with self._lock:
+            if self._search_text is None:
+                text = pd.Series("", index=self.df.index, dtype=object)
+                for col in self.df.columns:
+                    values = self.df[col]
+                    text = text + "\t" + values.astype(str).where(values.notna(), "")
+                self._search_text = text.str.lower()
+                added = int(self._search_text.memory_usage(index=False, deep=True))
+                self._extra_bytes += added
+            search_text = self._search_text
+        self._grew(added)
+        return search_text
+
+    def _get_sort_order(self, col_idx):
+        # ตำแหน่งแถวเรียงจากน้อยไปมากของคอลัมน์ (ค่าว่างอยู่ท้ายสุด)
+        added = 0
+        with self._lock:
+            order = self._sort_orders.get(col_idx)
+            if order is None:
+                values = self.df.iloc[:, col_idx]
+                try:
+                    order = values.sort_values(kind="stable", na_position="last").index.to_numpy()
+                except TypeError:
+                    # คอลัมน์ที่มีหลายชนิดข้อมูลปนกัน เรียงแบบข้อความ
+                    order = values.astype(str).sort_values(kind="stable").index.to_numpy()
+                self._sort_orders[col_idx] = order
+                added = int(order.nbytes)
+                self._extra_bytes += added
+        self._grew(added)
+        return order
+
+    def query(self, start=0, length=25, search="", order_col=None, order_dir="asc"):
+        """
+        ดึงข้อมูลหนึ่งหน้า
+        Args:
+            start: ตำแหน่งแถวเริ่มต้น
+            length: จำนวนแถวต่อหน้า
+            search: คำค้นหา (ค้นทุกคอลัมน์ ไม่สนตัวพิมพ์เล็ก/ใหญ่)
+            order_col: ลำดับคอลัมน์ที่ใช้เรียง (0 = เลขแถว, 1.. = คอลัมน์ของ DataFrame)
+            order_dir: 'asc' หรือ 'desc'
+        Returns:
+            tuple: (จำนวนแถวหลังกรอง, list ของแถว [เลขแถว, ค่า...])
+        """
+        search = (search or "").strip().lower()
+        mask = None
+        if search:
+            mask = self._get_search_text().str.contains(search, regex=False).to_numpy()
+
+        if order_col and 0 < order_col <= len(self.columns):
+            positions = self._get_sort_order(order_col - 1)
+            if order_dir == "desc":
+                positions = positions[::-1]
+            if mask is not None:
+                positions = positions[mask[positions]]
+        else:
+            positions = np.flatnonzero(mask) if mask is not None else np.arange(len(self.df))
+            if order_col == 0 and order_dir == "desc":
+                positions = positions[::-1]
+
+        records_filtered = len(positions)
+        start = max(int(start or 0), 0)
+        page_positions = positions[start:start + int(length)]
+
+        page = self.df.iloc[page_positions]
+        page = page.astype(object).where(page.notna(), "")
+        rows = [
+            [int(pos) + 1] + [_json_value(value) for value in row]
+            for pos, row in zip(page_positions, page.itertuples(index=False, name=None))
+        ]
+        return records_filtered, rows
+
+
+def parse_datatables_args(args):
+    """
+    อ่านพารามิเตอร์ที่ DataTables ส่งมาในโหมด serverSide
+    Returns:
+        dict: draw, start, length, search, order_col, order_dir
+    """
+    def to_int(value, default):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
+    length = to_int(args.get("length"), 25)
+    if length <= 0 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+    order_col = args.get("order[0][column]")
+    return {
+        "draw": to_int(args.get("draw"), 0),
+        "start": to_int(args.get("start"), 0),
+        "length": length,
+        "search": args.get("search[value]", ""),
+        "order_col": to_int(order_col, None) if order_col is not None else None,
+        "order_dir": "desc" if args.get("order[0][dir]") == "desc" else "asc",
+    }
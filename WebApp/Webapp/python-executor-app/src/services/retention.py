@@ -0,0 +1,337 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+from services.columnar import SIDECAR_EXT
+from services.run_outputs import RUNS_DIR, MANIFEST_FILE, load_manifest
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_PREFIX = "output_"
+# ไฟล์ผลลัพธ์ที่เขียนตรงในโฟลเดอร์ output พร้อมวันเวลา เช่น Summary_20250702_193509.csv, MC 41_20250702_173037.xlsx
+# (ไฟล์ชื่อคงที่อย่าง Last_Type.xlsx ไม่เข้ารูปแบบนี้ จึงไม่ถูกลบ)
+TIMESTAMPED_FILE = re.compile(r".+_\d{8}_\d{6}\.(xlsx|csv)$", re.IGNORECASE)
+
+DEFAULT_POLICY = {"max_bytes": None, "max_age": None, "keep_last": None}
+
+
+class RetentionManager:
+    """
+    จำกัดผลลัพธ์ที่เก็บไว้ในโฟลเดอร์ output_<func> ตาม policy ของแต่ละ function
+    - max_bytes: ขนาดรวมสูงสุด (ลบการรันที่เก่าที่สุดก่อน เก็บการรันล่าสุดไว้เสมอแม้ขนาดเกิน)
+    - max_age: อายุสูงสุด (วินาที)
+    - keep_last: จำนวนการรันล่าสุดที่เก็บไว้
+    หนึ่งรายการคือโฟลเดอร์ runs/<run_id> หรือไฟล์ผลลัพธ์แบบมีวันเวลาที่อยู่ตรงในโฟลเดอร์ output (พร้อมไฟล์ Feather คู่กัน)
+    โฟลเดอร์ที่ยังไม่มี manifest.json (กำลังรันหรือรันไม่สำเร็จ) ลบเมื่ออายุเกิน incomplete_ttl เท่านั้น
+    เก็บ index ของไฟล์ในรายการที่ยังอยู่ ให้ route ดาวน์โหลดหา path ได้โดยไม่ต้องค้นโฟลเดอร์
+    """
+
+    def __init__(self, base_dir=None, default_policy=None, policies=None, interval=3600, incomplete_ttl=24 * 3600):
+        self.base_dir = base_dir
+        self.default_policy = dict(DEFAULT_POLICY, **(default_policy or {}))
+        self.policies = dict(policies or {})
+        self.interval = interval
+        self.incomplete_ttl = incomplete_ttl
+        # {func_name: {ชื่อไฟล์เทียบกับโฟลเดอร์ output: path}}
+        self._index = {}
+        # {func_name: {run_id: ข้อมูลสรุปของรายการ}}
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # งานทำความสะอาดอื่นที่ทำในรอบเดียวกัน: [(ชื่อ, callable() -> dict สรุปผล)]
+        self._tasks = []
+        self.sweeps = 0
+        self.removed = 0
+        self.freed_bytes = 0
+        self.last_sweep = None
+
+    def configure(self, base_dir=None, default_policy=None, policies=None, interval=None, incomplete_ttl=None):
+        with self._lock:
+            if base_dir is not None and base_dir != self.base_dir:
+                self.base_dir = base_dir
+                self._index = {}
+                self._runs = {}
+            if default_policy is not None:
+                self.default_policy = dict(DEFAULT_POLICY, **default_policy)
+            if policies is not None:
+                self.policies = dict(policies)
+            if interval is not None:
+                self.interval = interval
+            if incomplete_ttl is not None:
+                self.incomplete_ttl = incomplete_ttl
+
+    def policy_for(self, func_name):
+        return dict(self.default_policy, **self.policies.get(func_name, {}))
+
+    # ---------- scan ----------
+
+    @staticmethod
+    def _dir_size(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def _scan_runs(self, output_dir):
+        entries = []
+        runs_dir = os.path.join(output_dir, RUNS_DIR)
+        if not os.path.isdir(runs_dir):
+            return entries
+        with os.scandir(runs_dir) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                manifest = load_manifest(entry.path)
+                try:
+                    stat = os.stat(os.path.join(entry.path, MANIFEST_FILE)) if manifest else entry.stat()
+                except OSError:
+                    continue
+                files = {}
+                if manifest:
+                    for artifact in manifest.get("artifacts", []):
+                        files[f"{RUNS_DIR}/{entry.name}/{artifact['name']}"] = os.path.join(entry.path, artifact["name"])
+                entries.append({
+                    "run_id": entry.name,
+                    "path": entry.path,
+                    "paths": [entry.path],
+                    "files": files,
+                    "primary": manifest.get("primary") if manifest else None,
+                    "bytes": self._dir_size(entry.path),
+                    "mtime": stat.st_mtime,
+                    "complete": manifest is not None,
+                })
+        return entries
+
+    @staticmethod
+    def _scan_loose_files(output_dir):
+        entries = []
+        with os.scandir(output_dir) as it:
+            names = {entry.name: entry for entry in it if entry.is_file(follow_symlinks=False)}
+        for name, entry in names.items():
+            if not TIMESTAMPED_FILE.match(name):
+                continue
+            stem = os.path.splitext(name)[0]
+            # Feather คู่กัน: <stem>.feather หรือ <stem>.<sheet>.feather
+            sidecars = [other for other in names
+                        if other.endswith(SIDECAR_EXT) and (other == stem + SIDECAR_EXT or other.startswith(stem + "."))]
+            try:
+                stat = entry.stat()
+                size = stat.st_size + sum(names[other].stat().st_size for other in sidecars)
+            except OSError:
+                continue
+            entries.append({
+                "run_id": name,
+                "path": entry.path,
+                "paths": [entry.path] + [names[other].path for other in sidecars],
+                "files": {name: entry.path},
+                "primary": name,
+                "bytes": size,
+                "mtime": stat.st_mtime,
+                "complete": True,
+            })
+        return entries
+
+    def _select_expired(self, entries, policy, now):
+        """แยกรายการที่ต้องลบ (entries เรียงจากใหม่ไปเก่า)"""
+        max_bytes, max_age, keep_last = policy["max_bytes"], policy["max_age"], policy["keep_last"]
+        kept, kept_bytes = 0, 0
+        expired = []
+        for entry in entries:
+            age = now - entry["mtime"]
+            if not entry["complete"]:
+                if age > self.incomplete_ttl:
+                    expired.append(entry)
+                continue
+            too_old = max_age is not None and age > max_age
+            too_many = keep_last is not None and kept >= keep_last
+            too_big = max_bytes is not None and kept > 0 and kept_bytes + entry["bytes"] > max_bytes
+            if too_old or too_many or too_big:
+                expired.append(entry)
+            else:
+                kept += 1
+                kept_bytes += entry["bytes"]
+        return expired
+
+    @staticmethod
+    def _remove(entry):
+        for path in entry["paths"]:
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ---------- sweep ----------
+
+    def sweep_function(self, func_name, now=None):
+        """
+        ลบผลลัพธ์ของ function ที่เกิน policy แล้วสร้าง index ของรายการที่เหลือใหม่
+        Returns:
+            dict: kept, removed, freed_bytes, bytes (ขนาดรวมที่เหลือ)
+        """
+        output_dir = os.path.join(self.base_dir, OUTPUT_PREFIX + func_name)
+        now = time.time() if now is None else now
+        if not os.path.isdir(output_dir):
+            return {"kept": 0, "removed": 0, "freed_bytes": 0, "bytes": 0}
+
+        entries = self._scan_runs(output_dir) + self._scan_loose_files(output_dir)
+        entries.sort(key=lambda e: e["mtime"], reverse=True)
+        expired = self._select_expired(entries, self.policy_for(func_name), now)
+
+        removed, freed = 0, 0
+        for entry in expired:
+            try:
+                self._remove(entry)
+            except OSError as e:
+                logger.warning(f"⚠️ ลบผลลัพธ์ {func_name}/{entry['run_id']} ไม่ได้: {e}")
+                continue
+            removed += 1
+            freed += entry["bytes"]
+            logger.info(f"🧹 Retention removed {func_name}/{entry['run_id']} ({entry['bytes'] / 1024 / 1024:.1f} MB)")
+
+        expired_ids = {id(entry) for entry in expired}
+        kept = [entry for entry in entries if id(entry) not in expired_ids]
+        index = {}
+        for entry in kept:
+            index.update(entry["files"])
+        with self._lock:
+            self._index[func_name] = index
+            self._runs[func_name] = {entry["run_id"]: self._summary(entry) for entry in kept}
+            self.removed += removed
+            self.freed_bytes += freed
+        return {"kept": len(kept), "removed": removed, "freed_bytes": freed, "bytes": sum(e["bytes"] for e in kept)}
+
+    def sweep(self):
+        """ตรวจทุกโฟลเดอร์ output_* ใน base_dir"""
+        if not self.base_dir or not os.path.isdir(self.base_dir):
+            return {}
+        with self._sweep_lock:
+            started = time.perf_counter()
+            result = {}
+            with os.scandir(self.base_dir) as it:
+                func_names = sorted(entry.name[len(OUTPUT_PREFIX):] for entry in it
+                                    if entry.is_dir() and entry.name.startswith(OUTPUT_PREFIX))
+            for func_name in func_names:
+                try:
+                    result[func_name] = self.sweep_function(func_name)
+                except OSError as e:
+                    logger.warning(f"⚠️ ตรวจโฟลเดอร์ผลลัพธ์ของ {func_name} ไม่ได้: {e}")
+            tasks = {}
+            for name, task in list(self._tasks):
+                try:
+                    tasks[name] = task()
+                except Exception as e:
+                    logger.warning(f"⚠️ งานทำความสะอาด {name} ล้มเหลว: {e}")
+            with self._lock:
+                self.sweeps += 1
+                self.last_sweep = {"at": time.time(), "elapsed": round(time.perf_counter() - started, 3),
+                                   "functions": result, "tasks": tasks}
+            return result
+
+    def add_task(self, name, task):
+        """เพิ่มงานทำความสะอาดที่ทำทุกรอบตรวจ (เช่น ลบไฟล์อัปโหลดที่ไม่ได้ใช้) task() คืน dict สรุปผล"""
+        with self._lock:
+            self._tasks = [(n, t) for n, t in self._tasks if n != name] + [(name, task)]
+
+    # ---------- index ----------
+
+    @staticmethod
+    def _summary(entry):
+        return {"primary": entry["primary"], "bytes": entry["bytes"], "mtime": entry["mtime"],
+                "complete": entry["complete"], "files": sorted(entry["files"])}
+
+    def register_run(self, func_name, run_id, run_dir, manifest):
+        """เพิ่มการรันที่เพิ่งเสร็จเข้า index ทันที (ไม่ต้องรอรอบตรวจถัดไป)"""
+        files = {f"{RUNS_DIR}/{run_id}/{artifact['name']}": os.path.join(run_dir, artifact["name"])
+                 for artifact in manifest.get("artifacts", [])}
+        entry = {"primary": manifest.get("primary"), "bytes": manifest.get("total_bytes", 0),
+                 "mtime": time.time(), "complete": True, "files": files}
+        self._add(func_name, run_id, entry)
+
+    def register_file(self, func_name, filename, path):
+        """เพิ่มไฟล์ผลลัพธ์เดี่ยว (เช่น ผล lookup_last_type) เข้า index"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self._add(func_name, filename, {"primary": filename, "bytes": size, "mtime": time.time(),
+                                        "complete": True, "files": {filename: path}})
+
+    def _add(self, func_name, run_id, entry):
+        with self._lock:
+            self._index.setdefault(func_name, {}).update(entry["files"])
+            self._runs.setdefault(func_name, {})[run_id] = self._summary(entry)
+
+    def resolve(self, func_name, filename):
+        """
+        path ของไฟล์ผลลัพธ์จาก index
+        Returns:
+            str: path หรือ None ถ้าไม่อยู่ใน index (ไฟล์ถูกลบไปแล้ว หรือยังไม่ได้ตรวจ)
+        """
+        with self._lock:
+            return self._index.get(func_name, {}).get(filename)
+
+    def runs(self, func_name):
+        """รายการผลลัพธ์ที่เก็บไว้ของ function เรียงจากใหม่ไปเก่า"""
+        with self._lock:
+            runs = self._runs.get(func_name, {})
+            return sorted(({"run_id": run_id, **info} for run_id, info in runs.items()),
+                          key=lambda r: r["mtime"], reverse=True)
+
+    # ---------- background sweeper ----------
+
+    def start(self):
+        """เริ่ม thread ตรวจทุก interval วินาที (ตรวจครั้งแรกทันทีเพื่อสร้าง index) เรียกซ้ำได้"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="retention-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {e}")
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "base_dir": self.base_dir,
+                "interval": self.interval,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "sweeps": self.sweeps,
+                "removed": self.removed,
+                "freed_bytes": self.freed_bytes,
+                "last_sweep": self.last_sweep,
+                "functions": {
+                    func_name: {
+                        "policy": self.policy_for(func_name),
+                        "runs": len(runs),
+                        "bytes": sum(info["bytes"] for info in runs.values()),
+                    }
+                    for func_name, runs in self._runs.items()
+                },
+            }
+
+
+retention = RetentionManager()
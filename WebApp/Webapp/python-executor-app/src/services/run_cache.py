@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 1024 * 1024
+
+
+class RunCache:
+    """
+    แคชผลการรัน function แบบ content-addressed
+    - key = sha256 ของ (ชื่อ function, hash ของ source module, ชื่อและ sha256 ของไฟล์ input ทุกไฟล์,
+      และไฟล์อ้างอิงนอก input ที่ module ประกาศไว้ใน cache_dependencies())
+    - เก็บผลของ run_function_job (ชื่อไฟล์ผลลัพธ์) พร้อม mtime/ขนาดไฟล์ ใช้ได้เมื่อไฟล์ยังอยู่และไม่ถูกเขียนทับ
+    - module ที่ผลลัพธ์ขึ้นกับอย่างอื่นนอกจาก input (เช่น สถานะสะสม) ตั้ง CACHEABLE = False
+    - บันทึก index เป็น JSON เพื่อใช้ต่อหลัง restart
+    """
+
+    def __init__(self, path=None, max_entries=500, max_digests=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_digests = max_digests
+        self._entries = None
+        # sha256 ของไฟล์ที่เคยคำนวณแล้ว: (device, inode, size, mtime) -> digest
+        # ไฟล์ที่ staging ทำ hard link มาใช้ inode เดียวกับต้นฉบับ จึงไม่ต้องอ่านซ้ำทุกครั้งที่ส่งไฟล์เดิม
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def configure(self, path=None, max_entries=None):
+        with self._lock:
+            if path is not None and path != self.path:
+                self.path = path
+                self._entries = None
+            if max_entries is not None:
+                self.max_entries = max_entries
+
+    # ---------- key ----------
+
+    def file_digest(self, path):
+        """sha256 ของเนื้อหาไฟล์ (จำค่าที่เคยคำนวณตาม inode/ขนาด/mtime)"""
+        stat = os.stat(path)
+        identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(identity)
+            if digest is not None:
+                self._digests.move_to_end(identity)
+                return digest
+
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(READ_BLOCK), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        with self._lock:
+            self._digests[identity] = digest
+            while len(self._digests) > self.max_digests:
+                self._digests.popitem(last=False)
+        return digest
+
+    def make_key(self, func_name, module, input_dir, known_digests=None):
+        """
+        key ของการรัน func_name กับไฟล์ใน input_dir
+        Args:
+            func_name: ชื่อ function module
+            module: module ที่ import แล้ว (ใช้ hash source และ cache_dependencies)
+            input_dir: โฟลเดอร์ input ของการรัน
+            known_digests: {ชื่อไฟล์เทียบกับ input_dir: sha256} ที่รู้อยู่แล้ว (เช่น file_id ของ upload store)
+                ไฟล์เหล่านี้ไม่ต้องอ่านเพื่อ hash ซ้ำ
+        Returns:
+            str: sha256 hex
+        """
+        parts = [f"function:{func_name}"]
+        source = getattr(module, "__file__", None)
+        parts.append(f"source:{self.file_digest(source) if source else ''}")
+
+        for root, _, files in sorted(os.walk(input_dir)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, input_dir).replace(os.sep, "/")
+                digest = (known_digests or {}).get(rel) or self.file_digest(path)
+                parts.append(f"input:{rel}:{digest}")
+
+        dependencies = getattr(module, "cache_dependencies", None)
+        for path in (dependencies() if callable(dependencies) else []):
+            digest = self.file_digest(path) if os.path.isfile(path) else "missing"
+            parts.append(f"dependency:{os.path.basename(path)}:{digest}")
+
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cacheable(module):
+        return bool(getattr(module, "CACHEABLE", True))
+
+    # ---------- entries ----------
+
+    @staticmethod
+    def _identity(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _load(self):
+        # เรียกภายใต้ self._lock
+        if self._entries is not None:
+            return self._entries
+        self._entries = OrderedDict()
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ อ่าน index แคชผลการรันไม่ได้ เริ่มใหม่: {e}")
+        return self._entries
+
+    def _save(self):
+        # เรียกภายใต้ self._lock
+        if not self.path:
+            return
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ บันทึก index แคชผลการรันไม่ได้: {e}")
+
+    def get(self, key):
+        """
+        ผลการรันที่เก็บไว้ของ key นี้
+        Returns:
+            dict: ผลเดิมของ run_function_job (func_name, output_dir, filename) หรือ None
+        """
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is not None:
+                path = os.path.join(entry["result"]["output_dir"], entry["result"]["filename"])
+                if self._identity(path) != entry["identity"]:
+                    # ไฟล์ผลลัพธ์ถูกลบหรือเขียนทับแล้ว
+                    del entries[key]
+                    self._save()
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry["result"])
+
+    def put(self, key, result, inputs=()):
+        """
+        เก็บผลของ run_function_job (ต้องมี output_dir และ filename)
+        Args:
+            inputs: sha256 ของไฟล์ใน upload store ที่ใช้ (upload store จะไม่ลบไฟล์เหล่านี้ขณะที่ผลยังอยู่ในแคช)
+        """
+        identity = self._identity(os.path.join(result["output_dir"], result["filename"]))
+        if identity is None:
+            return
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"result": dict(result), "identity": identity, "created_at": time.time(),
+                            "inputs": sorted(set(inputs))}
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self.stores += 1
+            self._save()
+
+    def referenced_inputs(self):
+        """sha256 ของไฟล์ upload store ที่ผลในแคชอ้างอิงอยู่"""
+        with self._lock:
+            return {digest for entry in self._load().values() for digest in entry.get("inputs", ())}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._load()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "known_digests": len(self._digests),
+            }
+
+
+run_cache = RunCache()
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+from services.columnar import SIDECAR_EXT
+from services.result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+RUNS_DIR = "runs"
+MANIFEST_FILE = "manifest.json"
+TABLE_EXTENSIONS = (".xlsx", ".csv")
+
+
+def create_run_dir(output_dir):
+    """
+    สร้างโฟลเดอร์ผลลัพธ์ของการรันหนึ่งครั้ง: <output_dir>/runs/<วันเวลา>_<id>
+    แต่ละการรันเขียนไฟล์ของตัวเอง ผู้ใช้สองคนที่รัน function เดียวกันพร้อมกันจึงไม่เห็นผลของกันและกัน
+    Returns:
+        tuple: (run_id, path ของโฟลเดอร์)
+    """
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    run_dir = os.path.join(output_dir, RUNS_DIR, run_id)
+    os.makedirs(run_dir)
+    return run_id, run_dir
+
+
+def restore_shared_state(module, shared_dir, run_dir):
+    """
+    คัดลอกไฟล์สถานะที่ module ประกาศไว้ใน SHARED_STATE จากโฟลเดอร์กลางเข้าโฟลเดอร์ของการรัน
+    (คัดลอก ไม่ใช้ link เพราะ module อาจเขียนทับไฟล์เดิมในที่)
+    Returns:
+        list: ชื่อไฟล์ที่คัดลอก
+    """
+    restored = []
+    for name in getattr(module, "SHARED_STATE", ()):
+        source_path = os.path.join(shared_dir, name)
+        if os.path.isfile(source_path):
+            shutil.copy2(source_path, os.path.join(run_dir, name))
+            restored.append(name)
+    return restored
+
+
+def clear_shared_state(module, shared_dir):
+    """
+    ลบไฟล์สถานะใน SHARED_STATE ออกจากโฟลเดอร์กลาง การรันครั้งถัดไปจะเริ่มสะสมใหม่
+    (Last_Type.xlsx เดิมยังอยู่ให้หน้า lookup ใช้จนกว่าจะรันใหม่)
+    Returns:
+        list: ชื่อไฟล์ที่ลบ
+    """
+    removed = []
+    for name in getattr(module, "SHARED_STATE", ()):
+        try:
+            os.remove(os.path.join(shared_dir, name))
+            removed.append(name)
+        except FileNotFoundError:
+            pass
+    if removed:
+        logger.info(f"Cleared shared state {removed} in {shared_dir}")
+    return removed
+
+
+def publish_shared_outputs(module, run_dir, shared_dir):
+    """
+    วางไฟล์ที่ module ประกาศไว้ใน SHARED_OUTPUTS และ SHARED_STATE กลับไปที่โฟลเดอร์กลาง
+    (เช่น Last_Type.xlsx ที่หน้า lookup อ่าน) แทนที่ไฟล์เดิมด้วย os.replace ผู้อ่านจึงไม่เห็นไฟล์ที่เขียนไม่ครบ
+    ใช้ hard link ถ้าได้ ไม่ใช้ symlink เพราะโฟลเดอร์ของการรันอาจถูกลบภายหลัง
+    Returns:
+        list: ชื่อไฟล์ที่วาง
+    """
+    names = list(dict.fromkeys([*getattr(module, "SHARED_OUTPUTS", ()), *getattr(module, "SHARED_STATE", ())]))
+    published = []
+    for name in names:
+        source_path = os.path.join(run_dir, name)
+        if not os.path.isfile(source_path):
+            continue
+        dest_path = os.path.join(shared_dir, name)
+        temp_path = dest_path + ".publish"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            shutil.copy2(source_path, temp_path)
+        os.replace(temp_path, dest_path)
+        published.append(name)
+    if published:
+        logger.info(f"Published {published} to {shared_dir}")
+    return published
+
+
+def build_manifest(func_name, run_id, run_dir):
+    """
+    รายการไฟล์ที่การรันสร้างขึ้น (ไม่รวมไฟล์ Feather ที่วางคู่กับ Excel) บันทึกเป็น manifest.json ในโฟลเดอร์ของการรัน
+    - rows: จำนวนแถวของตารางที่ function ลงทะเบียนไว้ในแคชผลลัพธ์ (None ถ้าไม่รู้โดยไม่ต้องอ่านไฟล์)
+    - primary: ตาราง (.xlsx/.csv) ที่เขียนล่าสุด ใช้แสดงผลและดาวน์โหลด
+    Returns:
+        dict: func_name, run_id, created_at, primary, total_bytes, artifacts
+    """
+    artifacts = []
+    newest = None
+    with os.scandir(run_dir) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_file() or entry.name == MANIFEST_FILE or entry.name.endswith(SIDECAR_EXT):
+                continue
+            stat = entry.stat()
+            is_table = entry.name.lower().endswith(TABLE_EXTENSIONS)
+            view = result_cache.peek(entry.path) if is_table else None
+            artifacts.append({
+                "name": entry.name,
+                "kind": "table" if is_table else "file",
+                "size": stat.st_size,
+                "rows": len(view) if view is not None else None,
+            })
+            if is_table and (newest is None or stat.st_mtime_ns >= newest[0]):
+                newest = (stat.st_mtime_ns, entry.name)
+
+    manifest = {
+        "func_name": func_name,
+        "run_id": run_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "primary": newest[1] if newest else None,
+        "total_bytes": sum(a["size"] for a in artifacts),
+        "artifacts": artifacts,
+    }
+    manifest_path = os.path.join(run_dir, MANIFEST_FILE)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest
+
+
+def load_manifest(run_dir):
+    """อ่าน manifest.json ของการรัน (None ถ้าไม่มีหรืออ่านไม่ได้)"""
+    try:
+        with open(os.path.join(run_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,66 @@
+import logging
+import os
+import shutil
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+HARDLINK = "hardlink"
+SYMLINK = "symlink"
+COPY = "copy"
+
+
+def stage_file(source_path, dest_path, link=True):
+    """
+    วางไฟล์ต้นฉบับลงโฟลเดอร์ชั่วคราวโดยไม่คัดลอกข้อมูลถ้าทำได้
+    - hard link: อยู่ filesystem เดียวกัน ลบโฟลเดอร์ชั่วคราวได้โดยไม่กระทบต้นฉบับ
+    - symlink: ต่าง device หรือ filesystem ไม่รองรับ hard link (rmtree ลบแค่ link)
+    - copy: สร้าง link ไม่ได้เลย (เช่น Windows ที่ไม่มีสิทธิ์สร้าง symlink) หรือ link=False
+    function module อ่าน input อย่างเดียว จึงใช้ไฟล์เดียวกับต้นฉบับได้
+    Returns:
+        str: วิธีที่ใช้ (HARDLINK, SYMLINK หรือ COPY)
+    """
+    if link:
+        try:
+            os.link(source_path, dest_path)
+            return HARDLINK
+        except OSError:
+            pass
+        try:
+            os.symlink(os.path.abspath(source_path), dest_path)
+            return SYMLINK
+        except (OSError, NotImplementedError):
+            pass
+    shutil.copy2(source_path, dest_path)
+    return COPY
+
+
+def stage_files(source_dir, filenames, dest_dir, link=True):
+    """
+    วางไฟล์ที่เลือกจาก source_dir ลง dest_dir (ข้ามชื่อว่างและไฟล์ที่ไม่มีอยู่)
+    Args:
+        source_dir: โฟลเดอร์ต้นฉบับ เช่น data_logview, Upload
+        filenames: ชื่อไฟล์ที่เลือก (ชื่อไฟล์อย่างเดียว ห้ามมี path)
+        dest_dir: โฟลเดอร์ชั่วคราวของการรัน
+        link: False = คัดลอกทุกไฟล์แบบเดิม
+    Returns:
+        dict: {ชื่อไฟล์: วิธีที่ใช้}
+    Raises:
+        ValueError: ชื่อไฟล์มี path ติดมา (เช่น ../) ซึ่งจะ link หรือคัดลอกไฟล์นอก source_dir
+    """
+    staged = {}
+    for filename in filenames:
+        filename = filename.strip()
+        # ชื่อซ้ำ: ไฟล์ปลายทางเป็น link ไปยังต้นฉบับแล้ว ห้ามคัดลอกทับ
+        if not filename or filename in staged:
+            continue
+        if os.path.basename(filename.replace("\\", "/")) != filename or filename in (".", ".."):
+            raise ValueError(f"ชื่อไฟล์ไม่ถูกต้อง: {filename}")
+        source_path = os.path.join(source_dir, filename)
+        if not os.path.exists(source_path):
+            continue
+        staged[filename] = stage_file(source_path, os.path.join(dest_dir, filename), link)
+        logger.info(f"Staged file: {filename} ({staged[filename]})")
+    if staged:
+        logger.info(f"Staged {len(staged)} files to {dest_dir}: {dict(Counter(staged.values()))}")
+    return staged
@@ -0,0 +1,379 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from services.staging import stage_file
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 1024 * 1024
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """ข้อผิดพลาดของการอัปโหลด พร้อม HTTP status ที่ควรตอบกลับ"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadStore:
+    """
+    ที่เก็บไฟล์อัปโหลดแบบ content-addressed (ชื่อไฟล์ = sha256 ของเนื้อหา)
+    - เนื้อหาเดียวกันเก็บครั้งเดียว ส่งไฟล์เดิมซ้ำ (sha256 ตรงกัน) ไม่ต้องอัปโหลดหรือบันทึกใหม่
+    - อัปโหลดเป็นช่วง (chunk) เขียนลงดิสก์ทันทีพร้อมคำนวณ hash และต่อจากจุดที่ค้างได้ถ้าการเชื่อมต่อหลุด
+    - จำกัดขนาดต่อไฟล์ไม่เกิน max_file_size
+    - mtime ของ object คือเวลาที่ใช้ล่าสุด (บันทึก ส่งซ้ำ หรือวางลงการรัน) evict() ลบ object ที่ไม่ได้ใช้นาน/เกินขนาดรวม
+    โครงสร้าง:
+        <root>/objects/<2 ตัวแรกของ sha256>/<sha256>
+        <root>/sessions/<upload_id>.json และ <upload_id>.part
+    """
+
+    def __init__(self, root=None, max_file_size=50 * 1024 * 1024,
+                 chunk_size=5 * 1024 * 1024, session_ttl=24 * 3600):
+        self.root = root
+        self.max_file_size = max_file_size
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._session_locks = {}
+        # hash ที่คำนวณค้างไว้ของแต่ละ session: upload_id -> (hasher, จำนวน byte ที่ hash แล้ว)
+        self._hashers = {}
+
+    def configure(self, root=None, max_file_size=None, chunk_size=None, session_ttl=None):
+        with self._lock:
+            if root is not None:
+                self.root = root
+            if max_file_size is not None:
+                self.max_file_size = max_file_size
+            if chunk_size is not None:
+                self.chunk_size = chunk_size
+            if session_ttl is not None:
+                self.session_ttl = session_ttl
+
+    # ---------- objects ----------
+
+    def object_path(self, file_id):
+        if not _SHA256_RE.match(file_id or ""):
+            raise UploadError("file_id ไม่ถูกต้อง")
+        return os.path.join(self.root, "objects", file_id[:2], file_id)
+
+    def has(self, file_id):
+        try:
+            return os.path.isfile(self.object_path(file_id))
+        except UploadError:
+            return False
+
+    def touch(self, file_id):
+        """บันทึกว่าเพิ่งใช้ object นี้ (evict ลบ object ที่ใช้ล่าสุดนานที่สุดก่อน)"""
+        try:
+            os.utime(self.object_path(file_id))
+        except (OSError, UploadError):
+            pass
+
+    def _commit_object(self, temp_path, file_id):
+        """ย้ายไฟล์ที่เขียนเสร็จแล้วเข้า objects (ถ้ามีเนื้อหาเดียวกันอยู่แล้วทิ้งไฟล์ใหม่)"""
+        target = self.object_path(file_id)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(temp_path)
+            self.touch(file_id)
+        else:
+            os.replace(temp_path, target)
+        return file_id
+
+    def save_stream(self, stream, filename=None):
+        """
+        บันทึกไฟล์ทั้งไฟล์จาก stream (เช่น FileStorage.stream ของฟอร์มอัปโหลดปกติ) พร้อมคำนวณ hash
+        Returns:
+            str: file_id (sha256)
+        """
+        os.makedirs(os.path.join(self.root, "sessions"), exist_ok=True)
+        temp_path = os.path.join(self.root, "sessions", f"{uuid.uuid4().hex}.part")
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as f:
+                while True:
+                    block = stream.read(READ_BLOCK)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > self.max_file_size:
+                        raise UploadError(self._too_large_message(filename), status=413)
+                    hasher.update(block)
+                    f.write(block)
+            file_id = self._commit_object(temp_path, hasher.hexdigest())
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"Stored upload {filename}: {file_id} ({size} bytes)")
+        return file_id
+
+    def stage(self, file_id, dest_dir, filename):
+        """
+        วางไฟล์จาก store ลงโฟลเดอร์ชั่วคราวของการรันด้วยชื่อเดิม (hard link ถ้าทำได้)
+        Returns:
+            str: วิธีที่ใช้ (ดู staging.stage_file)
+        """
+        source = self.object_path(file_id)
+        if not os.path.isfile(source):
+            raise UploadError(f"ไม่พบไฟล์ที่อัปโหลด: {filename}", status=404)
+        self.touch(file_id)
+        return stage_file(source, os.path.join(dest_dir, safe_filename(filename)))
+
+    # ---------- resumable sessions ----------
+
+    def _session_paths(self, upload_id):
+        if not _UPLOAD_ID_RE.match(upload_id or ""):
+            raise UploadError("upload_id ไม่ถูกต้อง")
+        base = os.path.join(self.root, "sessions", upload_id)
+        return base + ".json", base + ".part"
+
+    def _session_lock(self, upload_id):
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def _too_large_message(self, filename):
+        limit_mb = self.max_file_size / (1024 * 1024)
+        return f"ไฟล์ {filename} มีขนาดเกิน {limit_mb:.0f}MB"
+
+    def create_session(self, filename, size, sha256=None):
+        """
+        เริ่มอัปโหลดไฟล์หนึ่งไฟล์
+        Args:
+            filename: ชื่อไฟล์เดิม
+            size: ขนาดไฟล์ (byte)
+            sha256: hash ของไฟล์ที่ client คำนวณไว้ (ถ้ามี) ใช้ข้ามการอัปโหลดเมื่อมีไฟล์นี้อยู่แล้ว
+        Returns:
+            dict: complete=True พร้อม file_id ถ้ามีไฟล์อยู่แล้ว
+                  หรือ upload_id, offset, chunk_size สำหรับส่งข้อมูลเป็นช่วง
+        """
+        filename = safe_filename(filename)
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError("ต้องระบุขนาดไฟล์")
+        if size < 0:
+            raise UploadError("ขนาดไฟล์ไม่ถูกต้อง")
+        if size > self.max_file_size:
+            raise UploadError(self._too_large_message(filename), status=413)
+
+        if sha256:
+            sha256 = sha256.lower()
+            if not _SHA256_RE.match(sha256):
+                raise UploadError("sha256 ไม่ถูกต้อง")
+            if self.has(sha256):
+                self.touch(sha256)
+                logger.info(f"Upload skipped, already stored: {filename} ({sha256})")
+                return {"complete": True, "file_id": sha256, "offset": size}
+
+        self.cleanup_sessions()
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._session_paths(upload_id)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        open(part_path, "wb").close()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"filename": filename, "size": size, "sha256": sha256,
+                       "created": time.time()}, f)
+        self._hashers[upload_id] = (hashlib.sha256(), 0)
+        result = {"complete": False, "upload_id": upload_id, "offset": 0, "chunk_size": self.chunk_size}
+        if size == 0:
+            result = self._finish(upload_id)
+        return result
+
+    def _load_session(self, upload_id):
+        meta_path, part_path = self._session_paths(upload_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError("ไม่พบการอัปโหลดนี้ (อาจหมดอายุแล้ว)", status=404)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return meta, part_path, offset
+
+    def session_status(self, upload_id):
+        """จำนวน byte ที่ได้รับแล้ว ใช้ให้ client ส่งต่อจากจุดนี้"""
+        meta, _, offset = self._load_session(upload_id)
+        return {"complete": False, "upload_id": upload_id, "offset": offset,
+                "size": meta["size"], "chunk_size": self.chunk_size}
+
+    def _hasher(self, upload_id, part_path, offset):
+        # server เริ่มใหม่หรือ chunk ก่อนหน้าเขียนไม่ครบ: คำนวณ hash ของส่วนที่มีอยู่ใหม่
+        hasher, hashed = self._hashers.get(upload_id, (None, -1))
+        if hasher is None or hashed != offset:
+            hasher = hashlib.sha256()
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(READ_BLOCK), b""):
+                    hasher.update(block)
+        return hasher
+
+    def write_chunk(self, upload_id, offset, stream):
+        """
+        เขียนข้อมูลช่วงถัดไปต่อท้ายไฟล์ที่ค้างอยู่
+        Args:
+            upload_id: จาก create_session
+            offset: ตำแหน่งเริ่มของข้อมูลช่วงนี้ (ต้องเท่ากับจำนวน byte ที่ได้รับแล้ว)
+            stream: body ของ request
+        Returns:
+            dict: offset ใหม่ หรือ complete=True พร้อม file_id เมื่อได้รับครบ
+        """
+        with self._session_lock(upload_id):
+            meta, part_path, current = self._load_session(upload_id)
+            if offset != current:
+                raise UploadError(f"offset ไม่ตรง (ได้รับแล้ว {current} byte)", status=409)
+
+            hasher = self._hasher(upload_id, part_path, current)
+            remaining = meta["size"] - current
+            written = 0
+            try:
+                with open(part_path, "ab") as f:
+                    while True:
+                        block = stream.read(READ_BLOCK)
+                        if not block:
+                            break
+                        if written + len(block) > remaining:
+                            f.truncate(current + written)
+                            raise UploadError(f"ข้อมูลของไฟล์ {meta['filename']} เกินขนาดที่แจ้งไว้ ({meta['size']} byte)",
+                                              status=413)
+                        f.write(block)
+                        hasher.update(block)
+                        written += len(block)
+            finally:
+                # เก็บ hash ของส่วนที่เขียนแล้ว แม้การเชื่อมต่อหลุดกลางทาง
+                self._hashers[upload_id] = (hasher, current + written)
+
+            if current + written < meta["size"]:
+                return {"complete": False, "upload_id": upload_id, "offset": current + written}
+            return self._finish(upload_id)
+
+    def _finish(self, upload_id):
+        meta, part_path, offset = self._load_session(upload_id)
+        hasher = self._hasher(upload_id, part_path, offset)
+        file_id = hasher.hexdigest()
+        try:
+            if meta.get("sha256") and meta["sha256"] != file_id:
+                os.remove(part_path)
+                raise UploadError(f"ไฟล์ {meta['filename']} เสียระหว่างอัปโหลด (sha256 ไม่ตรง)")
+            self._commit_object(part_path, file_id)
+        finally:
+            self._drop_session(upload_id)
+        logger.info(f"Stored upload {meta['filename']}: {file_id} ({offset} bytes)")
+        return {"complete": True, "file_id": file_id, "offset": offset}
+
+    def _drop_session(self, upload_id):
+        meta_path, part_path = self._session_paths(upload_id)
+        for path in (meta_path, part_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._hashers.pop(upload_id, None)
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+
+    def cleanup_sessions(self):
+        """ลบการอัปโหลดที่ไม่มีข้อมูลเข้ามานานเกิน session_ttl"""
+        sessions_dir = os.path.join(self.root, "sessions")
+        if not os.path.isdir(sessions_dir):
+            return 0
+        cutoff = time.time() - self.session_ttl
+        removed = 0
+        # session เดียวกันมี .json และ .part ใช้เวลาแก้ไขล่าสุดของไฟล์ใดไฟล์หนึ่ง
+        last_active = {}
+        for name in os.listdir(sessions_dir):
+            upload_id = os.path.splitext(name)[0]
+            try:
+                mtime = os.path.getmtime(os.path.join(sessions_dir, name))
+            except OSError:
+                continue
+            last_active[upload_id] = max(mtime, last_active.get(upload_id, 0))
+        for upload_id, mtime in last_active.items():
+            if mtime >= cutoff:
+                continue
+            for ext in (".json", ".part"):
+                path = os.path.join(sessions_dir, upload_id + ext)
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+            self._hashers.pop(upload_id, None)
+            removed += 1
+        return removed
+
+    def evict(self, max_bytes=None, max_age=None, keep=(), min_age=3600):
+        """
+        ลบ object ที่ไม่ได้ใช้แล้ว
+        - อายุ (นับจากใช้ล่าสุด) เกิน max_age ถูกลบ
+        - ขนาดรวมเกิน max_bytes: ลบตัวที่ใช้ล่าสุดนานที่สุดก่อนจนไม่เกิน
+        ไม่ลบ object ใน keep (เช่น input ของผลที่อยู่ในแคชผลการรัน) และที่ใช้ภายใน min_age วินาที
+        (การรันที่รอคิวอยู่อาจวางไฟล์ด้วย symlink ที่ชี้มาที่ object)
+        Args:
+            max_bytes / max_age: None = ไม่จำกัด
+            keep: sha256 ที่ยังถูกอ้างอิง
+        Returns:
+            dict: objects, bytes (ที่เหลือ), removed, freed_bytes
+        """
+        objects_dir = os.path.join(self.root, "objects")
+        if not os.path.isdir(objects_dir):
+            return {"objects": 0, "bytes": 0, "removed": 0, "freed_bytes": 0}
+        keep = set(keep)
+        now = time.time()
+        entries = []
+        for prefix in os.listdir(objects_dir):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            with os.scandir(prefix_dir) as it:
+                for entry in it:
+                    if not entry.is_file() or not _SHA256_RE.match(entry.name):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.name, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _, _ in entries)
+        removed, freed = 0, 0
+        for mtime, size, file_id, path in entries:
+            age = now - mtime
+            expired = max_age is not None and age > max_age
+            over_quota = max_bytes is not None and total > max_bytes
+            if not (expired or over_quota) or file_id in keep or age < min_age:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            freed += size
+        if removed:
+            logger.info(f"🧹 Upload store evicted {removed} objects ({freed / 1024 / 1024:.1f} MB)")
+        return {"objects": len(entries) - removed, "bytes": total, "removed": removed, "freed_bytes": freed}
+
+
+def parse_upload_list(value):
+    """
+    แปลงค่าฟอร์ม uploaded_files (JSON list ของ {file_id, filename}) เป็น list ของ (file_id, filename)
+    """
+    try:
+        items = json.loads(value)
+        return [(item["file_id"], safe_filename(item["filename"])) for item in items]
+    except (ValueError, TypeError, KeyError):
+        raise UploadError("ข้อมูลไฟล์ที่อัปโหลดไม่ถูกต้อง")
+
+
+def safe_filename(filename):
+    """ชื่อไฟล์อย่างเดียว (ตัด path ที่ติดมา) เก็บชื่อภาษาไทย/ช่องว่างไว้ตามเดิม"""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        raise UploadError("ชื่อไฟล์ไม่ถูกต้อง")
+    return name
+
+
+upload_store = UploadStore()
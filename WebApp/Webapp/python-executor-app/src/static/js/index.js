@@ -12,7 +12,10 @@ document.addEventListener('DOMContentLoaded', function() {
         funcSelect: document.getElementById('funcSelect') || document.querySelector('select[name="func_name"]'),
         mainForm: document.getElementById('mainForm') || document.querySelector('form'),
         lookupLastTypeLink: document.getElementById('lookupLastTypeLink'),
+        resetStateGroup: document.getElementById('resetStateGroup'),
+        resetStateCheckbox: document.getElementById('resetState'),
         loading: document.getElementById('loading'),
+        uploadedFilesInput: document.getElementById('uploadedFiles'),
         showTableCheckbox: document.getElementById('showTable')
     };
 
@@ -49,7 +52,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Configuration
     const config = {
         functionsRequiringLookup: ['PNP_CHANG_TYPE'],
+        functionsWithState: ['PNP_CHANG_TYPE'],
         maxFileSize: 50 * 1024 * 1024,
+        uploadRetries: 5,
         allowedFileTypes: ['.xlsx', '.xls', '.csv', '.txt']
     };
 
@@ -72,7 +77,7 @@ document.addEventListener('DOMContentLoaded', function() {
         "DA": {
             "DIE_ATTACK_AUTO_UPH": {
                 acceptedFiles: ["Excel (.xlsx, .xls)", "CSV (.csv)"],
-                description: "ไฟล์ข้อมูล Die Attack Auto UPH",
+                description: "ไฟล์ข้อมูล Die Attack Auto UPH (อัปโหลดหลายไฟล์ได้ จะรวมเป็นไฟล์สรุปเดียว)",
                 example: "ตัวอย่าง: die_attack_data.xlsx"
             }
         },
@@ -157,6 +162,13 @@ document.addEventListener('DOMContentLoaded', function() {
         // File input changes
         if (elements.fileInput) {
             elements.fileInput.addEventListener('change', handleFileChange);
+            // กลับมาหน้านี้ด้วยปุ่ม back: เปิด input ที่ปิดไว้ตอนส่งฟอร์มหลังอัปโหลดอีกครั้ง
+            window.addEventListener('pageshow', () => {
+                elements.fileInput.disabled = false;
+                if (elements.uploadedFilesInput) {
+                    elements.uploadedFilesInput.value = '';
+                }
+            });
         }
 
         // จัดการการคลิกปุ่ม operation
@@ -315,6 +327,7 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log('Function selected:', selectedFunction);
 
         toggleLookupLink(selectedFunction);
+        toggleResetState(selectedFunction);
         updateSupportedExtensions();
         saveFormState();
     }
@@ -358,11 +371,248 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
+        const tooLarge = Array.from(elements.fileInput.files).find(file => file.size > config.maxFileSize);
+        if (tooLarge) {
+            e.preventDefault();
+            alert(`ไฟล์ ${tooLarge.name} มีขนาดเกิน ${formatFileSize(config.maxFileSize)}`);
+            return;
+        }
+
         if (elements.loading) {
             elements.loading.style.display = 'block';
         }
         
         saveFormState();
+
+        // อัปโหลดเป็นช่วงเข้า upload store ก่อน แล้วส่งฟอร์มพร้อม file_id แทนตัวไฟล์
+        if (elements.uploadedFilesInput && window.fetch) {
+            e.preventDefault();
+            uploadAndSubmit();
+        }
+    }
+
+    // ===== CHUNKED UPLOAD =====
+
+    async function uploadAndSubmit() {
+        const files = Array.from(elements.fileInput.files);
+        const totalBytes = files.reduce((sum, file) => sum + file.size, 0) || 1;
+        let doneBytes = 0;
+
+        try {
+            const uploaded = [];
+            for (const file of files) {
+                uploaded.push(await uploadFile(file, sent => {
+                    const percent = Math.round((doneBytes + sent) / totalBytes * 100);
+                    setLoadingText(`กำลังอัปโหลด ${file.name} (${percent}%)`);
+                }));
+                doneBytes += file.size;
+            }
+
+            elements.uploadedFilesInput.value = JSON.stringify(uploaded);
+            // ไฟล์อยู่บน server แล้ว ไม่ต้องส่งไปกับฟอร์มอีก
+            elements.fileInput.disabled = true;
+            setLoadingText('กำลังประมวลผล กรุณารอสักครู่...');
+            elements.mainForm.submit();
+        } catch (error) {
+            console.error('Upload failed:', error);
+            if (elements.loading) {
+                elements.loading.style.display = 'none';
+            }
+            alert(`อัปโหลดไฟล์ไม่สำเร็จ: ${error.message}`);
+        }
+    }
+
+    async function uploadFile(file, onProgress) {
+        let session = await startUpload(file);
+        const uploadId = session.upload_id;
+        const chunkSize = session.chunk_size;
+        let offset = session.offset || 0;
+        let retries = 0;
+
+        while (!session.complete) {
+            onProgress(offset);
+            try {
+                session = await requestJson(`/api/uploads/${uploadId}?offset=${offset}`, {
+                    method: 'PUT',
+                    body: file.slice(offset, offset + chunkSize)
+                });
+                offset = session.offset;
+                retries = 0;
+            } catch (error) {
+                // ไฟล์ใหญ่เกิน/ข้อมูลผิด ไม่ต้องลองใหม่ ส่วนเน็ตหลุดหรือ offset ไม่ตรงให้ถามตำแหน่งล่าสุดแล้วส่งต่อ
+                if (error.status && error.status !== 409 && error.status < 500) {
+                    localStorage.removeItem(uploadKey(file));
+                    throw error;
+                }
+                if (++retries > config.uploadRetries) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                try {
+                    offset = (await requestJson(`/api/uploads/${uploadId}`)).offset;
+                } catch (statusError) {
+                    console.warn('Cannot get upload status:', statusError);
+                }
+            }
+        }
+
+        localStorage.removeItem(uploadKey(file));
+        onProgress(file.size);
+        return { file_id: session.file_id, filename: file.name };
+    }
+
+    async function startUpload(file) {
+        // ต่อการอัปโหลดเดิมที่ค้างอยู่ (เช่น เน็ตหลุดหรือปิดหน้าไประหว่างอัปโหลด)
+        const savedId = localStorage.getItem(uploadKey(file));
+        if (savedId) {
+            try {
+                return await requestJson(`/api/uploads/${savedId}`);
+            } catch (error) {
+                localStorage.removeItem(uploadKey(file));
+            }
+        }
+
+        setLoadingText(`กำลังตรวจสอบ ${file.name}`);
+        const session = await requestJson('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, sha256: await sha256Hex(file) })
+        });
+        if (!session.complete) {
+            localStorage.setItem(uploadKey(file), session.upload_id);
+        }
+        return session;
+    }
+
+    async function sha256Hex(file) {
+        // crypto.subtle ใช้ได้เฉพาะ HTTPS หรือ localhost เปิดผ่าน http://<ip> ใน LAN จะใช้ SHA-256 แบบ JavaScript แทน
+        // (ถ้า hash ไม่ได้เลยจะอัปโหลดแล้วให้ server คำนวณเอง)
+        try {
+            if (window.crypto && window.crypto.subtle) {
+                const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+                return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+            }
+            const hasher = createSha256();
+            for (let start = 0; start < file.size; start += HASH_SLICE_SIZE) {
+                const slice = file.slice(start, start + HASH_SLICE_SIZE);
+                hasher.update(new Uint8Array(await slice.arrayBuffer()));
+            }
+            return hasher.hex();
+        } catch (error) {
+            console.warn('Cannot hash file in browser:', error);
+            return null;
+        }
+    }
+
+    // ---------- SHA-256 แบบ JavaScript (ใช้เมื่อไม่มี crypto.subtle) ----------
+    const HASH_SLICE_SIZE = 4 * 1024 * 1024;
+    const SHA256_K = new Uint32Array([
+        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+    ]);
+
+    function createSha256() {
+        const state = new Uint32Array([
+            0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+        ]);
+        const w = new Uint32Array(64);
+        const buffer = new Uint8Array(64);
+        let buffered = 0;
+        let totalBytes = 0;
+
+        function compress(bytes, offset) {
+            for (let i = 0; i < 16; i++) {
+                const j = offset + i * 4;
+                w[i] = (bytes[j] << 24) | (bytes[j + 1] << 16) | (bytes[j + 2] << 8) | bytes[j + 3];
+            }
+            for (let i = 16; i < 64; i++) {
+                const x = w[i - 15];
+                const y = w[i - 2];
+                const s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+                const s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+                w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+            }
+            let a = state[0], b = state[1], c = state[2], d = state[3];
+            let e = state[4], f = state[5], g = state[6], h = state[7];
+            for (let i = 0; i < 64; i++) {
+                const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+                const t1 = (h + S1 + ((e & f) ^ (~e & g)) + SHA256_K[i] + w[i]) | 0;
+                const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+                const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+                h = g; g = f; f = e; e = (d + t1) | 0;
+                d = c; c = b; b = a; a = (t1 + t2) | 0;
+            }
+            state[0] += a; state[1] += b; state[2] += c; state[3] += d;
+            state[4] += e; state[5] += f; state[6] += g; state[7] += h;
+        }
+
+        function update(bytes) {
+            totalBytes += bytes.length;
+            let i = 0;
+            if (buffered > 0) {
+                i = Math.min(64 - buffered, bytes.length);
+                buffer.set(bytes.subarray(0, i), buffered);
+                buffered += i;
+                if (buffered < 64) return;
+                compress(buffer, 0);
+                buffered = 0;
+            }
+            for (; i + 64 <= bytes.length; i += 64) {
+                compress(bytes, i);
+            }
+            buffer.set(bytes.subarray(i), 0);
+            buffered = bytes.length - i;
+        }
+
+        function hex() {
+            // padding: 0x80 ตามด้วย 0 จนเหลือ 8 byte สุดท้ายของ block เป็นความยาวข้อมูล (bit, big-endian)
+            const bitsHigh = Math.floor(totalBytes / 0x20000000);
+            const bitsLow = (totalBytes * 8) >>> 0;
+            const padding = new Uint8Array((buffered < 56 ? 56 : 120) - buffered + 8);
+            padding[0] = 0x80;
+            const n = padding.length;
+            for (let k = 0; k < 4; k++) {
+                padding[n - 8 + k] = (bitsHigh >>> (24 - 8 * k)) & 0xff;
+                padding[n - 4 + k] = (bitsLow >>> (24 - 8 * k)) & 0xff;
+            }
+            update(padding);
+            return Array.from(state).map(x => x.toString(16).padStart(8, '0')).join('');
+        }
+
+        return { update, hex };
+    }
+
+    async function requestJson(url, options) {
+        const response = await fetch(url, options);
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok || data.success === false) {
+            const error = new Error(data.message || `HTTP ${response.status}`);
+            error.status = response.status;
+            throw error;
+        }
+        return data;
+    }
+
+    function uploadKey(file) {
+        return `upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    function setLoadingText(text) {
+        const content = elements.loading && elements.loading.querySelector('.loading-content');
+        if (!content) {
+            return;
+        }
+        const icon = content.querySelector('i');
+        content.textContent = ` ${text}`;
+        if (icon) {
+            content.prepend(icon);
+        }
     }
 
     // ===== FOLDER FUNCTIONS =====
@@ -649,6 +899,16 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    function toggleResetState(functionName) {
+        if (!elements.resetStateGroup) return;
+
+        const shouldShow = config.functionsWithState.includes(functionName);
+        elements.resetStateGroup.style.display = shouldShow ? "block" : "none";
+        if (!shouldShow && elements.resetStateCheckbox) {
+            elements.resetStateCheckbox.checked = false;
+        }
+    }
+
     function handleFileChange() {
         const files = Array.from(elements.fileInput.files);
         console.log('Files selected:', files.length);
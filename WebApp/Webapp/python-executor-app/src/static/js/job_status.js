@@ -0,0 +1,46 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const statusBox = document.getElementById('jobStatus');
+    if (!statusBox) return;
+
+    const statusUrl = statusBox.dataset.statusUrl;
+    const indexUrl = statusBox.dataset.indexUrl;
+    const statusText = document.getElementById('jobStatusText');
+    const elapsedText = document.getElementById('jobElapsed');
+    const POLL_INTERVAL = 2000;
+
+    const STATUS_LABELS = {
+        queued: 'กำลังรอคิว...',
+        running: 'กำลังประมวลผล...'
+    };
+
+    async function poll() {
+        try {
+            const response = await fetch(statusUrl);
+            const data = await response.json();
+
+            if (!data.success) {
+                window.location.href = indexUrl;
+                return;
+            }
+
+            const job = data.job;
+            if (job.status === 'done') {
+                window.location.href = job.result_url;
+                return;
+            }
+            if (job.status === 'failed') {
+                // ให้ server flash ข้อความ error แล้ว redirect กลับหน้าแรก
+                window.location.reload();
+                return;
+            }
+
+            statusText.textContent = STATUS_LABELS[job.status] || job.status;
+            elapsedText.textContent = `${job.elapsed} วินาที`;
+        } catch (error) {
+            console.error('❌ Error polling job status:', error);
+        }
+        setTimeout(poll, POLL_INTERVAL);
+    }
+
+    setTimeout(poll, POLL_INTERVAL);
+});
@@ -3,6 +3,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const tableSection = document.querySelector('.table-section');
     const searchInput = document.getElementById('searchInput');
     const controlsSection = document.getElementById('controlsSection');
+    const serverTable = document.querySelector('table[data-source-url]');
+    let dataTable = null;
     
     // Initialize basic functionality
     init();
@@ -12,6 +14,11 @@ document.addEventListener('DOMContentLoaded', function() {
         if (tableSection) {
             showTable();
         }
+        if (serverTable && window.ServerTable) {
+            // ตารางดึงข้อมูลทีละหน้าจาก server ใช้ช่องค้นหาของหน้าแทนช่องค้นหาของ DataTables
+            dataTable = window.ServerTable.init(serverTable, { "dom": "lrtip" });
+            dataTable.on('draw', updateTableInfo);
+        }
         enhanceTable();
         showControls(); // แสดงช่องค้นหา
     }
@@ -45,7 +52,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         
         // Row click for details
-        const table = document.querySelector('.result-table');
+        const table = document.getElementById('tableArea');
         if (table) {
             table.addEventListener('click', function(e) {
                 const row = e.target.closest('tr');
@@ -114,36 +121,46 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Count rows and columns
         updateTableInfo();
-        
-        // Add hover effects
-        const rows = table.querySelectorAll('tbody tr');
-        rows.forEach(row => {
-            row.style.cursor = 'pointer';
-        });
     }
     
     function updateTableInfo() {
         const table = document.querySelector('.result-table');
         if (!table) return;
         
-        const rows = table.querySelectorAll('tbody tr');
-        const cols = table.querySelectorAll('thead th');
+        // Add hover effects
+        table.querySelectorAll('tbody tr').forEach(row => {
+            row.style.cursor = 'pointer';
+        });
+        
+        const rowTotal = dataTable ? dataTable.page.info().recordsTotal : table.querySelectorAll('tbody tr').length;
+        const colTotal = table.querySelectorAll('thead th').length;
         
         // Update info if elements exist
         const rowCount = document.getElementById('rowCount');
         const columnCount = document.getElementById('columnCount');
         
         if (rowCount) {
-            rowCount.textContent = `ทั้งหมด ${rows.length} แถว`;
+            rowCount.textContent = `ทั้งหมด ${rowTotal} แถว`;
         }
         
         if (columnCount) {
-            columnCount.textContent = `${cols.length} คอลัมน์`;
+            columnCount.textContent = `${colTotal} คอลัมน์`;
         }
     }
     
     function simpleSearch() {
         const searchTerm = searchInput.value.toLowerCase().trim();
+        
+        if (dataTable) {
+            // ค้นหาฝั่ง server แล้วแสดงจำนวนที่พบเมื่อโหลดหน้าใหม่เสร็จ
+            dataTable.one('draw', function() {
+                const info = dataTable.page.info();
+                updateSearchResult(searchTerm, info.recordsDisplay, info.recordsTotal);
+            });
+            dataTable.search(searchTerm).draw();
+            return;
+        }
+        
         const rows = document.querySelectorAll('.result-table tbody tr');
         const totalRows = rows.length;
         let visibleCount = 0;
@@ -213,6 +230,10 @@ document.addEventListener('DOMContentLoaded', function() {
             searchInput.value = '';
         }
         
+        if (dataTable) {
+            dataTable.search('').draw();
+        }
+        
         // Show all rows
         const rows = document.querySelectorAll('.result-table tbody tr');
         rows.forEach(row => {
@@ -247,7 +268,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     function showRowDetails(row) {
         const cells = Array.from(row.cells);
-        const headers = Array.from(document.querySelectorAll('.result-table th'));
+        const headers = dataTable
+            ? Array.from(dataTable.columns().header())
+            : Array.from(document.querySelectorAll('.result-table th'));
         
         let details = '';
         cells.forEach((cell, index) => {
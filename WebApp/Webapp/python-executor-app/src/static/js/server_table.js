@@ -0,0 +1,42 @@
+/* ตารางผลลัพธ์แบบ server-side: ดึงข้อมูลทีละหน้าจาก /api/results */
+
+const SERVER_TABLE_LANGUAGE = {
+    "search": "ค้นหา:",
+    "lengthMenu": "แสดง _MENU_ รายการต่อหน้า",
+    "info": "แสดง _START_ ถึง _END_ จาก _TOTAL_ รายการ",
+    "infoEmpty": "ไม่พบข้อมูล",
+    "infoFiltered": "(กรองจากทั้งหมด _MAX_ รายการ)",
+    "processing": "กำลังโหลดข้อมูล...",
+    "paginate": {
+        "first": "หน้าแรก",
+        "last": "หน้าสุดท้าย",
+        "next": "ถัดไป",
+        "previous": "ก่อนหน้า"
+    },
+    "emptyTable": "ไม่มีข้อมูลในตาราง",
+    "zeroRecords": "ไม่พบข้อมูลที่ตรงกัน"
+};
+
+function initServerTable(table, options = {}) {
+    if (!table || !window.jQuery || !$.fn.DataTable) return null;
+
+    return $(table).DataTable(Object.assign({
+        "serverSide": true,
+        "processing": true,
+        "ajax": {
+            "url": table.dataset.sourceUrl,
+            "type": "GET"
+        },
+        "pageLength": 25,
+        "lengthMenu": [10, 25, 50, 100, 500],
+        "language": SERVER_TABLE_LANGUAGE,
+        "order": [],
+        "searchDelay": 400,
+        "deferRender": true,
+        "scrollX": true
+    }, options));
+}
+
+window.ServerTable = {
+    init: initServerTable
+};
@@ -0,0 +1,157 @@
+"""
+เทียบผลของขั้นตอนใน LOGVIEW ที่เขียนใหม่แบบ vectorized กับ implementation เดิม (ลูปทีละแถว/ทีละกลุ่ม)
+ข้อมูลจาก log จำลองของ benchmarks/generators.py
+
+รัน: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "src"))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks"))
+
+import functions.LOGVIEW as logview  # noqa: E402
+import generators as gen  # noqa: E402
+
+SEEDS = [0, 1, 2]
+
+
+# ---------- implementation เดิม (ใช้เป็นผลอ้างอิง) ----------
+
+def legacy_extract_pro_and_speed(df):
+    if df.empty:
+        return pd.DataFrame()
+    df_pro = df[df['step'] == 'PRO'].copy()
+    if df_pro.empty:
+        return pd.DataFrame()
+    df_pro['speed'] = None
+    for idx in df_pro.index:
+        speed_value = None
+        pos = df.index.get_loc(idx)
+        for j in range(pos + 1, len(df)):
+            if df.loc[df.index[j], 'step'] == 'CUC':
+                if 'value_5' in df.columns and len(df.columns) > df.columns.get_loc('value_5'):
+                    speed_value = df.loc[df.index[j], 'value_5']
+                break
+        df_pro.at[idx, 'speed'] = speed_value
+    df_pro['speed'] = pd.to_numeric(df_pro['speed'], errors='coerce')
+    df_pro['speed'] = df_pro['speed'] / 10 / 25.4
+    df_pro['speed'] = df_pro['speed'].apply(lambda x: int(x) if x % 1 == 0 else round(x, 2))
+    return df_pro
+
+
+def legacy_assign_subgroups_and_insert_empty_rows(df, column_strip='No_strip', frame_group='frame'):
+    subgroup_id = 0
+    subgroups = []
+    prev_val = None
+    for val in df[column_strip]:
+        if pd.isna(val):
+            subgroups.append(np.nan)
+            prev_val = None
+            continue
+        if prev_val is None:
+            subgroup_id += 1
+        elif val > prev_val:
+            subgroup_id += 1
+        subgroups.append(subgroup_id)
+        prev_val = val
+    df['subgroup_id'] = subgroups
+    result_rows = []
+    subgroup_keys = df['subgroup_id'].dropna().unique()
+    for group in subgroup_keys:
+        group_df = df[df['subgroup_id'] == group].reset_index(drop=True)
+        result_rows.append(group_df.iloc[[0]])
+        for i in range(1, len(group_df)):
+            prev_frame = group_df.loc[i - 1, frame_group]
+            curr_frame = group_df.loc[i, frame_group]
+            if prev_frame != curr_frame:
+                empty_row = pd.DataFrame({col: [np.nan] for col in df.columns})
+                result_rows.append(empty_row)
+            result_rows.append(group_df.iloc[[i]])
+        empty_row = pd.DataFrame({col: [np.nan] for col in df.columns})
+        result_rows.append(empty_row)
+    result_df = pd.concat(result_rows, ignore_index=True).reset_index(drop=True)
+    return result_df
+
+
+# ---------- ข้อมูล ----------
+
+@pytest.fixture(scope="module")
+def sample_logs(tmp_path_factory):
+    """ไฟล์ log จำลองหลาย seed: {seed: path}"""
+    input_dir = tmp_path_factory.mktemp("logs")
+    return {seed: gen.write_logview_logs(str(input_dir / f"seed{seed}"), 1, 1_500, seed=seed)[0] for seed in SEEDS}
+
+
+@pytest.fixture(scope="module")
+def parsed_logs(sample_logs):
+    return {seed: logview.load_and_parse_file(path) for seed, path in sample_logs.items()}
+
+
+@pytest.fixture(scope="module")
+def stage_inputs(parsed_logs):
+    """input ของแต่ละขั้นตอนใน _process_single_file: {seed: {ชื่อ function: DataFrame}}"""
+    return {seed: gen.logview_stages(df) for seed, df in parsed_logs.items()}
+
+
+# ---------- extract_pro_and_speed ----------
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_extract_pro_and_speed_matches_legacy(parsed_logs, seed):
+    df = parsed_logs[seed]
+    expected = legacy_extract_pro_and_speed(df)
+    result = logview.extract_pro_and_speed(df)
+    assert len(result) > 0
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_extract_pro_and_speed_edge_cases():
+    rows = [
+        ['d', '1', 'PRO', 'FU1234', 'G1', '3', '7', ''],     # CUC ถัดไปอยู่หลัง error step
+        ['d', '2', 'ERRSET', '', '1', '', '', ''],
+        ['d', '3', 'CUC', 'FU1234', 'G', '0', '1', '762'],
+        ['d', '4', 'PRO', 'FU1234', 'G1', '2', '7', ''],     # CUC ถัดไปไม่มีค่าความเร็ว
+        ['d', '5', 'CUC', 'FU1234', 'G', '0', '1', ''],
+        ['d', '6', 'PRO', 'FU1234', 'G1', '1', '7', ''],     # PRO สุดท้าย ไม่มี CUC ตามหลัง
+    ]
+    df = pd.DataFrame(rows, columns=['date', 'time', 'step', 'frame', 'G', 'No_strip', 'value_1', 'value_5'],
+                      index=[10, 11, 12, 20, 21, 30])
+    pd.testing.assert_frame_equal(logview.extract_pro_and_speed(df), legacy_extract_pro_and_speed(df))
+
+    # ไฟล์ที่ไม่มีคอลัมน์ value_5 เลย
+    narrow = df.drop(columns=['value_5'])
+    pd.testing.assert_frame_equal(logview.extract_pro_and_speed(narrow), legacy_extract_pro_and_speed(narrow))
+
+    assert logview.extract_pro_and_speed(pd.DataFrame()).empty
+    assert logview.extract_pro_and_speed(df[df['step'] != 'PRO']).empty
+
+
+# ---------- assign_subgroups_and_insert_empty_rows ----------
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_assign_subgroups_matches_legacy(stage_inputs, seed):
+    df = stage_inputs[seed]['assign_subgroups_and_insert_empty_rows']
+    expected = legacy_assign_subgroups_and_insert_empty_rows(df.copy())
+    result = logview.assign_subgroups_and_insert_empty_rows(df.copy())
+    assert result['subgroup_id'].nunique() > 1
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_assign_subgroups_edge_cases():
+    df = pd.DataFrame({
+        # strip เพิ่มขึ้น = subgroup ใหม่, แถวว่างตัด subgroup, frame เปลี่ยนกลาง subgroup, strip เท่าเดิม
+        'No_strip': [3, 2, 2, 1, np.nan, 1, 4, 4, 3, np.nan, np.nan, 2],
+        'frame': ['A', 'A', 'B', 'B', None, 'B', 'C', 'C', 'A', None, None, 'A'],
+        'seconds': np.arange(12, dtype=float),
+    })
+    pd.testing.assert_frame_equal(logview.assign_subgroups_and_insert_empty_rows(df.copy()),
+                                  legacy_assign_subgroups_and_insert_empty_rows(df.copy()))
+    blank = pd.DataFrame({'No_strip': [np.nan, np.nan], 'frame': [None, None]})
+    result = logview.assign_subgroups_and_insert_empty_rows(blank.copy())
+    assert result.empty
+    assert 'subgroup_id' in result.columns